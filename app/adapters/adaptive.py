@@ -0,0 +1,255 @@
+"""
+埋め込みサーバーの同時実行数の自動調整（AIMD）
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+import requests
+
+from ..core.exceptions import DeadlineExceededError
+from ..utils.config import Config
+from ..utils.deadline import current_deadline
+from ..utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from ..core.vectors import Vector, VectorMatrix
+
+logger = get_logger(__name__)
+
+# サーバーが過負荷を示す HTTP ステータス
+_OVERLOAD_STATUS = frozenset({429, 503})
+# 基準レイテンシ（移動平均の最小値）を最近のレイテンシへ近づける時定数（秒）
+# 応答数ではなく経過時間で近づけ、高負荷で応答が多いほど基準が待ち時間に引きずられないようにする
+_BASELINE_DECAY_SECONDS = 60.0
+# 件数ごとに、この数の応答を観測するまでは移動平均をそのまま基準にしてレイテンシの上昇を判定しない
+_WARMUP_SAMPLES = 5
+# 実行枠を待つ間に期限切れ・取り消しを確認する間隔
+_CANCEL_POLL_SECONDS = 0.1
+
+
+class AdaptiveLimiter:
+    """応答状況に応じて同時実行数を増減するリミッター（加算増加・乗算減少）
+
+    応答が安定している間は同時実行数1つ分の応答ごとに increase ずつ上限を上げ、
+    タイムアウト・429/503 応答・レイテンシの上昇を検知したら decrease を掛けて下げる。
+    上限を上げるのは実行数が上限に達しているか、実行枠を待つリクエストがある場合だけで、
+    少ない負荷が続いても上限だけが膨らむことはない。
+
+    レイテンシの上昇は、件数が同じリクエストのレイテンシの移動平均を、その移動平均の
+    最小値（最近の値へゆっくり近づく基準）と比べて判定するため、偶然速かった・遅かった
+    1件の応答では上限を変えない。下げた時点で実行中だった
+    リクエストの結果では続けて下げず、1回の輻輳で何度も下げないようにする。
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_alpha: float = 0.2,
+    ) -> None:
+        if not 0 < decrease < 1:
+            raise ValueError("減少係数は0より大きく1より小さい値である必要があります")
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_alpha = latency_alpha
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._latency: float | None = None
+        self._baselines: dict[int, float] = {}
+        self._recent: dict[int, float] = {}
+        self._samples: dict[int, int] = {}
+        self._baseline_updated: dict[int, float] = {}
+        self._waiting = 0
+        # 実行枠を待っているリクエスト数を返す関数（スケジューラーが実行枠を配る場合に設定）
+        self.backlog: Callable[[], int] | None = None
+        self._decreased_at = 0.0
+        self._increases = 0
+        self._decreases = 0
+        self._overloads = 0
+
+    @classmethod
+    def from_config(cls) -> AdaptiveLimiter | None:
+        """設定ファイルの [adaptive_concurrency] からリミッターを作成（無効なら None、上限はワーカー数で按分）"""
+        section = Config.get("adaptive_concurrency", default={})
+        if not section.get("enabled", True):
+            return None
+        return cls(
+            initial=Config.per_worker(Config.get("scheduler", "embed_concurrency", default=4)),
+            min_limit=Config.per_worker(section.get("min_concurrency", 1)),
+            max_limit=Config.per_worker(section.get("max_concurrency", 64)),
+            increase=section.get("increase", 1.0),
+            decrease=section.get("decrease", 0.5),
+            latency_tolerance=section.get("latency_tolerance", 2.0),
+            latency_alpha=section.get("latency_alpha", 0.2),
+        )
+
+    @property
+    def limit(self) -> int:
+        """現在の同時実行数の上限"""
+        return int(self._limit)
+
+    def acquire(self, wait: bool = True) -> float:
+        """実行枠を確保して開始時刻を返す（wait が偽なら上限を確認せず実行数だけ数える）"""
+        with self._cond:
+            deadline = current_deadline()
+            self._waiting += 1
+            try:
+                while wait and self._inflight >= self.limit:
+                    if deadline is None:
+                        self._cond.wait()
+                        continue
+                    error = deadline.error("実行枠の待機")
+                    if error is not None:
+                        raise error
+                    # 取り消しは条件変数に通知されないため一定間隔で確認する
+                    self._cond.wait(timeout=min(deadline.remaining(), _CANCEL_POLL_SECONDS))
+            finally:
+                self._waiting -= 1
+            self._inflight += 1
+            return time.monotonic()
+
+    def release(self, started: float, items: int = 1, overloaded: bool = False, failed: bool = False) -> None:
+        """実行枠を返却し、結果に応じて上限を調整
+
+        overloaded は過負荷を示す失敗、failed はそれ以外の失敗（入力不正など）で、後者では調整しない。
+        """
+        seconds = time.monotonic() - started
+        # スケジューラーの待ち行列はこのロックの外で数える
+        backlog = self.backlog() if self.backlog is not None else 0
+        with self._cond:
+            saturated = self._inflight >= self.limit or self._waiting > 0 or backlog > 0
+            self._inflight -= 1
+            if overloaded:
+                self._overloads += 1
+                self._decrease(started, "タイムアウト・過負荷応答")
+            elif not failed:
+                self._observe(started, seconds, items, saturated)
+            self._cond.notify_all()
+
+    def _observe(self, started: float, seconds: float, items: int, saturated: bool) -> None:
+        """成功したリクエストのレイテンシを記録し、上昇していれば下げ、上限に達していれば上げる（ロック保持中に呼ぶ）"""
+        alpha = self.latency_alpha
+        self._latency = seconds if self._latency is None else alpha * seconds + (1 - alpha) * self._latency
+
+        recent = self._recent.get(items)
+        recent = seconds if recent is None else alpha * seconds + (1 - alpha) * recent
+        self._recent[items] = recent
+        samples = self._samples[items] = self._samples.get(items, 0) + 1
+        baseline = self._baselines.get(items)
+        now = time.monotonic()
+        elapsed = now - self._baseline_updated.get(items, now)
+        self._baseline_updated[items] = now
+        if samples <= _WARMUP_SAMPLES or baseline is None:
+            self._baselines[items] = recent
+            baseline = None
+        else:
+            decay = min(1.0, elapsed / _BASELINE_DECAY_SECONDS)
+            self._baselines[items] = min(recent, baseline + decay * (recent - baseline))
+        if baseline is not None and recent > baseline * self.latency_tolerance:
+            self._decrease(started, f"レイテンシ上昇 {baseline * 1000:.0f}ms → {recent * 1000:.0f}ms")
+            return
+        if not saturated:
+            return
+
+        before = self.limit
+        self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+        if self.limit > before:
+            self._increases += 1
+            logger.debug(f"埋め込みサーバーの同時実行数を{before}→{self.limit}に上げました")
+
+    def _decrease(self, started: float, reason: str) -> None:
+        """上限を乗算的に下げる（前回下げた時点で実行中だったリクエストでは下げない。ロック保持中に呼ぶ）"""
+        if started < self._decreased_at:
+            return
+        before = self.limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease)
+        self._decreased_at = time.monotonic()
+        # 下げた後のレイテンシで判定し直せるよう、移動平均を基準に戻す
+        self._recent = dict(self._baselines)
+        self._decreases += 1
+        logger.info(f"埋め込みサーバーの同時実行数を{before}→{self.limit}に下げました（{reason}）")
+
+    def stats(self) -> dict[str, Any]:
+        """現在の上限・実行数・観測レイテンシを取得"""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "inflight": self._inflight,
+                "latency_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+                "increases": self._increases,
+                "decreases": self._decreases,
+                "overloads": self._overloads,
+            }
+
+
+def is_overload(error: BaseException) -> bool:
+    """タイムアウトや 429/503 応答など、サーバーの過負荷を示す例外かを判定
+
+    アダプターは通信エラーを原因付きで送出するため、原因をたどって確認する。
+    処理期限による中断はクライアント側の都合なので過負荷とはみなさない。
+    """
+    if isinstance(error, DeadlineExceededError):
+        return False
+    cause: BaseException | None = error
+    while cause is not None:
+        if isinstance(cause, (requests.Timeout, TimeoutError)):
+            return True
+        response = getattr(cause, "response", None)
+        if response is not None and getattr(response, "status_code", None) in _OVERLOAD_STATUS:
+            return True
+        cause = cause.__cause__
+    return False
+
+
+class AdaptiveEmbedder:
+    """埋め込みリクエストのレイテンシと失敗を計測し、リミッターの上限を調整するラッパー
+
+    gate が偽の場合は実行枠を確保せず計測だけ行う（スケジューラーがリミッターの上限で実行枠を配る場合）。
+    """
+
+    def __init__(self, embedder, limiter: AdaptiveLimiter, gate: bool = True) -> None:
+        self.embedder = embedder
+        self.limiter = limiter
+        self.gate = gate
+
+    def embed(self, text: str) -> Vector:
+        """テキストを埋め込みベクトルに変換"""
+        return self._run(self.embedder.embed, text, 1)
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストをまとめて埋め込みベクトルに変換"""
+        return self._run(self.embedder.embed_batch, texts, len(texts))
+
+    def _run(self, func, arg, items: int):
+        """実行枠を確保して呼び出し、結果をリミッターに記録"""
+        started = self.limiter.acquire(wait=self.gate)
+        try:
+            result = func(arg)
+        except Exception as e:
+            self.limiter.release(started, items, overloaded=is_overload(e), failed=True)
+            raise
+        self.limiter.release(started, items)
+        return result
+
+
+def find_adaptive_limiter(embedder) -> AdaptiveLimiter | None:
+    """ラッパーをたどって埋め込みモデルに組み込まれたリミッターを探す"""
+    while embedder is not None:
+        if isinstance(embedder, AdaptiveEmbedder):
+            return embedder.limiter
+        embedder = getattr(embedder, "embedder", None)
+    return None
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from ..core.exceptions import EmbeddingError
+from ..utils.config import Config
+from ..utils.deadline import deadline_error, timeout_for
+from ..utils.logger import get_logger
+from .scheduler import Priority, current_priority, request_priority
+
+if TYPE_CHECKING:
+    from ..core.vectors import Vector, VectorMatrix
+
+logger = get_logger(__name__)
+
+
+class MicroBatchEmbedder:
+    """同時に届いた質問の埋め込みをまとめて1回のリクエストで処理するラッパー
+
+    一定時間内に届いた質問テキストを最大件数まで集め、一括埋め込みの結果を各呼び出し元に返す。
+    取り込みなど対話以外の優先度の呼び出しはまとめずにそのまま実行する。
+    """
+
+    def __init__(
+        self,
+        embedder,
+        window_ms: float = 3.0,
+        max_batch: int = 32,
+        flush_workers: int = 4,
+    ) -> None:
+        self.embedder = embedder
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.flush_workers = flush_workers
+        self._queue: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    @classmethod
+    def from_config(cls, embedder) -> MicroBatchEmbedder:
+        """設定ファイルの [batching] からラッパーを作成"""
+        return cls(
+            embedder,
+            window_ms=Config.get("batching", "window_ms", default=3.0),
+            max_batch=Config.get("batching", "max_batch", default=32),
+            flush_workers=Config.get("batching", "flush_workers", default=4),
+        )
+
+    def embed(self, text: str) -> Vector:
+        """テキストを埋め込みベクトルに変換（対話リクエストはまとめて処理）"""
+        if current_priority() is not Priority.INTERACTIVE:
+            return self.embedder.embed(text)
+
+        clean_text = text.strip()
+        if not clean_text:
+            raise EmbeddingError("空のテキストは埋め込みできません")
+
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((clean_text, future))
+        try:
+            return future.result(timeout=timeout_for(None))
+        except TimeoutError:
+            # まとめた埋め込みは他の呼び出し元と共有しているため、待機だけを打ち切る
+            raise deadline_error("質問の埋め込み") or EmbeddingError("埋め込みの待機がタイムアウトしました") from None
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストをまとめて埋め込みベクトルに変換"""
+        return self.embedder.embed_batch(texts)
+
+    def _ensure_started(self) -> None:
+        """収集スレッドを初回利用時に開始"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.flush_workers, thread_name_prefix="embed-batch"
+                )
+                self._thread = threading.Thread(
+                    target=self._collect_loop, name="embed-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_loop(self) -> None:
+        """待機時間内に届いたリクエストを集めて送信"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # 送信中も次のリクエストを集められるよう別スレッドで送る
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: list[tuple[str, Future]]) -> None:
+        """集めたテキストを一括で埋め込み、各呼び出し元に結果を返す"""
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            with request_priority(Priority.INTERACTIVE):
+                if len(texts) == 1:
+                    vectors = [self.embedder.embed(texts[0])]
+                else:
+                    vectors = self.embedder.embed_batch(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            future.set_result(by_text[text])
+        logger.debug(f"{len(batch)}件の質問埋め込みを{len(texts)}件にまとめて処理しました")
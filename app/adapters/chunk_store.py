@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..core.exceptions import DocumentProcessingError
+from ..utils.config import Config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# ポイントIDを導出する名前空間（変更すると既存のポイントを上書きできなくなる）
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2b1e-4d7a-5a53-9d3e-2f0b8c1a7e64")
+
+
+def content_hash(text: str) -> str:
+    """チャンク本文のハッシュ値を計算"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class StoredChunk:
+    """チャンクストアに保存されたチャンク"""
+    source: str
+    chunk_id: int
+    text: str
+    content_hash: str
+
+    @property
+    def point_id(self) -> str:
+        """ソース・チャンク番号・本文から決まるポイントID（登録し直すと同じポイントを上書きする）"""
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{self.source}:{self.chunk_id}:{self.content_hash}"))
+
+
+class ChunkStore:
+    """解析済みチャンクの追記型ストア
+
+    チャンクはバッチごとに1つのgzipメンバーとしてデータファイルへ追記し、
+    ソースとチャンク番号からメンバー位置を引けるようSQLiteに索引を持つ。
+    APIの複数ワーカーから同時に追記できるよう、追記と索引の更新はファイルロックで直列化する。
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = Path(path or Config.get("chunk_store", "path", default="chunk_store"))
+        self.data_file = self.path / "chunks.jsonl.gz"
+        self.index_file = self.path / "index.sqlite3"
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """索引DBへの接続を取得（初回のみ作成）"""
+        if self._conn is None:
+            try:
+                self.path.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.index_file, check_same_thread=False)
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS chunks (
+                        source TEXT NOT NULL,
+                        chunk_id INTEGER NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        member_offset INTEGER NOT NULL,
+                        member_length INTEGER NOT NULL,
+                        PRIMARY KEY (source, chunk_id)
+                    )
+                    """
+                )
+                self._migrate_primary_key(conn)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks (content_hash)")
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                raise DocumentProcessingError(f"チャンクストアの初期化に失敗: {e}") from e
+        return self._conn
+
+    @staticmethod
+    def _migrate_primary_key(conn: sqlite3.Connection) -> None:
+        """ソースとハッシュを主キーにしていた古い索引を、ソースとチャンク番号の主キーに作り直す"""
+        columns = sorted(conn.execute("PRAGMA table_info(chunks)"), key=lambda row: row[5])
+        primary_key = [row[1] for row in columns if row[5]]
+        if primary_key == ["source", "chunk_id"]:
+            return
+        logger.info("チャンクストアの索引をソースとチャンク番号の主キーに移行します")
+        conn.execute("ALTER TABLE chunks RENAME TO chunks_old")
+        conn.execute("DROP INDEX IF EXISTS idx_chunks_hash")
+        conn.execute(
+            """
+            CREATE TABLE chunks (
+                source TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                member_offset INTEGER NOT NULL,
+                member_length INTEGER NOT NULL,
+                PRIMARY KEY (source, chunk_id)
+            )
+            """
+        )
+        # 同じチャンク番号が複数あれば後から追記したものを残す
+        conn.execute("INSERT OR REPLACE INTO chunks SELECT * FROM chunks_old ORDER BY member_offset")
+        conn.execute("DROP TABLE chunks_old")
+
+    def append(self, chunks: Iterable[StoredChunk]) -> int:
+        """チャンクをまとめて追記（同じ番号・同じ本文で保存済みのものはスキップし、本文が変わったものは置き換える）"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                self.path.mkdir(parents=True, exist_ok=True)
+                with self.data_file.open("ab") as f:
+                    # 他のワーカーの追記と重ならないよう、保存済みの確認から索引の更新までをロックする
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    new_chunks = self._filter_new(conn, chunks)
+                    if not new_chunks:
+                        return 0
+                    return self._write_member(conn, f, new_chunks)
+            except DocumentProcessingError:
+                raise
+            except Exception as e:
+                logger.error(f"チャンクストア書き込みエラー: {e}")
+                raise DocumentProcessingError(f"チャンクストアへの書き込みに失敗しました: {e}") from e
+
+    def _filter_new(self, conn: sqlite3.Connection, chunks: Iterable[StoredChunk]) -> list[StoredChunk]:
+        """未保存・本文が変わったチャンクのみを抽出"""
+        new_chunks: list[StoredChunk] = []
+        seen: set[tuple[str, int]] = set()
+        for chunk in chunks:
+            key = (chunk.source, chunk.chunk_id)
+            if key in seen:
+                continue
+            seen.add(key)
+            row = conn.execute(
+                "SELECT content_hash FROM chunks WHERE source = ? AND chunk_id = ?", key
+            ).fetchone()
+            if row is None or row[0] != chunk.content_hash:
+                new_chunks.append(chunk)
+        return new_chunks
+
+    def _write_member(self, conn: sqlite3.Connection, f, chunks: list[StoredChunk]) -> int:
+        """チャンクを1つのgzipメンバーとしてロック済みのデータファイルへ書き込み、索引を更新"""
+        lines = "".join(
+            json.dumps(
+                {"source": c.source, "chunk_id": c.chunk_id, "text": c.text, "hash": c.content_hash},
+                ensure_ascii=False,
+            ) + "\n"
+            for c in chunks
+        )
+        member = gzip.compress(lines.encode("utf-8"))
+
+        # ロックを待つ間に他のプロセスが追記していることがあるため、末尾の位置は取得し直す
+        offset = f.seek(0, os.SEEK_END)
+        f.write(member)
+        f.flush()
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)",
+            [(c.source, c.chunk_id, c.content_hash, offset, len(member)) for c in chunks],
+        )
+        conn.commit()
+        return len(chunks)
+
+    def remove_source(self, source: str) -> int:
+        """ソースのチャンクを索引から外し、外した件数を返す（再取り込みで置き換える前に呼ぶ）
+
+        データファイルは追記のみのため、外したチャンクは索引から参照されなくなるだけで残る。
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                removed = conn.execute("DELETE FROM chunks WHERE source = ?", (source,)).rowcount
+                conn.commit()
+            except Exception as e:
+                raise DocumentProcessingError(f"チャンクストアからの削除に失敗しました: {e}") from e
+        return removed
+
+    def iter_chunks(self, source: str | None = None) -> Iterator[StoredChunk]:
+        """保存済みチャンクを順次読み出す（索引から外したチャンクは読み出さない）"""
+        with self._lock:
+            conn = self._connect()
+            query = "SELECT member_offset, member_length, source, chunk_id, content_hash FROM chunks"
+            if source is None:
+                rows = conn.execute(f"{query} ORDER BY member_offset, chunk_id").fetchall()
+            else:
+                rows = conn.execute(f"{query} WHERE source = ? ORDER BY member_offset, chunk_id", (source,)).fetchall()
+
+        members: dict[tuple[int, int], set[tuple[str, int, str]]] = {}
+        for offset, length, row_source, row_chunk_id, row_hash in rows:
+            members.setdefault((offset, length), set()).add((row_source, row_chunk_id, row_hash))
+        if not members:
+            return
+
+        with self.data_file.open("rb") as f:
+            for (offset, length), keys in members.items():
+                f.seek(offset)
+                for line in gzip.decompress(f.read(length)).splitlines():
+                    record = json.loads(line)
+                    if (record["source"], record["chunk_id"], record["hash"]) not in keys:
+                        continue
+                    yield StoredChunk(
+                        source=record["source"],
+                        chunk_id=record["chunk_id"],
+                        text=record["text"],
+                        content_hash=record["hash"],
+                    )
+
+    def sources(self) -> list[str]:
+        """保存済みのソース一覧を取得"""
+        with self._lock:
+            rows = self._connect().execute("SELECT DISTINCT source FROM chunks ORDER BY source").fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        """保存済みチャンク数を取得"""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
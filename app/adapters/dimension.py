@@ -0,0 +1,65 @@
+"""
+埋め込みベクトルの次元の決定と、Matryoshka 表現の切り詰め
+"""
+from __future__ import annotations
+
+from ..core.exceptions import EmbeddingError
+from ..core.vectors import Vector, VectorMatrix, truncate_vectors
+from ..utils.config import Config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROBE_TEXT = "dimension probe"
+
+
+class TruncatedEmbedder:
+    """埋め込みベクトルを先頭の次元に切り詰めて正規化し直すラッパー
+
+    nomic-embed-text など Matryoshka 表現学習されたモデルは、先頭の次元だけでも
+    検索精度を大きく落とさずに使えるため、ベクトルのメモリと検索時間を削減できる。
+    """
+
+    def __init__(self, embedder, dimension: int) -> None:
+        if dimension <= 0:
+            raise ValueError("切り詰め後の次元は正の値である必要があります")
+        self.embedder = embedder
+        self.dimension = dimension
+
+    def embed(self, text: str) -> Vector:
+        """テキストを埋め込みベクトルに変換"""
+        return self._truncate(self.embedder.embed(text))
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストをまとめて埋め込みベクトルに変換"""
+        return self._truncate(self.embedder.embed_batch(texts))
+
+    def _truncate(self, vectors: Vector | VectorMatrix) -> Vector | VectorMatrix:
+        """ベクトルを切り詰める（元の次元が足りなければエラー）"""
+        if vectors.shape[-1] < self.dimension:
+            raise EmbeddingError(
+                f"埋め込みの次元({vectors.shape[-1]})が切り詰め後の次元({self.dimension})より小さいです"
+            )
+        return truncate_vectors(vectors, self.dimension)
+
+
+def embedding_dimension(embedder) -> int | None:
+    """埋め込みベクトルの次元を決定（切り詰め設定、明示設定、試し埋め込みの順に参照）
+
+    試し埋め込みに失敗した場合は None を返し、既存コレクションの次元に従う。
+    """
+    if isinstance(embedder, TruncatedEmbedder):
+        return embedder.dimension
+
+    model_type = Config.get("model_type", default="ollama").lower()
+    configured = Config.get(model_type, "embed_dimension", default=0)
+    if configured:
+        return configured
+
+    try:
+        dimension = int(embedder.embed(PROBE_TEXT).shape[0])
+    except Exception as e:
+        logger.warning(f"試し埋め込みで次元を検出できませんでした（既存コレクションの次元を使用します）: {e}")
+        return None
+    logger.info(f"埋め込みベクトルの次元を検出しました: {dimension}")
+    return dimension
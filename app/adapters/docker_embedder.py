@@ -3,7 +3,10 @@ from __future__ import annotations
 import requests
 
 from ..core.exceptions import EmbeddingError
+from ..core.vectors import Vector, VectorMatrix, as_matrix, as_vector
 from ..utils.config import Config
+from ..utils.deadline import deadline_error, timeout_for
+from ..utils.fastjson import loads
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -12,20 +15,20 @@ logger = get_logger(__name__)
 class DockerEmbedder:
     """Docker埋め込みモデルのアダプター（llama.cpp互換API使用）"""
     
-    def __init__(self) -> None:
-        self.base_url = Config.get("docker", "base_url")
+    def __init__(self, base_url: str | None = None) -> None:
+        self.base_url = base_url or Config.get("docker", "base_url")
         self.embed_endpoint = Config.get("docker", "embed_endpoint")
         self.embed_model = Config.get("docker", "embed_model")
         self.headers = {"Content-Type": "application/json"}
         
-    def embed(self, text: str) -> list[float]:
+    def embed(self, text: str) -> Vector:
         """テキストを埋め込みベクトルに変換"""
         clean_text = text.strip()
         if not clean_text:
             raise EmbeddingError("空のテキストは埋め込みできません")
         return self._generate_embedding(clean_text)
     
-    def _generate_embedding(self, text: str) -> list[float]:
+    def _generate_embedding(self, text: str) -> Vector:
         """埋め込みベクトルを生成"""
         data = {
             "model": self.embed_model,
@@ -35,21 +38,66 @@ class DockerEmbedder:
         
         try:
             url = f"{self.base_url}{self.embed_endpoint}"
-            response = requests.post(url, json=data, headers=self.headers, timeout=30)
+            response = requests.post(url, json=data, headers=self.headers, timeout=timeout_for(30))
             response.raise_for_status()
             
-            result = response.json()
+            result = loads(response.content)
             data_list = result.get("data", [])
             
             if not data_list or not data_list[0].get("embedding"):
                 raise EmbeddingError("埋め込みベクトルが取得できませんでした")
             
-            embedding = data_list[0]["embedding"]
-            return [float(x) for x in embedding]
+            return as_vector(data_list[0]["embedding"])
                     
         except requests.RequestException as e:
+            if (error := deadline_error("埋め込み生成")) is not None:
+                raise error from None
             logger.error(f"Docker埋め込み生成リクエストエラー: {e}")
             raise EmbeddingError(f"埋め込み生成に失敗しました: {e}") from e
         except Exception as e:
             logger.error(f"Docker埋め込み生成エラー: {e}")
-            raise EmbeddingError(f"予期しないエラー: {e}") from e
\ No newline at end of file
+            raise EmbeddingError(f"予期しないエラー: {e}") from e
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストを1回のリクエストで埋め込みベクトルに変換"""
+        clean_texts = [text.strip() for text in texts]
+        if not clean_texts or not all(clean_texts):
+            raise EmbeddingError("空のテキストは埋め込みできません")
+        return self._generate_embeddings(clean_texts)
+
+    def _generate_embeddings(self, texts: list[str]) -> VectorMatrix:
+        """埋め込みベクトルをまとめて生成"""
+        data = {
+            "model": self.embed_model,
+            "input": texts,
+            "encoding_format": "float"
+        }
+        
+        try:
+            url = f"{self.base_url}{self.embed_endpoint}"
+            response = requests.post(url, json=data, headers=self.headers, timeout=timeout_for(30))
+            response.raise_for_status()
+            
+            data_list = loads(response.content).get("data", [])
+            if len(data_list) != len(texts):
+                raise EmbeddingError("埋め込みベクトルの件数が一致しません")
+            
+            data_list = sorted(data_list, key=lambda item: item.get("index", 0))
+            return as_matrix([item["embedding"] for item in data_list])
+                    
+        except requests.RequestException as e:
+            if (error := deadline_error("埋め込み生成")) is not None:
+                raise error from None
+            logger.error(f"Docker一括埋め込み生成リクエストエラー: {e}")
+            raise EmbeddingError(f"埋め込み生成に失敗しました: {e}") from e
+        except Exception as e:
+            logger.error(f"Docker一括埋め込み生成エラー: {e}")
+            raise EmbeddingError(f"予期しないエラー: {e}") from e
+
+    def health_check(self) -> bool:
+        """埋め込みサーバーが応答するか確認"""
+        try:
+            response = requests.get(f"{self.base_url}/models", headers=self.headers, timeout=5)
+            return response.ok
+        except requests.RequestException:
+            return False
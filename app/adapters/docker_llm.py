@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
 
-from ..core.exceptions import LLMError
+from ..core.exceptions import DeadlineExceededError, LLMError
 from ..utils.config import Config
+from ..utils.deadline import check_deadline, deadline_error, on_cancel, timeout_for
+from ..utils.fastjson import loads
+from ..utils.io import shutdown_socket
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -12,48 +19,127 @@ logger = get_logger(__name__)
 class DockerLLMClient:
     """Docker LLMクライアント（llama.cpp互換API使用）"""
     
-    def __init__(self) -> None:
-        self.base_url = Config.get("docker", "base_url")
+    def __init__(self, base_url: str | None = None) -> None:
+        self.base_url = base_url or Config.get("docker", "base_url")
         self.chat_endpoint = Config.get("docker", "chat_endpoint")
         self.model = Config.get("docker", "model")
         self.system_prompt = Config.get("docker", "system_prompt")
         self.headers = {"Content-Type": "application/json"}
 
-    def chat(self, query: str, context: str) -> str:
-        """質問と文脈を使って回答を生成"""
+    def chat(self, query: str, context: str, model: str | None = None) -> str:
+        """質問と文脈を使って回答を生成（model を指定すると設定のモデルの代わりに使う）"""
         clean_query = query.strip()
         if not clean_query:
             raise LLMError("質問が空です")
-        return self._generate_response(clean_query, context)
+        return self._generate_response(clean_query, context, model or self.model)
     
-    def _generate_response(self, query: str, context: str) -> str:
-        """LLMレスポンスを生成"""
+    def _generate_response(self, query: str, context: str, model: str) -> str:
+        """LLMレスポンスを生成（ストリーミングで受信し、期限切れ・切断時は途中で打ち切る）"""
         prompt = f"{self.system_prompt}\n\n質問:\n{query}\n参考文書:\n{context}"
         
         data = {
-            "model": self.model,
+            "model": model,
             "messages": [
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": f"質問:\n{query}\n参考文書:\n{context}"}
             ],
+            "stream": True,
         }
+        parts: list[str] = []
         
         try:
             url = f"{self.base_url}{self.chat_endpoint}"
-            response = requests.post(url, json=data, headers=self.headers, timeout=60)
-            response.raise_for_status()
-            
-            result = response.json()
-            choices = result.get("choices", [])
+            # ブロックを抜けると接続が閉じられ、サーバー側の生成も止まる
+            # 取り消されたら次の断片を待たずに接続を切る（応答ヘッダーまでの待ちはアダプターが打ち切る）
+            with (
+                _cancellable_session() as session,
+                session.post(url, json=data, headers=self.headers, timeout=timeout_for(60), stream=True) as response,
+                on_cancel(lambda: _abort_response(response)),
+            ):
+                response.raise_for_status()
+                for content in _iter_stream_content(response):
+                    check_deadline("回答生成", "".join(parts))
+                    parts.append(content)
             
-            if not choices or not choices[0].get("message", {}).get("content"):
+            answer = "".join(parts).strip()
+            if not answer:
                 raise LLMError("LLMから回答が得られませんでした")
             
-            return choices[0]["message"]["content"].strip()
+            return answer
                     
+        except DeadlineExceededError:
+            raise
         except requests.RequestException as e:
+            if (error := deadline_error("回答生成", "".join(parts))) is not None:
+                raise error from None
             logger.error(f"Docker LLM呼び出しエラー: {e}")
             raise LLMError(f"回答生成に失敗しました: {e}") from e
         except Exception as e:
             logger.error(f"Docker LLM予期しないエラー: {e}")
-            raise LLMError(f"予期しないエラー: {e}") from e
\ No newline at end of file
+            raise LLMError(f"予期しないエラー: {e}") from e
+
+    def health_check(self) -> bool:
+        """LLMサーバーが応答するか確認"""
+        try:
+            response = requests.get(f"{self.base_url}/models", headers=self.headers, timeout=5)
+            return response.ok
+        except requests.RequestException:
+            return False
+
+
+class _CancelWhileWaiting:
+    """応答ヘッダーを待つ間に現在の期限が取り消されたら、接続を切って待ちを解くコネクション
+
+    プロンプトの処理中はサーバーが何も送らないため、受信を待つスレッドは取り消しに気付けない。
+    """
+
+    def getresponse(self, *args, **kwargs):
+        with on_cancel(lambda: shutdown_socket(self.sock)):
+            return super().getresponse(*args, **kwargs)
+
+
+class _CancellableHTTPConnection(_CancelWhileWaiting, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_CancelWhileWaiting, HTTPSConnection):
+    pass
+
+
+class _CancellableAdapter(HTTPAdapter):
+    """取り消し時に応答待ちを打ち切るコネクションを使うアダプター"""
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(*args, **kwargs)
+        pool.ConnectionCls = _CancellableHTTPSConnection if pool.scheme == "https" else _CancellableHTTPConnection
+        return pool
+
+
+def _cancellable_session() -> requests.Session:
+    """取り消し時に応答待ちを打ち切るセッションを作成（requests.post と同じく呼び出しごとに作る）"""
+    session = requests.Session()
+    adapter = _CancellableAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _abort_response(response: requests.Response) -> None:
+    """受信中の応答の接続を切り、受信待ちのスレッドを起こす"""
+    connection = getattr(response.raw, "connection", None)
+    if not shutdown_socket(getattr(connection, "sock", None)):
+        response.close()
+
+
+def _iter_stream_content(response: requests.Response) -> Iterator[str]:
+    """Server-Sent Events 形式の応答から生成されたテキストの断片を取り出す"""
+    for line in response.iter_lines():
+        if not line.startswith(b"data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            break
+        choices = loads(payload).get("choices", [])
+        content = choices[0].get("delta", {}).get("content") if choices else None
+        if content:
+            yield content
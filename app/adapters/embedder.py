@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+from urllib.parse import urlsplit
+
 import requests
 
 from ..core.exceptions import EmbeddingError
+from ..core.vectors import Vector, VectorMatrix, as_matrix, as_vector
 from ..utils.config import Config
+from ..utils.deadline import deadline_error, timeout_for
+from ..utils.fastjson import loads
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -12,37 +17,90 @@ logger = get_logger(__name__)
 class OllamaEmbedder:
     """Ollama埋め込みモデルのアダプター"""
     
-    def __init__(self) -> None:
-        self.embed_url = Config.get("ollama", "embed_url")
+    def __init__(self, embed_url: str | None = None, embed_batch_url: str | None = None) -> None:
+        self.embed_url = embed_url or Config.get("ollama", "embed_url")
+        self.embed_batch_url = (
+            embed_batch_url 
+            or Config.get("ollama", "embed_batch_url") 
+            or f"{self._server_root()}/api/embed"
+        )
         self.embed_model = Config.get("ollama", "embed_model")
         
-    def embed(self, text: str) -> list[float]:
+    def embed(self, text: str) -> Vector:
         """テキストを埋め込みベクトルに変換"""
         clean_text = text.strip()
         if not clean_text:
             raise EmbeddingError("空のテキストは埋め込みできません")
         return self._generate_embedding(clean_text)
     
-    def _generate_embedding(self, text: str) -> list[float]:
+    def _generate_embedding(self, text: str) -> Vector:
         """埋め込みベクトルを生成"""
         try:
             response = requests.post(
                 self.embed_url, 
                 json={"model": self.embed_model, "prompt": text},
-                timeout=30
+                timeout=timeout_for(30)
             )
             response.raise_for_status()
             
-            result = response.json()
+            result = loads(response.content)
             embedding = result.get("embedding", [])
             if not embedding:
                 raise EmbeddingError("埋め込みベクトルが取得できませんでした")
             
-            return [float(x) for x in embedding]
+            return as_vector(embedding)
                     
         except requests.RequestException as e:
+            if (error := deadline_error("埋め込み生成")) is not None:
+                raise error from None
             logger.error(f"埋め込み生成リクエストエラー: {e}")
             raise EmbeddingError(f"埋め込み生成に失敗しました: {e}") from e
         except Exception as e:
             logger.error(f"埋め込み生成エラー: {e}")
             raise EmbeddingError(f"予期しないエラー: {e}") from e
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストを1回のリクエストで埋め込みベクトルに変換"""
+        clean_texts = [text.strip() for text in texts]
+        if not clean_texts or not all(clean_texts):
+            raise EmbeddingError("空のテキストは埋め込みできません")
+        return self._generate_embeddings(clean_texts)
+
+    def _generate_embeddings(self, texts: list[str]) -> VectorMatrix:
+        """埋め込みベクトルをまとめて生成"""
+        try:
+            response = requests.post(
+                self.embed_batch_url,
+                # 上限を超えるチャンクを黙って切り詰めず、エラーにしてチャンク分割の誤りに気付けるようにする
+                json={"model": self.embed_model, "input": texts, "truncate": False},
+                timeout=timeout_for(30)
+            )
+            response.raise_for_status()
+            
+            embeddings = loads(response.content).get("embeddings", [])
+            if len(embeddings) != len(texts):
+                raise EmbeddingError("埋め込みベクトルの件数が一致しません")
+            
+            return as_matrix(embeddings)
+                    
+        except requests.RequestException as e:
+            if (error := deadline_error("埋め込み生成")) is not None:
+                raise error from None
+            logger.error(f"一括埋め込み生成リクエストエラー: {e}")
+            raise EmbeddingError(f"埋め込み生成に失敗しました: {e}") from e
+        except Exception as e:
+            logger.error(f"一括埋め込み生成エラー: {e}")
+            raise EmbeddingError(f"予期しないエラー: {e}") from e
+
+    def _server_root(self) -> str:
+        """埋め込みURLからサーバーのルートURLを取得"""
+        parsed = urlsplit(self.embed_url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def health_check(self) -> bool:
+        """埋め込みサーバーが応答するか確認"""
+        try:
+            response = requests.get(f"{self._server_root()}/api/tags", timeout=5)
+            return response.ok
+        except requests.RequestException:
+            return False
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
 from ..utils.config import Config
 from ..utils.logger import get_logger
-from .docker_embedder import DockerEmbedder
-from .docker_llm import DockerLLMClient
-from .embedder import OllamaEmbedder
-from .llm import OllamaOpenAIClient
+
+if TYPE_CHECKING:
+    from .pool import BackendPool
 
 logger = get_logger(__name__)
 
@@ -13,22 +15,124 @@ logger = get_logger(__name__)
 def create_llm_client():
     """設定に基づいてLLMクライアントを作成"""
     model_type = Config.get("model_type", default="ollama")
-    
+
+    # 使用するアダプターのみを読み込む
     if model_type.lower() == "docker":
+        from .docker_llm import DockerLLMClient
+
         logger.info("Docker LLMクライアントを使用します")
-        return DockerLLMClient()
+        build = lambda backend: DockerLLMClient(base_url=backend.get("base_url"))
     else:
+        from .llm import OllamaOpenAIClient
+
         logger.info("Ollama LLMクライアントを使用します")
-        return OllamaOpenAIClient()
+        build = lambda backend: OllamaOpenAIClient(base_url=backend.get("base_url"))
 
+    pool = _create_pool(model_type.lower(), build)
+    if pool is None:
+        client = build({})
+    else:
+        from .pool import PooledLLMClient
 
-def create_embedder():
-    """設定に基づいて埋め込みモデルを作成"""
-    model_type = Config.get("model_type", default="ollama")
+        client = PooledLLMClient(pool)
     
+    if Config.get("scheduler", "enabled", default=True):
+        from .scheduler import RequestScheduler, ScheduledLLMClient
+
+        client = ScheduledLLMClient(client, RequestScheduler.from_config("llm"))
+    return client
+
+
+def create_embedder(truncate: bool = True):
+    """設定に基づいて埋め込みモデルを作成（truncate が偽なら次元の切り詰めを行わない）"""
+    model_type = Config.get("model_type", default="ollama")
+
+    # 使用するアダプターのみを読み込む
     if model_type.lower() == "docker":
+        from .docker_embedder import DockerEmbedder
+
         logger.info("Docker埋め込みモデルを使用します")
-        return DockerEmbedder()
+        build = lambda backend: DockerEmbedder(base_url=backend.get("base_url"))
     else:
+        from .embedder import OllamaEmbedder
+
         logger.info("Ollama埋め込みモデルを使用します")
-        return OllamaEmbedder()
\ No newline at end of file
+        build = lambda backend: OllamaEmbedder(embed_url=backend.get("embed_url"))
+
+    pool = _create_pool(model_type.lower(), build)
+    if pool is None:
+        embedder = build({})
+    else:
+        from .pool import PooledEmbedder
+
+        embedder = PooledEmbedder(pool, hedge_delay=Config.get("pool", "embed_hedge_delay", default=0.0))
+    
+    # 同時実行数の自動調整はスケジューラーより内側で計測し、スケジューラーがあればその上限で実行枠を配る
+    limiter = None
+    if Config.get("adaptive_concurrency", "enabled", default=True):
+        from .adaptive import AdaptiveEmbedder, AdaptiveLimiter
+
+        limiter = AdaptiveLimiter.from_config()
+        scheduled = Config.get("scheduler", "enabled", default=True)
+        embedder = AdaptiveEmbedder(embedder, limiter, gate=not scheduled)
+        logger.info(f"埋め込みサーバーの同時実行数を自動調整します（初期値 {limiter.limit}, 上限 {limiter.max_limit}）")
+
+    if Config.get("scheduler", "enabled", default=True):
+        from .scheduler import RequestScheduler, ScheduledEmbedder
+
+        embedder = ScheduledEmbedder(embedder, RequestScheduler.from_config("embed", limiter=limiter))
+    if Config.get("batching", "enabled", default=True):
+        from .batcher import MicroBatchEmbedder
+
+        embedder = MicroBatchEmbedder.from_config(embedder)
+    
+    truncate_dim = Config.get(model_type.lower(), "embed_truncate_dim", default=0)
+    if truncate and truncate_dim:
+        from .dimension import TruncatedEmbedder
+
+        logger.info(f"埋め込みベクトルを{truncate_dim}次元に切り詰めます")
+        embedder = TruncatedEmbedder(embedder, truncate_dim)
+    return embedder
+
+
+def create_vector_store(dimension: int | None = None):
+    """設定に基づいてベクターストアを作成（シャードが設定されていれば束ねる）
+
+    dimension には埋め込みベクトルの次元を渡す（None なら既存コレクションの次元に従う）。
+    """
+    from .text_store import TextStore
+
+    text_store = TextStore.from_config()
+    if text_store is not None:
+        logger.info(f"チャンク本文をローカルの本文ストアに保存します: {text_store.path}")
+
+    if Config.get("qdrant", "shards", default=[]):
+        from .sharded_vectorstore import ShardedVectorStore
+
+        vector_store = ShardedVectorStore.from_config(text_store, dimension)
+        logger.info(f"{len(vector_store.shards)}シャードのQdrantを使用します")
+        return vector_store
+
+    from .vectorstore import QdrantVectorStore
+
+    return QdrantVectorStore(text_store=text_store, dimension=dimension)
+
+
+def _create_pool(model_type: str, build: Callable[[dict[str, Any]], Any]) -> BackendPool | None:
+    """複数バックエンドが設定されていればプールを作成"""
+    backend_configs = Config.get(model_type, "backends", default=[])
+    if not backend_configs:
+        return None
+
+    from .pool import Backend, BackendPool
+
+    backends = [
+        Backend(
+            name=backend.get("name") or backend.get("base_url") or backend.get("embed_url") or f"backend-{i}",
+            client=build(backend),
+            max_concurrency=Config.per_worker(backend.get("max_concurrency", 4)),
+        )
+        for i, backend in enumerate(backend_configs)
+    ]
+    logger.info(f"{len(backends)}台のバックエンドで負荷分散します")
+    return BackendPool.from_config(backends)
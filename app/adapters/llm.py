@@ -1,47 +1,113 @@
 from __future__ import annotations
 
-from openai import OpenAI
+import threading
 
-from ..core.exceptions import LLMError
+import httpx
+
+from ..core.exceptions import DeadlineExceededError, LLMError
 from ..utils.config import Config
+from ..utils.deadline import check_deadline, current_deadline, deadline_error, timeout_for
+from ..utils.io import shutdown_socket
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+_NO_KEEPALIVE = httpx.Limits(max_keepalive_connections=0)
+
 
 class OllamaOpenAIClient:
     """Ollama LLMクライアント（OpenAI互換API使用）"""
     
-    def __init__(self) -> None:
-        self.base_url = Config.get("ollama", "base_url")
+    def __init__(self, base_url: str | None = None) -> None:
+        self.base_url = base_url or Config.get("ollama", "base_url")
         self.model = Config.get("ollama", "model")
         self.system_prompt = Config.get("ollama", "system_prompt")
-        self.client = OpenAI(api_key="dummy", base_url=self.base_url)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI互換クライアントを取得（初回アクセス時に作成）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import DefaultHttpxClient, OpenAI
+                    # 取り消し時に切断できるよう、接続を使い回さずリクエストごとに接続する
+                    http_client = DefaultHttpxClient(
+                        limits=_NO_KEEPALIVE, event_hooks={"request": [_watch_cancel]}
+                    )
+                    self._client = OpenAI(api_key="dummy", base_url=self.base_url, http_client=http_client)
+        return self._client
 
-    def chat(self, query: str, context: str) -> str:
-        """質問と文脈を使って回答を生成"""
+    def chat(self, query: str, context: str, model: str | None = None) -> str:
+        """質問と文脈を使って回答を生成（model を指定すると設定のモデルの代わりに使う）"""
         clean_query = query.strip()
         if not clean_query:
             raise LLMError("質問が空です")
-        return self._generate_response(clean_query, context)
+        return self._generate_response(clean_query, context, model or self.model)
     
-    def _generate_response(self, query: str, context: str) -> str:
-        """LLMレスポンスを生成"""
+    def _generate_response(self, query: str, context: str, model: str) -> str:
+        """LLMレスポンスを生成（ストリーミングで受信し、期限切れ・切断時は途中で打ち切る）"""
         prompt = f"{self.system_prompt}\n\n質問:\n{query}\n参考文書:\n{context}"
+        parts: list[str] = []
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            stream = self.client.chat.completions.create(
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0,
-                timeout=60
+                timeout=timeout_for(60),
+                stream=True
             )
             
-            if not response.choices or not response.choices[0].message.content:
+            # ブロックを抜けると接続が閉じられ、サーバー側の生成も止まる（取り消し時は _watch_cancel が切断する）
+            with stream:
+                for chunk in stream:
+                    check_deadline("回答生成", "".join(parts))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+            
+            answer = "".join(parts).strip()
+            if not answer:
                 raise LLMError("LLMから回答が得られませんでした")
             
-            return response.choices[0].message.content.strip()
+            return answer
                     
+        except DeadlineExceededError:
+            raise
         except Exception as e:
+            if (error := deadline_error("回答生成", "".join(parts))) is not None:
+                raise error from None
             logger.error(f"LLM呼び出しエラー: {e}")
             raise LLMError(f"回答生成に失敗しました: {e}") from e
+
+    def health_check(self) -> bool:
+        """LLMサーバーが応答するか確認"""
+        try:
+            self.client.models.list(timeout=5)
+            return True
+        except Exception:
+            return False
+
+
+def _watch_cancel(request: httpx.Request) -> None:
+    """現在の期限が取り消されたら、このリクエストの接続を切るよう登録する（送信前のフック）
+
+    プロンプトの処理中はサーバーが何も送らず、受信を待つスレッドは次の断片が届くまで取り消しに気付けない。
+    接続したソケットを期限に登録しておき、取り消されたら切断して待ちを解き、サーバー側の生成も止めさせる。
+    期限はリクエストごとに作られるため、登録は期限とともに破棄する（切断済みのソケットの shutdown は何もしない）。
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return
+    deadline.check("回答生成")
+    parent_trace = request.extensions.get("trace")
+
+    def trace(event: str, info: dict) -> None:
+        if parent_trace is not None:
+            parent_trace(event, info)
+        if event == "connection.connect_tcp.complete":
+            sock = info["return_value"].get_extra_info("socket")
+            deadline.on_cancel(lambda: shutdown_socket(sock))
+
+    request.extensions = {**request.extensions, "trace": trace}
@@ -0,0 +1,265 @@
+"""
+文書パーサーのレジストリ
+
+各パーサーはテキスト片を遅延生成し、チャンカーへそのまま流し込めるようにする。
+入力にはファイルパスのほか、バイナリのファイルオブジェクトも渡せる。
+"""
+from __future__ import annotations
+
+import io
+import re
+import zipfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import BinaryIO, TextIO
+from xml.etree import ElementTree
+
+from ..core.exceptions import DocumentProcessingError
+from ..utils.config import Config
+
+Source = str | BinaryIO
+Extractor = Callable[[Source], Iterator[str]]
+
+
+@dataclass(frozen=True)
+class DocumentParser:
+    """拡張子ごとのテキスト抽出器"""
+    name: str
+    extract: Extractor
+    # True の場合、生成されたテキスト片（ページなど）ごとにチャンクを区切る
+    per_segment: bool = False
+    # True の場合、入力をシーク可能なファイルとして全体を受け取る必要がある
+    needs_seek: bool = False
+
+
+_PARSERS: dict[str, DocumentParser] = {}
+
+
+def register_parser(*extensions: str, name: str, per_segment: bool = False, needs_seek: bool = False):
+    """抽出関数をパーサーとして登録するデコレーター"""
+    def decorator(func: Extractor) -> Extractor:
+        parser = DocumentParser(name=name, extract=func, per_segment=per_segment, needs_seek=needs_seek)
+        for ext in extensions:
+            _PARSERS[ext.lower()] = parser
+        return func
+    return decorator
+
+
+def get_parser(ext: str) -> DocumentParser | None:
+    """拡張子に対応するパーサーを取得"""
+    return _PARSERS.get(ext.lower())
+
+
+def supported_extensions() -> frozenset[str]:
+    """登録済みの拡張子一覧を取得"""
+    return frozenset(_PARSERS)
+
+
+def _read_block_size() -> int:
+    """逐次読み込み時のブロックサイズを取得"""
+    return Config.get("chunking", "read_block_size", default=65536)
+
+
+def _source_name(source: Source) -> str:
+    """エラーメッセージ用に入力の名前を取得"""
+    return source if isinstance(source, str) else getattr(source, "name", "<stream>")
+
+
+@contextmanager
+def _open_text(source: Source) -> Iterator[TextIO]:
+    """入力をUTF-8のテキストストリームとして開く"""
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            yield f
+    else:
+        wrapper = io.TextIOWrapper(source, encoding="utf-8", errors="replace")
+        try:
+            yield wrapper
+        finally:
+            # 元のファイルオブジェクトは呼び出し元が閉じる
+            wrapper.detach()
+
+
+@register_parser(".txt", name="テキスト")
+def extract_txt(source: Source) -> Iterator[str]:
+    """テキストファイルを一定サイズずつ読み込む"""
+    block_size = _read_block_size()
+    try:
+        with _open_text(source) as f:
+            while block := f.read(block_size):
+                yield block
+    except Exception as e:
+        raise DocumentProcessingError(f"テキストファイル読み込みエラー ({_source_name(source)}): {e}") from e
+
+
+@register_parser(".pdf", name="PDF", per_segment=True, needs_seek=True)
+def extract_pdf(source: Source) -> Iterator[str]:
+    """PDFをページ単位で読み込む"""
+    import pdfplumber
+
+    try:
+        with pdfplumber.open(source) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                # 処理済みページのキャッシュを解放してメモリ使用量を抑える
+                page.close()
+                if page_text and page_text.strip():
+                    yield page_text.strip()
+    except Exception as e:
+        raise DocumentProcessingError(f"PDF読み込みエラー ({_source_name(source)}): {e}") from e
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_parser(".docx", name="Word", needs_seek=True)
+def extract_docx(source: Source) -> Iterator[str]:
+    """DOCXの本文を段落単位で逐次読み込む
+
+    python-docx は文書全体を木構造として展開するため、document.xml を直接 iterparse する。
+    """
+    try:
+        with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+            parts: list[str] = []
+            for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == f"{_W_NS}p":
+                        parts = []
+                    continue
+                if elem.tag == f"{_W_NS}t" and elem.text:
+                    parts.append(elem.text)
+                elif elem.tag == f"{_W_NS}tab":
+                    parts.append("\t")
+                elif elem.tag in (f"{_W_NS}br", f"{_W_NS}cr"):
+                    parts.append("\n")
+                elif elem.tag == f"{_W_NS}p":
+                    if paragraph := "".join(parts).strip():
+                        yield paragraph + "\n"
+                    parts = []
+                    elem.clear()
+    except Exception as e:
+        raise DocumentProcessingError(f"DOCX読み込みエラー ({_source_name(source)}): {e}") from e
+
+
+_MD_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_MD_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_MD_PREFIX_RE = re.compile(r"^\s{0,3}(?:#{1,6}\s+|>\s?|[-*+]\s+|\d+[.)]\s+)")
+# 強調記号は対になって文字列を囲む場合だけ外す（snake_case や a*b などはそのまま残す）
+_MD_STAR_RE = re.compile(r"(\*{1,3})(?=\S)(.+?)(?<=\S)\1")
+_MD_UNDERSCORE_RE = re.compile(r"(?<!\w)(_{1,3})(?=\S)(.+?)(?<=\S)\1(?!\w)")
+_MD_STRIKE_RE = re.compile(r"~~(?=\S)(.+?)(?<=\S)~~")
+_MD_CODE_RE = re.compile(r"(`+)(.+?)\1")
+_MD_TAG_RE = re.compile(r"<[^>]+>")
+
+
+@register_parser(".md", ".markdown", name="Markdown")
+def extract_markdown(source: Source) -> Iterator[str]:
+    """Markdownを行単位で読み込み、記法を除いた本文を返す"""
+    try:
+        with _open_text(source) as f:
+            in_code_block = False
+            for line_no, line in enumerate(f):
+                stripped = line.strip()
+                # フロントマターとコードフェンスの区切り行は除外
+                if line_no == 0 and stripped == "---":
+                    for front_line in f:
+                        if front_line.strip() == "---":
+                            break
+                    continue
+                if stripped.startswith(("```", "~~~")):
+                    in_code_block = not in_code_block
+                    continue
+                if in_code_block:
+                    yield line
+                    continue
+                if set(stripped) <= set("-|: ") and "-" in stripped:
+                    continue
+                text = _MD_IMAGE_RE.sub(r"\1", line)
+                text = _MD_LINK_RE.sub(r"\1", text)
+                text = _MD_PREFIX_RE.sub("", text)
+                yield _strip_inline_markup(text)
+    except Exception as e:
+        raise DocumentProcessingError(f"Markdown読み込みエラー ({_source_name(source)}): {e}") from e
+
+
+def _strip_inline_markup(text: str) -> str:
+    """インラインコードの外側からタグ・強調記号・表の区切りを除く（コードは記号を外して中身をそのまま残す）"""
+    parts: list[str] = []
+    last = 0
+    for match in _MD_CODE_RE.finditer(text):
+        parts.append(_strip_emphasis(text[last:match.start()]))
+        parts.append(match.group(2))
+        last = match.end()
+    parts.append(_strip_emphasis(text[last:]))
+    return "".join(parts)
+
+
+def _strip_emphasis(text: str) -> str:
+    """タグと対になった強調記号を外す
+
+    __init__ のように英数字の識別子を囲む下線は、強調ではなく名前の一部とみなして残す。
+    """
+    text = _MD_TAG_RE.sub("", text)
+    text = _MD_STRIKE_RE.sub(r"\1", text)
+    text = _MD_STAR_RE.sub(r"\2", text)
+    text = _MD_UNDERSCORE_RE.sub(
+        lambda m: m.group(0) if m.group(2).isascii() and m.group(2).isidentifier() else m.group(2), text
+    )
+    return text.replace("|", " ")
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """HTMLから本文テキストを取り出すパーサー"""
+
+    _SKIP_TAGS = {"script", "style", "noscript", "template", "head"}
+    _BLOCK_TAGS = {
+        "p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+        "section", "article", "table", "pre", "blockquote", "title",
+    }
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def drain(self) -> str:
+        """これまでに抽出したテキストを取り出す"""
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+@register_parser(".html", ".htm", name="HTML")
+def extract_html(source: Source) -> Iterator[str]:
+    """HTMLを一定サイズずつ解析して本文テキストを返す"""
+    block_size = _read_block_size()
+    parser = _HTMLTextExtractor()
+    try:
+        with _open_text(source) as f:
+            while block := f.read(block_size):
+                parser.feed(block)
+                if text := parser.drain():
+                    yield text
+        parser.close()
+        if text := parser.drain():
+            yield text
+    except Exception as e:
+        raise DocumentProcessingError(f"HTML読み込みエラー ({_source_name(source)}): {e}") from e
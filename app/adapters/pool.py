@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from ..core.exceptions import RAGException
+from ..utils.config import Config
+from ..utils.deadline import check_deadline, timeout_for
+from ..utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from ..core.vectors import Vector, VectorMatrix
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Backend:
+    """プール内の1つの推論サーバー"""
+    name: str
+    client: Any
+    max_concurrency: int
+    outstanding: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+    slots: threading.Semaphore = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.slots = threading.Semaphore(self.max_concurrency)
+
+    @property
+    def available(self) -> bool:
+        """リクエストを割り当て可能か"""
+        return self.ejected_until <= time.monotonic()
+
+    @property
+    def load(self) -> float:
+        """同時実行上限に対する処理中リクエストの割合"""
+        return self.outstanding / self.max_concurrency
+
+
+class BackendPool:
+    """複数の推論サーバーへの負荷分散とフェイルオーバーを行うプール
+
+    処理中リクエストが最も少ないサーバーを選び、連続して失敗したサーバーは一定時間切り離す。
+    切り離したサーバーはヘルスチェックで応答が確認できた時点で復帰させる。
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: float = 15.0,
+        acquire_timeout: float = 60.0,
+    ) -> None:
+        if not backends:
+            raise RAGException("バックエンドが1つも設定されていません")
+        self.backends = backends
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._turn = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._health_thread: threading.Thread | None = None
+
+    @classmethod
+    def from_config(cls, backends: list[Backend]) -> BackendPool:
+        """設定ファイルの [pool] からプールを作成"""
+        return cls(
+            backends,
+            max_failures=Config.get("pool", "max_failures", default=3),
+            eject_seconds=Config.get("pool", "eject_seconds", default=30.0),
+            health_interval=Config.get("pool", "health_interval", default=15.0),
+            acquire_timeout=Config.get("pool", "acquire_timeout", default=60.0),
+        )
+
+    def call(self, method: str, *args: Any) -> Any:
+        """空いているサーバーでメソッドを呼び出し、失敗時は別のサーバーで再試行"""
+        self._ensure_health_thread()
+        tried: set[str] = set()
+        last_error: Exception | None = None
+
+        while len(tried) < len(self.backends):
+            backend = self._acquire(exclude=tried)
+            if backend is None:
+                break
+            tried.add(backend.name)
+            try:
+                return self._invoke(backend, method, *args)
+            except Exception as e:
+                if not _is_backend_failure(e):
+                    raise
+                last_error = e
+                logger.warning(f"バックエンド {backend.name} で失敗したため別のサーバーで再試行します: {e}")
+
+        if last_error is not None:
+            raise last_error
+        raise RAGException("利用可能なバックエンドがありません")
+
+    def hedged_call(self, method: str, *args: Any, hedge_delay: float) -> Any:
+        """応答が遅い場合に別サーバーへ同じリクエストを送り、先に返った結果を使う"""
+        self._ensure_health_thread()
+        primary = self._acquire(exclude=set())
+        if primary is None:
+            raise RAGException("利用可能なバックエンドがありません")
+
+        executor = self._get_executor()
+        # 処理期限などのコンテキストをヘッジ用のスレッドにも引き継ぐ
+        context = contextvars.copy_context()
+        futures: dict[Future, Backend] = {
+            executor.submit(context.copy().run, self._invoke, primary, method, *args): primary
+        }
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            secondary = self._acquire(exclude={primary.name}, blocking=False)
+            if secondary is not None:
+                logger.debug(f"{primary.name} の応答が遅いため {secondary.name} にヘッジリクエストを送信します")
+                futures[executor.submit(context.copy().run, self._invoke, secondary, method, *args)] = secondary
+
+        pending = set(futures)
+        last_error: Exception | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        # すべて失敗した場合は通常の再試行にフォールバック
+        if last_error is not None and not _is_backend_failure(last_error):
+            raise last_error
+        return self.call(method, *args)
+
+    def _acquire(self, exclude: set[str], blocking: bool = True) -> Backend | None:
+        """負荷が最も低いサーバーの実行枠を確保"""
+        candidates = [b for b in self.backends if b.name not in exclude]
+        healthy = [b for b in candidates if b.available] or candidates
+        if not healthy:
+            return None
+
+        # 負荷が同じ場合は順番に割り当てる
+        with self._lock:
+            self._turn += 1
+            turn = self._turn
+        order = sorted(
+            enumerate(healthy), key=lambda item: (item[1].load, (item[0] - turn) % len(healthy))
+        )
+        for _, backend in order:
+            if backend.slots.acquire(blocking=False):
+                self._mark_started(backend)
+                return backend
+
+        if not blocking:
+            return None
+        # すべて上限に達している場合は最も負荷の低いサーバーの空きを待つ
+        backend = min(healthy, key=lambda b: b.load)
+        if not backend.slots.acquire(timeout=timeout_for(self.acquire_timeout)):
+            check_deadline("実行枠の確保")
+            raise RAGException(f"バックエンド {backend.name} の実行枠を確保できませんでした")
+        self._mark_started(backend)
+        return backend
+
+    def _mark_started(self, backend: Backend) -> None:
+        """処理中リクエスト数を加算"""
+        with self._lock:
+            backend.outstanding += 1
+
+    def _invoke(self, backend: Backend, method: str, *args: Any) -> Any:
+        """確保済みのサーバーでメソッドを実行し、結果を記録"""
+        try:
+            result = getattr(backend.client, method)(*args)
+        except Exception as e:
+            if _is_backend_failure(e):
+                self._record_failure(backend)
+            raise
+        else:
+            self._record_success(backend)
+            return result
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+            backend.slots.release()
+
+    def _record_success(self, backend: Backend) -> None:
+        """成功を記録して失敗回数をリセット"""
+        with self._lock:
+            backend.failures = 0
+
+    def _record_failure(self, backend: Backend) -> None:
+        """失敗を記録し、連続失敗が上限に達したら切り離す"""
+        with self._lock:
+            backend.failures += 1
+            if backend.failures >= self.max_failures and backend.available:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning(f"バックエンド {backend.name} を {self.eject_seconds}秒間切り離します")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """ヘッジリクエスト用のスレッドプールを取得"""
+        with self._lock:
+            if self._executor is None:
+                total = sum(b.max_concurrency for b in self.backends)
+                self._executor = ThreadPoolExecutor(max_workers=total, thread_name_prefix="backend-pool")
+            return self._executor
+
+    def _ensure_health_thread(self) -> None:
+        """ヘルスチェックスレッドを初回利用時に開始"""
+        if self._health_thread is not None or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._health_loop, name="backend-health", daemon=True
+                )
+                self._health_thread.start()
+
+    def _health_loop(self) -> None:
+        """定期的に各サーバーの状態を確認"""
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self) -> dict[str, bool]:
+        """全サーバーのヘルスチェックを実行し、状態を更新"""
+        status = {}
+        for backend in self.backends:
+            check = getattr(backend.client, "health_check", None)
+            healthy = bool(check()) if check else True
+            status[backend.name] = healthy
+            with self._lock:
+                if healthy and not backend.available:
+                    backend.ejected_until = 0.0
+                    backend.failures = 0
+                    logger.info(f"バックエンド {backend.name} を復帰させました")
+                elif not healthy and backend.available:
+                    backend.ejected_until = time.monotonic() + self.eject_seconds
+                    logger.warning(f"バックエンド {backend.name} がヘルスチェックに失敗したため切り離します")
+        return status
+
+    def stats(self) -> list[dict[str, Any]]:
+        """各サーバーの状態を取得"""
+        with self._lock:
+            return [
+                {
+                    "name": b.name,
+                    "outstanding": b.outstanding,
+                    "max_concurrency": b.max_concurrency,
+                    "failures": b.failures,
+                    "available": b.available,
+                }
+                for b in self.backends
+            ]
+
+
+def _is_backend_failure(error: BaseException) -> bool:
+    """サーバー側の障害による例外かを判定
+
+    アダプターは通信エラーや応答異常を原因付きで送出し、入力検証エラーは原因なしで送出する。
+    """
+    return not isinstance(error, RAGException) or error.__cause__ is not None
+
+
+class PooledEmbedder:
+    """複数の埋め込みサーバーに負荷分散する埋め込みモデル"""
+
+    def __init__(self, pool: BackendPool, hedge_delay: float = 0.0) -> None:
+        self.pool = pool
+        self.hedge_delay = hedge_delay
+
+    def embed(self, text: str) -> Vector:
+        """テキストを埋め込みベクトルに変換"""
+        if self.hedge_delay > 0 and len(self.pool.backends) > 1:
+            return self.pool.hedged_call("embed", text, hedge_delay=self.hedge_delay)
+        return self.pool.call("embed", text)
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストをまとめて埋め込みベクトルに変換"""
+        return self.pool.call("embed_batch", texts)
+
+
+class PooledLLMClient:
+    """複数のLLMサーバーに負荷分散するLLMクライアント"""
+
+    def __init__(self, pool: BackendPool) -> None:
+        self.pool = pool
+
+    def chat(self, query: str, context: str, model: str | None = None) -> str:
+        """質問と文脈を使って回答を生成"""
+        return self.pool.call("chat", query, context, model)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ..core.exceptions import RAGException
+from ..utils.config import Config
+from ..utils.fastjson import dumps
+from ..utils.logger import get_logger
+from ..utils.metrics import percentile
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class QueryLogEntry:
+    """質問応答1件分のログ"""
+    query: str
+    answer: str
+    latency_ms: float
+    cache_hit: bool
+    chunks: list[tuple[str, int | None, float]] = field(default_factory=list)
+    origin: str = "cli"
+    error: str | None = None
+    route: str | None = None
+    timestamp: float = field(default_factory=time.time)
+
+
+class QueryLog:
+    """追記専用の構造化クエリログ（SQLite）
+
+    呼び出し元はキューに積むだけで待たされず、書き込みはバックグラウンドのスレッドが
+    まとめて行う。APIの複数ワーカーから同じファイルに書き込めるよう WAL モードで開く。
+    """
+
+    def __init__(self, path: str | None = None, queue_size: int = 1024, batch_size: int = 64) -> None:
+        self.path = Path(path or Config.get("query_log", "path", default="log/query_log.sqlite3"))
+        self.batch_size = batch_size
+        self._queue: queue.Queue[QueryLogEntry | None] = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._dropped = 0
+
+    @classmethod
+    def from_config(cls) -> QueryLog | None:
+        """設定ファイルの [query_log] からクエリログを作成（無効なら None）"""
+        if not Config.get("query_log", "enabled", default=True):
+            return None
+        return cls(
+            queue_size=Config.get("query_log", "queue_size", default=1024),
+            batch_size=Config.get("query_log", "batch_size", default=64),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """ログDBに接続（テーブルがなければ作成）"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_log (
+                    timestamp REAL NOT NULL,
+                    origin TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    latency_ms REAL NOT NULL,
+                    cache_hit INTEGER NOT NULL,
+                    chunks TEXT NOT NULL,
+                    error TEXT,
+                    route TEXT
+                )
+                """
+            )
+            # 回答経路の列がない古いログDBには列を追加する
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(query_log)")}
+            if "route" not in columns:
+                conn.execute("ALTER TABLE query_log ADD COLUMN route TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_query_log_time ON query_log (timestamp)")
+            conn.commit()
+            return conn
+        except Exception as e:
+            raise RAGException(f"クエリログの初期化に失敗: {e}") from e
+
+    def record(self, entry: QueryLogEntry) -> None:
+        """ログをキューに積む（満杯なら捨てて呼び出し元を待たせない）"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 100 == 1:
+                logger.warning(f"クエリログの書き込みが追いつかないため{self._dropped}件を破棄しました")
+
+    def _ensure_started(self) -> None:
+        """書き込みスレッドを初回利用時に開始"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="query-log", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        """キューのログをまとめてDBへ書き込む"""
+        conn = self._connect()
+        try:
+            while True:
+                entry = self._queue.get()
+                batch = [entry]
+                while entry is not None and len(batch) < self.batch_size:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(entry)
+
+                entries = [e for e in batch if e is not None]
+                if entries:
+                    self._write(conn, entries)
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, entries: list[QueryLogEntry]) -> None:
+        """ログをDBへ書き込む"""
+        try:
+            conn.executemany(
+                """
+                INSERT INTO query_log (timestamp, origin, query, answer, latency_ms, cache_hit, chunks, error, route)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        e.timestamp, e.origin, e.query, e.answer, e.latency_ms,
+                        int(e.cache_hit), dumps(e.chunks), e.error, e.route,
+                    )
+                    for e in entries
+                ],
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"クエリログ書き込みエラー: {e}")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """キューに残ったログを書き終えてから書き込みスレッドを止める"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def frequent_queries(self, limit: int, window_hours: float) -> list[str]:
+        """直近の期間で頻度の高い質問を取得（エラーになった質問は除く）"""
+        if not self.path.exists():
+            return []
+        since = time.time() - window_hours * 3600
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT query, COUNT(*) AS n FROM query_log
+                WHERE timestamp >= ? AND error IS NULL
+                GROUP BY query ORDER BY n DESC, MAX(timestamp) DESC LIMIT ?
+                """,
+                (since, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+    def stats(self, window_hours: float) -> dict[str, float]:
+        """直近の期間の件数・キャッシュ利用率・レイテンシを集計"""
+        if not self.path.exists():
+            return {"count": 0, "cache_hit_rate": 0.0, "errors": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+        since = time.time() - window_hours * 3600
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT latency_ms, cache_hit, error IS NOT NULL FROM query_log WHERE timestamp >= ?",
+                (since,),
+            ).fetchall()
+        finally:
+            conn.close()
+        latencies = [row[0] for row in rows]
+        return {
+            "count": len(rows),
+            "cache_hit_rate": sum(row[1] for row in rows) / len(rows) if rows else 0.0,
+            "errors": sum(row[2] for row in rows),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+        }
+
+    def route_stats(self, window_hours: float) -> dict[str, dict[str, float]]:
+        """直近の期間の回答経路ごとの件数とレイテンシを集計（キャッシュ利用は除く）"""
+        if not self.path.exists():
+            return {}
+        since = time.time() - window_hours * 3600
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT route, latency_ms FROM query_log
+                WHERE timestamp >= ? AND route IS NOT NULL AND cache_hit = 0 AND error IS NULL
+                """,
+                (since,),
+            ).fetchall()
+        finally:
+            conn.close()
+        by_route: dict[str, list[float]] = {}
+        for route, latency in rows:
+            by_route.setdefault(route, []).append(latency)
+        return {
+            route: {"count": len(latencies), "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+            for route, latencies in sorted(by_route.items())
+        }
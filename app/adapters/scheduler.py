@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from ..utils.config import Config
+from ..utils.deadline import current_deadline
+from ..utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from ..core.vectors import Vector, VectorMatrix
+    from .adaptive import AdaptiveLimiter
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# 実行枠を待つ間に期限切れ・取り消しを確認する間隔
+_CANCEL_POLL_SECONDS = 0.1
+
+
+class Priority(IntEnum):
+    """推論リクエストの優先度クラス"""
+    INTERACTIVE = 0
+    TEXT = 1
+    BULK = 2
+
+
+_current_priority: ContextVar[Priority] = ContextVar("request_priority", default=Priority.INTERACTIVE)
+
+
+def current_priority() -> Priority:
+    """現在のコンテキストの優先度を取得"""
+    return _current_priority.get()
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """このブロック内で発行される推論リクエストの優先度を設定"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+@dataclass
+class _Ticket:
+    """実行枠の待ち札"""
+    priority: Priority
+    tag: float
+    seq: int
+    ready: bool = False
+
+
+class RequestScheduler:
+    """優先度クラスごとの重み付き公平キューで推論サーバーの実行枠を割り当てるスケジューラー
+
+    各クラスの待ち札には重みに反比例した仮想終了時刻を付け、最も早いものから実行する。
+    クラスごとに同時実行数の上限を設け、一括取り込みが実行枠を占有しないようにする。
+    limiter を渡すと全体の同時実行数はその上限に従い、クラスごとの上限も同じ割合で増減する。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        weights: dict[Priority, float],
+        max_outstanding: dict[Priority, int],
+        limiter: AdaptiveLimiter | None = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.weights = {p: max(weights.get(p, 1.0), 1e-6) for p in Priority}
+        self.max_outstanding = {p: max_outstanding.get(p, max_concurrency) for p in Priority}
+        self._cond = threading.Condition()
+        self._queues: dict[Priority, deque[_Ticket]] = {p: deque() for p in Priority}
+        self._outstanding = {p: 0 for p in Priority}
+        self._last_tag = {p: 0.0 for p in Priority}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._seq = itertools.count()
+        if limiter is not None:
+            # 実行枠を待つリクエストがあれば、リミッターは上限が足りていないとみなす
+            limiter.backlog = self.queued
+
+    @classmethod
+    def from_config(cls, resource: str, limiter: AdaptiveLimiter | None = None) -> RequestScheduler:
+        """設定ファイルの [scheduler] からスケジューラーを作成（上限はワーカー数で按分）"""
+        section = Config.get("scheduler", default={})
+        weights = section.get("weights", {})
+        limits = section.get("max_outstanding", {})
+        return cls(
+            max_concurrency=Config.per_worker(section.get(f"{resource}_concurrency", 4)),
+            weights={p: weights.get(p.name.lower(), 1.0) for p in Priority},
+            max_outstanding={
+                p: Config.per_worker(limits[p.name.lower()]) for p in Priority if p.name.lower() in limits
+            },
+            limiter=limiter,
+        )
+
+    def run(self, func: Callable[..., T], *args: Any) -> T:
+        """現在の優先度で実行枠を待ってから関数を実行"""
+        priority = _current_priority.get()
+        self._acquire(priority)
+        try:
+            return func(*args)
+        finally:
+            self._release(priority)
+
+    def _acquire(self, priority: Priority) -> None:
+        """実行枠が割り当てられるまで待機"""
+        with self._cond:
+            start = max(self._virtual_time, self._last_tag[priority])
+            ticket = _Ticket(priority, start + 1.0 / self.weights[priority], next(self._seq))
+            self._last_tag[priority] = ticket.tag
+            self._queues[priority].append(ticket)
+            self._dispatch()
+            deadline = current_deadline()
+            while not ticket.ready:
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                error = deadline.error("実行枠の待機")
+                if error is not None:
+                    # 期限切れ・取り消しのリクエストは待ち行列から外す
+                    self._queues[priority].remove(ticket)
+                    raise error
+                # 取り消しは条件変数に通知されないため一定間隔で確認する
+                self._cond.wait(timeout=min(deadline.remaining(), _CANCEL_POLL_SECONDS))
+
+    def _release(self, priority: Priority) -> None:
+        """実行枠を返却して次の待ち札に割り当てる"""
+        with self._cond:
+            self._running -= 1
+            self._outstanding[priority] -= 1
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """空いている実行枠を仮想終了時刻の早い待ち札に割り当てる（ロック保持中に呼ぶ）"""
+        dispatched = False
+        capacity = self._capacity()
+        while self._running < capacity:
+            best: _Ticket | None = None
+            for priority, queue in self._queues.items():
+                if not queue or self._outstanding[priority] >= self._class_limit(priority, capacity):
+                    continue
+                head = queue[0]
+                if best is None or (head.tag, head.seq) < (best.tag, best.seq):
+                    best = head
+            if best is None:
+                break
+
+            self._queues[best.priority].popleft()
+            best.ready = True
+            self._running += 1
+            self._outstanding[best.priority] += 1
+            self._virtual_time = max(self._virtual_time, best.tag - 1.0 / self.weights[best.priority])
+            dispatched = True
+
+        if dispatched:
+            self._cond.notify_all()
+
+    def queued(self) -> int:
+        """実行枠を待っているリクエスト数"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _capacity(self) -> int:
+        """全体の同時実行数の上限（リミッターがあればその現在値）"""
+        return self.limiter.limit if self.limiter is not None else self.max_concurrency
+
+    def _class_limit(self, priority: Priority, capacity: int) -> int:
+        """優先度クラスの同時実行数の上限（全体の上限に合わせて設定値を按分）"""
+        limit = self.max_outstanding[priority]
+        if self.limiter is None:
+            return limit
+        return max(1, round(limit * capacity / self.max_concurrency))
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """優先度クラスごとの待機数と実行数を取得"""
+        with self._cond:
+            return {
+                p.name.lower(): {"queued": len(self._queues[p]), "outstanding": self._outstanding[p]}
+                for p in Priority
+            }
+
+
+class ScheduledEmbedder:
+    """スケジューラー経由で埋め込みを実行するラッパー"""
+
+    def __init__(self, embedder, scheduler: RequestScheduler) -> None:
+        self.embedder = embedder
+        self.scheduler = scheduler
+
+    def embed(self, text: str) -> Vector:
+        """テキストを埋め込みベクトルに変換"""
+        return self.scheduler.run(self.embedder.embed, text)
+
+    def embed_batch(self, texts: list[str]) -> VectorMatrix:
+        """複数テキストをまとめて埋め込みベクトルに変換"""
+        return self.scheduler.run(self.embedder.embed_batch, texts)
+
+
+class ScheduledLLMClient:
+    """スケジューラー経由で回答生成を実行するラッパー"""
+
+    def __init__(self, llm_client, scheduler: RequestScheduler) -> None:
+        self.llm_client = llm_client
+        self.scheduler = scheduler
+
+    def chat(self, query: str, context: str, model: str | None = None) -> str:
+        """質問と文脈を使って回答を生成"""
+        return self.scheduler.run(self.llm_client.chat, query, context, model)
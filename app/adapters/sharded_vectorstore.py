@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import heapq
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from ..core.exceptions import VectorStoreError
+from ..core.models import SearchHit, SearchParams
+from ..core.vectors import Vector, VectorMatrix, as_matrix, as_vector
+from ..utils.config import Config
+from ..utils.deadline import check_deadline, timeout_for
+from ..utils.logger import get_logger
+from .vectorstore import QdrantVectorStore
+
+if TYPE_CHECKING:
+    from .text_store import TextStore
+
+logger = get_logger(__name__)
+
+
+def shard_for(source: str, shard_count: int) -> int:
+    """ソース名からシャード番号を決定（プロセスをまたいで安定なハッシュを使用）"""
+    digest = hashlib.blake2b(source.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+class ShardedVectorStore:
+    """複数のQdrantノード・コレクションをシャードとして束ねるベクターストア
+
+    登録はソース名のハッシュでシャードを決めて振り分け、検索は全シャードへ並列に
+    問い合わせて上位件数を統合する。時間内に応答しないシャードは除外して部分結果を返す。
+    """
+
+    def __init__(
+        self,
+        shards: list[QdrantVectorStore],
+        search_timeout: float = 2.0,
+        text_store: TextStore | None = None
+    ) -> None:
+        if not shards:
+            raise VectorStoreError("シャードが1つも設定されていません")
+        self.shards = shards
+        self.search_timeout = search_timeout
+        # 本文ストアは全シャードで共有し、統合後の上位件数分だけ本文を取得する
+        self.text_store = text_store
+        # 検索の待ち合わせ中に他の検索がスレッドを使い切らないよう余裕を持たせる
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(shards) * Config.per_worker(Config.get("qdrant", "shard_threads", default=8)),
+            thread_name_prefix="qdrant-shard",
+        )
+
+    @classmethod
+    def from_config(cls, text_store: TextStore | None = None, dimension: int | None = None) -> ShardedVectorStore:
+        """設定ファイルの [[qdrant.shards]] からベクターストアを作成"""
+        shards = [
+            QdrantVectorStore(
+                host=shard.get("host"),
+                port=shard.get("port"),
+                collection_name=shard.get("collection_name"),
+                path=shard.get("path"),
+                timeout=shard.get("timeout"),
+                text_store=text_store,
+                dimension=dimension,
+            )
+            for shard in Config.get("qdrant", "shards", default=[])
+        ]
+        return cls(shards, search_timeout=Config.get("qdrant", "search_timeout", default=2.0), text_store=text_store)
+
+    @property
+    def search_params(self) -> SearchParams:
+        """リクエストごとに指定がない場合の検索パラメータ"""
+        return self.shards[0].search_params
+
+    @property
+    def dimension(self) -> int | None:
+        """埋め込みベクトルの次元"""
+        return self.shards[0].dimension
+
+    def init_collection(self, size: int | None = None, distance: str = "Cosine") -> None:
+        """全シャードのコレクションを初期化"""
+        self._run_all(lambda shard: shard.init_collection(size, distance))
+
+    def recreate_collection(self) -> None:
+        """全シャードのコレクションを削除して作り直す"""
+        self._run_all(lambda shard: shard.recreate_collection())
+
+    def count(self) -> int:
+        """全シャードのポイント数の合計を取得"""
+        futures = [self._executor.submit(shard.count) for shard in self.shards]
+        self._wait_all(futures)
+        return sum(future.result() for future in futures)
+
+    def search(
+        self,
+        query_embed: Vector,
+        top_k: int = 3,
+        with_text: bool = True,
+        offset: int = 0,
+        score_threshold: float | None = None,
+        params: SearchParams | None = None,
+    ) -> list[SearchHit]:
+        """全シャードを並列に検索し、スコア上位の結果を統合（offset 件目から top_k 件を返す）"""
+        query_embed = as_vector(query_embed)
+        # 各シャードの先頭 offset + top_k 件を統合すれば全体の順位が決まる
+        limit = offset + top_k
+        # 本文ストアがなければ本文はペイロードにあるため、各シャードから取得する
+        shard_text = with_text and self.text_store is None
+        # 処理期限を各シャードの検索にも引き継ぐ
+        context = contextvars.copy_context()
+        futures = {
+            self._executor.submit(
+                context.copy().run, shard.search, query_embed, limit, shard_text, 0, score_threshold, params
+            ): index
+            for index, shard in enumerate(self.shards)
+        }
+        timeout = timeout_for(self.search_timeout)
+        done, not_done = wait(futures, timeout=timeout)
+
+        hits: list[SearchHit] = []
+        failures = 0
+        for future in done:
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                failures += 1
+                logger.warning(f"シャード{futures[future]}の検索に失敗: {e}")
+        for future in not_done:
+            future.cancel()
+            logger.warning(f"シャード{futures[future]}の検索が{timeout:.2f}秒以内に完了しませんでした")
+
+        if failures + len(not_done) == len(self.shards):
+            check_deadline("ベクトル検索")
+            raise VectorStoreError("すべてのシャードで検索に失敗しました")
+        hits = heapq.nlargest(limit, hits, key=lambda hit: hit.score)[offset:]
+        if with_text and self.text_store is not None:
+            hits = self.text_store.attach(hits)
+        return hits
+
+    def upsert_vectors(
+        self, 
+        ids: list[str], 
+        vectors: VectorMatrix, 
+        payloads: list[dict[str, Any]]
+    ) -> None:
+        """ソース名のハッシュでシャードに振り分けて登録"""
+        if not ids:
+            return
+        vectors = as_matrix(vectors)
+        if len(ids) != vectors.shape[0] or len(ids) != len(payloads):
+            raise VectorStoreError("ID・ベクトル・ペイロードの件数が一致しません")
+
+        groups: dict[int, list[int]] = defaultdict(list)
+        for row, payload in enumerate(payloads):
+            groups[shard_for(payload.get("source", ""), len(self.shards))].append(row)
+
+        futures = [
+            self._executor.submit(
+                self.shards[index].upsert_vectors,
+                [ids[row] for row in rows],
+                vectors[rows],
+                [payloads[row] for row in rows],
+            )
+            for index, rows in groups.items()
+        ]
+        self._wait_all(futures)
+
+    def retrieve_vectors(self, ids: list[str]) -> dict[str, Vector]:
+        """全シャードからIDを指定してベクトルを取得"""
+        if not ids:
+            return {}
+        futures = [self._executor.submit(shard.retrieve_vectors, ids) for shard in self.shards]
+        self._wait_all(futures)
+        vectors: dict[str, Vector] = {}
+        for future in futures:
+            vectors.update(future.result())
+        return vectors
+
+    def delete_source(self, source: str) -> int:
+        """ソースが振り分けられたシャードからポイントを削除"""
+        return self.shards[shard_for(source, len(self.shards))].delete_source(source)
+
+    def export_snapshot(self, path: str | Path, page_size: int | None = None) -> int:
+        """シャードごとのスナップショットを shard-NN ディレクトリに書き出す"""
+        return sum(
+            shard.export_snapshot(Path(path) / f"shard-{index:02d}", page_size)
+            for index, shard in enumerate(self.shards)
+        )
+
+    def import_snapshot(
+        self,
+        path: str | Path,
+        recreate: bool = False,
+        batch_size: int | None = None,
+        workers: int | None = None,
+    ) -> int:
+        """スナップショットを読み込み、ソース名で振り分けて登録
+
+        単一コレクションのスナップショットと、シャードごとのスナップショット
+        （shard-NN ディレクトリ）のどちらも読み込める。シャード数が変わっていても再配置される。
+        """
+        from .snapshot import MANIFEST_FILE, bulk_import, iter_snapshot, read_manifest
+
+        root = Path(path)
+        sources = [root] if (root / MANIFEST_FILE).exists() else sorted(root.glob("shard-*"))
+        if not sources:
+            raise VectorStoreError(f"スナップショットが見つかりません: {path}")
+        manifests = [read_manifest(source) for source in sources]
+        dimension = manifests[0].dimension
+        if any(manifest.dimension != dimension for manifest in manifests):
+            raise VectorStoreError("シャード間でスナップショットの次元が一致しません")
+
+        batch_size = batch_size or Config.get("snapshot", "import_batch_size", default=512)
+        workers = workers or Config.get("snapshot", "import_workers", default=4)
+        if any(shard.path for shard in self.shards):
+            # 組み込みモードのシャードは同時書き込みに対応していないため逐次登録する
+            workers = 1
+        if recreate:
+            self._run_all(lambda shard: shard.delete_collection())
+        self.init_collection(dimension, manifests[0].distance)
+
+        imported = 0
+        for source in sources:
+            imported += bulk_import(iter_snapshot(source, batch_size), self.upsert_vectors, workers)
+        logger.info(f"スナップショットから{imported}件のポイントを{len(self.shards)}シャードに登録しました")
+        return imported
+
+    def _run_all(self, func) -> None:
+        """全シャードで処理を並列に実行"""
+        self._wait_all([self._executor.submit(func, shard) for shard in self.shards])
+
+    @staticmethod
+    def _wait_all(futures) -> None:
+        """すべての処理の完了を待ち、失敗があれば例外を送出"""
+        wait(futures)
+        for future in futures:
+            error = future.exception()
+            if error is None:
+                continue
+            if isinstance(error, VectorStoreError):
+                raise error
+            raise VectorStoreError(f"シャードへの処理に失敗しました: {error}") from error
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import gzip
+import json
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import batched
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from ..core.exceptions import VectorStoreError
+from ..core.vectors import VectorMatrix
+from ..utils.fastjson import dumps, loads
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+POINTS_FILE = "points.jsonl.gz"
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotManifest:
+    """スナップショットの管理情報"""
+    collection: str
+    dimension: int
+    distance: str
+    count: int
+    format: int = SNAPSHOT_FORMAT
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotBatch:
+    """読み出し単位のポイント群（ベクトルはメモリマップ上の範囲を参照）"""
+    ids: list[str | int]
+    vectors: VectorMatrix
+    payloads: list[dict[str, Any]]
+
+
+def write_snapshot(
+    path: str | Path,
+    collection: str,
+    dimension: int,
+    distance: str,
+    count: int,
+    pages: Iterable[tuple[list[str | int], VectorMatrix, list[dict[str, Any]]]],
+) -> SnapshotManifest:
+    """ページ単位のポイントをスナップショットとして書き出す
+
+    ベクトルは float32 の .npy（メモリマップで読み書き可能）に、IDとペイロードは
+    gzip 圧縮した JSON Lines に書き出す。件数は事前に数えた値を上限とする。
+    """
+    target = Path(path)
+    target.mkdir(parents=True, exist_ok=True)
+    vectors = np.lib.format.open_memmap(
+        target / VECTORS_FILE, mode="w+", dtype=np.float32, shape=(count, dimension)
+    )
+    written = 0
+    try:
+        with gzip.open(target / POINTS_FILE, "wt", encoding="utf-8") as points:
+            for ids, page_vectors, payloads in pages:
+                room = count - written
+                if len(ids) > room:
+                    logger.warning("書き出し中にポイントが追加されたため、超過分は含めません")
+                    ids, page_vectors, payloads = ids[:room], page_vectors[:room], payloads[:room]
+                vectors[written:written + len(ids)] = page_vectors
+                points.writelines(
+                    dumps({"id": point_id, "payload": payload}) + "\n"
+                    for point_id, payload in zip(ids, payloads)
+                )
+                written += len(ids)
+                if written >= count:
+                    break
+        vectors.flush()
+    finally:
+        del vectors
+
+    manifest = SnapshotManifest(collection, dimension, distance, written)
+    (target / MANIFEST_FILE).write_text(
+        json.dumps(asdict(manifest), ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return manifest
+
+
+def read_manifest(path: str | Path) -> SnapshotManifest:
+    """スナップショットの管理情報を読み込む"""
+    manifest_file = Path(path) / MANIFEST_FILE
+    try:
+        manifest = SnapshotManifest(**json.loads(manifest_file.read_text(encoding="utf-8")))
+    except FileNotFoundError as e:
+        raise VectorStoreError(f"スナップショットが見つかりません: {path}") from e
+    except (TypeError, ValueError) as e:
+        raise VectorStoreError(f"スナップショットの管理情報が不正です: {e}") from e
+    if manifest.format != SNAPSHOT_FORMAT:
+        raise VectorStoreError(f"未対応のスナップショット形式です: {manifest.format}")
+    return manifest
+
+
+def iter_snapshot(path: str | Path, batch_size: int) -> Iterator[SnapshotBatch]:
+    """スナップショットをバッチ単位で読み出す（ベクトルはメモリマップで参照）"""
+    source = Path(path)
+    manifest = read_manifest(source)
+    vectors = np.load(source / VECTORS_FILE, mmap_mode="r")
+    if vectors.dtype != np.float32 or vectors.shape[1:] != (manifest.dimension,):
+        raise VectorStoreError("スナップショットのベクトル形式が管理情報と一致しません")
+
+    start = 0
+    with gzip.open(source / POINTS_FILE, "rt", encoding="utf-8") as points:
+        for lines in batched(points, batch_size):
+            records = [loads(line) for line in lines]
+            end = min(start + len(records), manifest.count)
+            records = records[:end - start]
+            if not records:
+                break
+            yield SnapshotBatch(
+                ids=[record["id"] for record in records],
+                vectors=vectors[start:end],
+                payloads=[record["payload"] for record in records],
+            )
+            start = end
+
+
+def bulk_import(
+    batches: Iterable[SnapshotBatch],
+    upsert: Callable[[list[str | int], VectorMatrix, list[dict[str, Any]]], None],
+    workers: int,
+) -> int:
+    """バッチを複数スレッドで並列に登録し、登録件数を返す"""
+    def run(batch: SnapshotBatch) -> int:
+        upsert(batch.ids, batch.vectors, batch.payloads)
+        return len(batch.ids)
+
+    imported = 0
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-import") as executor:
+        try:
+            for batch in batches:
+                # 読み込み済みのバッチが溜まりすぎないよう、送信中の数を制限する
+                if len(pending) >= workers * 2:
+                    imported += pending.popleft().result()
+                pending.append(executor.submit(run, batch))
+            while pending:
+                imported += pending.popleft().result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return imported
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import dataclasses
+import sqlite3
+import threading
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+
+from ..core.exceptions import VectorStoreError
+from ..core.models import SearchHit
+from ..utils.config import Config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# SQLite のプレースホルダ数の上限を超えないよう、IN 句は分割して問い合わせる
+_LOOKUP_BATCH = 500
+
+
+class TextStore:
+    """チャンク本文をポイントIDで引けるローカルの圧縮キーバリューストア（SQLite）
+
+    Qdrant のペイロードにはソース名などの小さなメタデータだけを残し、本文は zlib で
+    圧縮してここに保存する。検索時は最終的な上位件数分だけをまとめて取得する。
+    APIの複数ワーカーから同じファイルを読み書きできるよう WAL モードで開く。
+    """
+
+    def __init__(self, path: str | None = None, compress_level: int = 6) -> None:
+        self.path = Path(path or Config.get("text_store", "path", default="text_store/texts.sqlite3"))
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    @classmethod
+    def from_config(cls) -> TextStore | None:
+        """設定ファイルの [text_store] からストアを作成（無効なら None）"""
+        if not Config.get("text_store", "enabled", default=False):
+            return None
+        return cls(compress_level=Config.get("text_store", "compress_level", default=6))
+
+    def _connect(self) -> sqlite3.Connection:
+        """ストアDBへの接続を取得（初回のみ作成）"""
+        if self._conn is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS texts (
+                        point_id TEXT PRIMARY KEY,
+                        body BLOB NOT NULL
+                    ) WITHOUT ROWID
+                    """
+                )
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                raise VectorStoreError(f"本文ストアの初期化に失敗: {e}") from e
+        return self._conn
+
+    def put_many(self, items: Iterable[tuple[str, str]]) -> int:
+        """ポイントIDと本文の組をまとめて保存（既存のIDは上書き）"""
+        rows = [
+            (str(point_id), zlib.compress(text.encode("utf-8"), self.compress_level))
+            for point_id, text in items
+        ]
+        if not rows:
+            return 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("INSERT OR REPLACE INTO texts VALUES (?, ?)", rows)
+                conn.commit()
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"本文ストア書き込みエラー: {e}")
+            raise VectorStoreError(f"本文ストアへの書き込みに失敗しました: {e}") from e
+        return len(rows)
+
+    def get_many(self, point_ids: Iterable[str]) -> dict[str, str]:
+        """ポイントIDを指定して本文をまとめて取得（存在しないIDは含まない）"""
+        keys = list(dict.fromkeys(str(point_id) for point_id in point_ids))
+        texts: dict[str, str] = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                for start in range(0, len(keys), _LOOKUP_BATCH):
+                    batch = keys[start:start + _LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT point_id, body FROM texts WHERE point_id IN ({placeholders})", batch
+                    ).fetchall()
+                    texts.update((point_id, zlib.decompress(body).decode("utf-8")) for point_id, body in rows)
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"本文ストア読み込みエラー: {e}")
+            raise VectorStoreError(f"本文ストアからの読み込みに失敗しました: {e}") from e
+        return texts
+
+    def delete_many(self, point_ids: Iterable[str]) -> int:
+        """ポイントIDを指定して本文をまとめて削除"""
+        keys = [(str(point_id),) for point_id in point_ids]
+        if not keys:
+            return 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("DELETE FROM texts WHERE point_id = ?", keys)
+                conn.commit()
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"本文ストア削除エラー: {e}")
+            raise VectorStoreError(f"本文ストアからの削除に失敗しました: {e}") from e
+        return len(keys)
+
+    def attach(self, hits: list[SearchHit]) -> list[SearchHit]:
+        """本文を持たない検索結果に本文を補う"""
+        missing = [hit.point_id for hit in hits if not hit.text and hit.point_id]
+        if not missing:
+            return hits
+        texts = self.get_many(missing)
+        return [
+            dataclasses.replace(hit, text=texts.get(hit.point_id, "")) if not hit.text else hit
+            for hit in hits
+        ]
+
+    def clear(self) -> None:
+        """保存済みの本文をすべて削除"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("DELETE FROM texts")
+                conn.commit()
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            raise VectorStoreError(f"本文ストアの削除に失敗: {e}") from e
+
+    def count(self) -> int:
+        """保存済みの本文数を取得"""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM texts").fetchone()[0]
+
+    def close(self) -> None:
+        """DB接続を閉じる"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
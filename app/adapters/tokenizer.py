@@ -0,0 +1,48 @@
+"""
+チャンク分割に使う埋め込みモデルのトークン数の数え方
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from pathlib import Path
+
+from ..core.chunker import scaled_token_counter
+from ..utils.config import Config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def create_token_counter() -> Callable[[str], int]:
+    """設定に基づいてトークン数を数える関数を作成
+
+    embed_tokenizer にモデルのトークナイザー（tokenizer.json のパスまたは Hugging Face のモデル名）を
+    指定すると tokenizers で正確に数える。未指定・読み込み失敗時は文字種からの見積もりに
+    embed_token_margin 倍の余裕を持たせて使う。
+    """
+    model_type = Config.get("model_type", default="ollama").lower()
+    name = Config.get(model_type, "embed_tokenizer", default="")
+    if name:
+        counter = _load_tokenizer(name)
+        if counter is not None:
+            logger.info(f"埋め込みモデルのトークナイザーでトークン数を数えます: {name}")
+            return counter
+    return scaled_token_counter(Config.get(model_type, "embed_token_margin", default=1.25))
+
+
+def _load_tokenizer(name: str) -> Callable[[str], int] | None:
+    """tokenizers でトークナイザーを読み込む（使えなければ None）"""
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        logger.warning("tokenizers がインストールされていないため、トークン数は見積もりで数えます")
+        return None
+
+    try:
+        tokenizer = Tokenizer.from_file(name) if Path(name).is_file() else Tokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"トークナイザーを読み込めないため、トークン数は見積もりで数えます ({name}): {e}")
+        return None
+    # 切り詰めが設定されたトークナイザーでは長い文を数え損ねるため解除する
+    tokenizer.no_truncation()
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+import math
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from ..core.exceptions import VectorStoreError
-from ..core.models import SearchResult
+from ..core.models import SearchHit, SearchParams
+from ..core.vectors import Vector, VectorMatrix, as_matrix, as_vector
 from ..utils.config import Config
+from ..utils.deadline import current_deadline, deadline_error
 from ..utils.logger import get_logger
 
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+    from .text_store import TextStore
+
 logger = get_logger(__name__)
 
+# 検索結果として取得するペイロードのキー（本文は大きいため不要なら取得しない）
+_PAYLOAD_KEYS_WITHOUT_TEXT = ["source", "chunk_id", "metadata"]
+_PAYLOAD_KEYS = ["text", *_PAYLOAD_KEYS_WITHOUT_TEXT]
+
 
 class QdrantVectorStore:
     """Qdrantベクターストアのアダプター"""
@@ -18,73 +32,373 @@ class QdrantVectorStore:
         self, 
         host: str | None = None, 
         port: int | None = None, 
-        collection_name: str | None = None
+        collection_name: str | None = None,
+        path: str | None = None,
+        timeout: int | None = None,
+        text_store: TextStore | None = None,
+        dimension: int | None = None,
+        search_params: SearchParams | None = None
     ) -> None:
         self.host = host or Config.get("qdrant", "host")
         self.port = port or Config.get("qdrant", "port")
+        self.path = path or Config.get("qdrant", "path") or None
         self.collection = collection_name or Config.get("qdrant", "collection_name")
-        
+        self.timeout = timeout or Config.get("qdrant", "timeout")
+        # 指定するとチャンク本文はペイロードに含めず、ローカルの本文ストアに保存する
+        self.text_store = text_store
+        # 埋め込みベクトルの次元（None なら既存コレクションの次元に従う）
+        self.dimension = dimension
+        # リクエストごとに指定がない場合の検索パラメータ
+        self.search_params = search_params or default_search_params()
+        self._client: QdrantClient | None = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> QdrantClient:
+        """Qdrantクライアントを取得（初回アクセス時に接続）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    def _connect(self) -> QdrantClient:
+        """Qdrantクライアントを作成"""
+        from qdrant_client import QdrantClient
+
         try:
-            self.client = QdrantClient(host=self.host, port=self.port)
+            if self.path:
+                # 組み込み（ローカルファイル）モード
+                return QdrantClient(path=self.path)
+            return QdrantClient(host=self.host, port=self.port, timeout=self.timeout)
         except Exception as e:
             raise VectorStoreError(f"Qdrantクライアントの初期化に失敗: {e}") from e
 
-    def init_collection(self) -> None:
-        """コレクションを初期化"""
+    def init_collection(self, size: int | None = None, distance: str = "Cosine") -> None:
+        """コレクションを初期化（size の省略時は埋め込みベクトルの次元で作成）"""
+        from qdrant_client.models import Distance, VectorParams
+
+        size = size or self.dimension
         try:
-            if not self.client.collection_exists(self.collection):
-                self.client.create_collection(
-                    collection_name=self.collection,
-                    vectors_config=VectorParams(size=768, distance=Distance.COSINE),
-                )
-                logger.info(f"Qdrantコレクション '{self.collection}' を作成しました")
+            if self.client.collection_exists(self.collection):
+                existing = self.client.get_collection(self.collection).config.params.vectors.size
+                if self.dimension is None:
+                    self.dimension = existing
+                elif existing != self.dimension:
+                    # 再埋め込みで作り直せるよう、ここでは警告にとどめる
+                    logger.warning(
+                        f"コレクション '{self.collection}' の次元({existing})が埋め込みの次元({self.dimension})と"
+                        "一致しません。reembed でコレクションを作り直してください"
+                    )
+                return
+            if size is None:
+                raise VectorStoreError("埋め込みベクトルの次元を決定できないため、コレクションを作成できません")
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=size, distance=Distance(distance)),
+            )
+            logger.info(f"Qdrantコレクション '{self.collection}' を作成しました（{size}次元）")
+        except VectorStoreError:
+            raise
         except Exception as e:
             raise VectorStoreError(f"コレクション初期化に失敗: {e}") from e
 
-    def search(self, query_embed: list[float], top_k: int = 3) -> list[SearchResult]:
-        """ベクトル検索を実行"""
-        if not query_embed:
+    def recreate_collection(self) -> None:
+        """コレクションを削除して作り直す"""
+        self.delete_collection()
+        self.init_collection()
+
+    def count(self) -> int:
+        """コレクションのポイント数を取得"""
+        try:
+            return self.client.count(self.collection, exact=True).count
+        except Exception as e:
+            raise VectorStoreError(f"ポイント数の取得に失敗: {e}") from e
+
+    def search(
+        self,
+        query_embed: Vector,
+        top_k: int = 3,
+        with_text: bool = True,
+        offset: int = 0,
+        score_threshold: float | None = None,
+        params: SearchParams | None = None,
+    ) -> list[SearchHit]:
+        """ベクトル検索を実行
+
+        with_text が偽なら本文を取得しない（ペイロードの本文も本文ストアも参照しない）。
+        offset 件目から top_k 件を返し、score_threshold 未満の結果は除く。
+        params を省略すると設定ファイルの検索パラメータを使う。
+        """
+        if query_embed is None or len(query_embed) == 0:
             raise VectorStoreError("検索ベクトルが空です")
-        if len(query_embed) != 768:
-            raise VectorStoreError("無効な検索ベクトルです（768次元である必要があります）")
-        return self._perform_search(query_embed, top_k)
+        query_embed = as_vector(query_embed)
+        if self.dimension is not None and query_embed.shape[0] != self.dimension:
+            raise VectorStoreError(f"無効な検索ベクトルです（{self.dimension}次元である必要があります）")
+        hits = self._perform_search(
+            query_embed, top_k, offset, score_threshold, with_text, params or self.search_params
+        )
+        if with_text and self.text_store is not None:
+            # 最終的な上位件数分の本文だけをまとめて取得する
+            hits = self.text_store.attach(hits)
+        return hits
     
-    def _perform_search(self, query_embed: list[float], top_k: int) -> list[SearchResult]:
+    def _perform_search(
+        self,
+        query_embed: Vector,
+        top_k: int,
+        offset: int = 0,
+        score_threshold: float | None = None,
+        with_text: bool = True,
+        params: SearchParams | None = None,
+    ) -> list[SearchHit]:
         """実際の検索を実行"""
         try:
             hits = self.client.query_points(
                 collection_name=self.collection, 
                 query=query_embed, 
-                limit=top_k
+                limit=top_k,
+                offset=offset or None,
+                score_threshold=score_threshold,
+                with_payload=_PAYLOAD_KEYS if with_text else _PAYLOAD_KEYS_WITHOUT_TEXT,
+                search_params=_qdrant_search_params(params),
+                timeout=_server_timeout()
             )
             
             results = []
             if hits and hasattr(hits, "points") and hits.points:
                 for point in hits.points:
                     payload = point.payload or {}
-                    results.append(SearchResult(
-                        text=payload.get("text", ""),
-                        source=payload.get("source", ""),
-                        score=point.score or 0.0,
-                        chunk_id=payload.get("chunk_id")
+                    results.append(SearchHit(
+                        payload.get("text", ""),
+                        payload.get("source", ""),
+                        point.score or 0.0,
+                        payload.get("chunk_id"),
+                        str(point.id),
+                        payload.get("metadata"),
                     ))
             return results
                     
         except Exception as e:
+            if (error := deadline_error("ベクトル検索")) is not None:
+                raise error from None
             logger.error(f"ベクトル検索エラー: {e}")
             raise VectorStoreError(f"検索に失敗しました: {e}") from e
 
-    def upsert_points(self, points: list[PointStruct]) -> None:
-        """ポイントを挿入・更新"""
-        if not points:
+    def upsert_vectors(
+        self, 
+        ids: list[str], 
+        vectors: VectorMatrix, 
+        payloads: list[dict[str, Any]]
+    ) -> None:
+        """ベクトルとペイロードを挿入・更新"""
+        if not ids:
             return
-        self._upsert_to_qdrant(points)
+        vectors = as_matrix(vectors)
+        if len(ids) != vectors.shape[0] or len(ids) != len(payloads):
+            raise VectorStoreError("ID・ベクトル・ペイロードの件数が一致しません")
+        if self.text_store is not None:
+            payloads = self._move_texts(ids, payloads)
+        self._upsert_to_qdrant(ids, vectors, payloads)
+
+    def _move_texts(self, ids: list[str], payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """本文を本文ストアへ保存し、本文を除いたペイロードを返す
+
+        検索で本文のないポイントが返らないよう、Qdrant への登録より先に保存する。
+        """
+        self.text_store.put_many(
+            (point_id, payload["text"]) for point_id, payload in zip(ids, payloads) if "text" in payload
+        )
+        return [{key: value for key, value in payload.items() if key != "text"} for payload in payloads]
     
-    def _upsert_to_qdrant(self, points: list[PointStruct]) -> None:
-        """Qdrantにポイントを登録"""
+    def _upsert_to_qdrant(self, ids: list[str], vectors: VectorMatrix, payloads: list[dict[str, Any]]) -> None:
+        """Qdrantにポイントを登録（float32 配列のまま渡す）"""
         try:
-            self.client.upsert(collection_name=self.collection, points=points)
-            logger.info(f"Qdrantに{len(points)}件のポイントを登録しました")
+            self.client.upload_collection(
+                collection_name=self.collection,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                batch_size=len(ids),
+                wait=True,
+            )
+            logger.info(f"Qdrantに{len(ids)}件のポイントを登録しました")
         except Exception as e:
             logger.error(f"ポイント登録エラー: {e}")
             raise VectorStoreError(f"ポイント登録に失敗しました: {e}") from e
+
+    def retrieve_vectors(self, ids: list[str]) -> dict[str, Vector]:
+        """IDを指定して登録済みのベクトルを取得（存在しないIDは含まない）"""
+        if not ids:
+            return {}
+        try:
+            records = self.client.retrieve(
+                collection_name=self.collection, ids=ids, with_payload=False, with_vectors=True
+            )
+        except Exception as e:
+            logger.error(f"ベクトル取得エラー: {e}")
+            raise VectorStoreError(f"ベクトルの取得に失敗しました: {e}") from e
+        return {str(record.id): as_vector(record.vector) for record in records if record.vector}
+
+    def delete_source(self, source: str) -> int:
+        """ソースのポイントと本文をすべて削除し、削除した件数を返す"""
+        from qdrant_client.models import FieldCondition, Filter, MatchValue, PointIdsList
+
+        selector = Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))])
+        ids: list[str | int] = []
+        try:
+            if not self.client.collection_exists(self.collection):
+                return 0
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection,
+                    scroll_filter=selector,
+                    limit=1024,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                ids.extend(record.id for record in records)
+                if offset is None:
+                    break
+            if ids:
+                self.client.delete(self.collection, points_selector=PointIdsList(points=ids), wait=True)
+        except Exception as e:
+            logger.error(f"ポイント削除エラー: {e}")
+            raise VectorStoreError(f"ポイントの削除に失敗しました: {e}") from e
+        if ids and self.text_store is not None:
+            self.text_store.delete_many(str(point_id) for point_id in ids)
+        if ids:
+            logger.info(f"{source} の登録済みポイントを{len(ids)}件削除しました")
+        return len(ids)
+
+    def export_snapshot(self, path: str | Path, page_size: int | None = None) -> int:
+        """コレクションをスナップショット（float32 の .npy と圧縮ペイロード）に書き出す"""
+        from .snapshot import write_snapshot
+
+        page_size = page_size or Config.get("snapshot", "page_size", default=1024)
+        try:
+            params = self.client.get_collection(self.collection).config.params.vectors
+            count = self.client.count(self.collection, exact=True).count
+            manifest = write_snapshot(
+                path,
+                collection=self.collection,
+                dimension=params.size,
+                distance=str(params.distance.value),
+                count=count,
+                pages=self._scroll_pages(page_size),
+            )
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"スナップショット書き出しエラー: {e}")
+            raise VectorStoreError(f"スナップショットの書き出しに失敗しました: {e}") from e
+
+        logger.info(f"スナップショットに{manifest.count}件のポイントを書き出しました: {path}")
+        return manifest.count
+
+    def _scroll_pages(self, page_size: int) -> Iterator[tuple[list[str | int], VectorMatrix, list[dict[str, Any]]]]:
+        """コレクションをページ単位で読み出す"""
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if records:
+                payloads = [record.payload or {} for record in records]
+                if self.text_store is not None:
+                    # スナップショット単体で復元できるよう本文をペイロードに戻して書き出す
+                    texts = self.text_store.get_many(str(record.id) for record in records)
+                    for record, payload in zip(records, payloads):
+                        if "text" not in payload and str(record.id) in texts:
+                            payload["text"] = texts[str(record.id)]
+                yield (
+                    [record.id for record in records],
+                    as_matrix([record.vector for record in records]),
+                    payloads,
+                )
+            if offset is None:
+                return
+
+    def import_snapshot(
+        self,
+        path: str | Path,
+        recreate: bool = False,
+        batch_size: int | None = None,
+        workers: int | None = None,
+    ) -> int:
+        """スナップショットをコレクションへ並列に一括登録"""
+        from .snapshot import bulk_import, iter_snapshot, read_manifest
+
+        manifest = read_manifest(path)
+        batch_size = batch_size or Config.get("snapshot", "import_batch_size", default=512)
+        workers = workers or Config.get("snapshot", "import_workers", default=4)
+        if self.path:
+            # 組み込みモードは同時書き込みに対応していないため逐次登録する
+            workers = 1
+
+        if recreate:
+            self.delete_collection()
+        self.init_collection(manifest.dimension, manifest.distance)
+        self._check_dimension(manifest.dimension)
+
+        imported = bulk_import(iter_snapshot(path, batch_size), self.upsert_vectors, workers)
+        logger.info(f"スナップショットから{imported}件のポイントを登録しました: {path}")
+        return imported
+
+    def delete_collection(self) -> None:
+        """コレクションが存在すれば削除"""
+        try:
+            if self.client.collection_exists(self.collection):
+                self.client.delete_collection(self.collection)
+                if self.text_store is not None:
+                    self.text_store.clear()
+                logger.info(f"Qdrantコレクション '{self.collection}' を削除しました")
+        except Exception as e:
+            raise VectorStoreError(f"コレクション削除に失敗: {e}") from e
+
+    def _check_dimension(self, dimension: int) -> None:
+        """既存コレクションのベクトル次元が一致するか確認"""
+        try:
+            size = self.client.get_collection(self.collection).config.params.vectors.size
+        except Exception as e:
+            raise VectorStoreError(f"コレクション情報の取得に失敗: {e}") from e
+        if size != dimension:
+            raise VectorStoreError(
+                f"コレクションの次元({size})とスナップショットの次元({dimension})が一致しません"
+            )
+
+
+def _server_timeout() -> int | None:
+    """処理期限の残り時間を Qdrant サーバー側の検索タイムアウト（秒単位の整数）に換算"""
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return max(1, math.ceil(deadline.remaining()))
+
+
+def default_search_params() -> SearchParams:
+    """設定ファイルの [qdrant] から既定の検索パラメータを作成（0 や未指定は Qdrant の既定値）"""
+    return SearchParams(
+        hnsw_ef=Config.get("qdrant", "hnsw_ef", default=0) or None,
+        exact=Config.get("qdrant", "exact", default=False),
+        rescore=Config.get("qdrant", "quantization_rescore", default=None),
+        oversampling=Config.get("qdrant", "quantization_oversampling", default=0) or None,
+    )
+
+
+def _qdrant_search_params(params: SearchParams | None):
+    """検索パラメータを Qdrant の型に変換（すべて既定値なら None）"""
+    if params is None or params == SearchParams():
+        return None
+    from qdrant_client import models
+
+    quantization = None
+    if params.rescore is not None or params.oversampling is not None:
+        quantization = models.QuantizationSearchParams(rescore=params.rescore, oversampling=params.oversampling)
+    return models.SearchParams(hnsw_ef=params.hnsw_ef, exact=params.exact, quantization=quantization)
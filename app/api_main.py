@@ -1,33 +1,72 @@
 from __future__ import annotations
 
+import asyncio
 import os
-import shutil
-import tempfile
+import time
+from collections.abc import Awaitable
 from contextlib import asynccontextmanager
-from pathlib import Path
+from typing import TypeVar
 
-from fastapi import FastAPI, File, UploadFile, status
+from anyio import to_thread
+from fastapi import FastAPI, Request
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .adapters.factory import create_embedder, create_llm_client
-from .adapters.vectorstore import QdrantVectorStore
-from .core.exceptions import RAGException
+from .adapters.adaptive import find_adaptive_limiter
+from .adapters.dimension import embedding_dimension
+from .adapters.factory import create_embedder, create_llm_client, create_vector_store
+from .adapters.query_log import QueryLog
+from .core.exceptions import (
+    DeadlineExceededError,
+    InvalidRequestError,
+    OverloadedError,
+    RAGException,
+    RequestCancelledError,
+    UploadLimitError,
+)
 from .core.models import (
+    BulkTextRecord,
+    BulkTextResult,
+    BulkTextSummary,
     DirectoryRequest,
     DocumentIngestResponse,
+    EmbeddingConcurrencyResponse,
     ErrorResponse,
     FileUploadResponse,
     QAResponse,
     RegisterTextRequest,
+    SearchResponse,
     TextRegisterResponse,
+    UploadLimitResponse,
 )
+from .services.bulk_text_service import BulkTextService
 from .services.document_ingest_service import DocumentIngestService
-from .services.qa_service import QAService
+from .services.qa_service import QAService, normalize_query
+from .services.search_service import SearchService
+from .services.upload_service import StreamingUploadService
+from .utils.concurrency import AdmissionController, SingleFlight
+from .utils.config import Config
+from .utils.deadline import Deadline
+from .utils.fastjson import dumps
 from .utils.logger import get_logger
 
 logger = get_logger("fastapi")
 
+T = TypeVar("T")
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """リクエストボディを読みながら応答を返すストリーミングレスポンス
+
+    StreamingResponse は切断検知のために受信メッセージを読み捨てるため、ボディの受信と
+    競合しないよう送信だけを行う（切断はボディの受信側で ClientDisconnect として検知される）。
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -35,16 +74,28 @@ async def lifespan(app: FastAPI):
     logger.info("FastAPI起動: リソースを初期化中...")
     
     try:
+        # ブロッキング処理用スレッドプールの大きさをワーカー数で按分
+        threadpool_size = Config.get("server", "threadpool_size", default=40)
+        to_thread.current_default_thread_limiter().total_tokens = Config.per_worker(threadpool_size)
+        
         # 各コンポーネントを初期化
         app.state.embedder = create_embedder()
-        app.state.vector_store = QdrantVectorStore()
+        dimension = await run_in_threadpool(embedding_dimension, app.state.embedder)
+        app.state.vector_store = create_vector_store(dimension)
         await run_in_threadpool(app.state.vector_store.init_collection)
         app.state.llm_client = create_llm_client()
         
         # サービスを初期化
+        app.state.query_log = QueryLog.from_config()
         app.state.qa_service = QAService(
             app.state.llm_client, 
             app.state.embedder, 
+            app.state.vector_store,
+            query_log=app.state.query_log,
+            origin="api"
+        )
+        app.state.search_service = SearchService.from_config(
+            app.state.qa_service.embed_query,
             app.state.vector_store
         )
         app.state.document_ingest_service = DocumentIngestService(
@@ -52,9 +103,31 @@ async def lifespan(app: FastAPI):
             app.state.vector_store
         )
         
+        app.state.upload_service = StreamingUploadService.from_config(
+            app.state.document_ingest_service.ingest_stream
+        )
+        app.state.bulk_text_service = BulkTextService.from_config(
+            app.state.document_ingest_service.register_text_batch
+        )
+        
+        # 質問応答の同時実行制御
+        app.state.qa_admission = AdmissionController.from_config("api")
+        app.state.qa_flight = SingleFlight()
+        
+        # 頻出の質問でキャッシュを温める（起動を待たせないようバックグラウンドで実行）
+        app.state.prewarm_task = None
+        if Config.get("cache", "prewarm_on_startup", default=True):
+            _schedule_prewarm()
+        
         logger.info("FastAPI起動完了")
         yield
         
+        await _drain_inflight(app, Config.get("server", "drain_timeout", default=60.0))
+        if app.state.prewarm_task is not None:
+            app.state.prewarm_task.cancel()
+        if app.state.query_log is not None:
+            await run_in_threadpool(app.state.query_log.close)
+        
     except Exception as e:
         logger.error(f"FastAPI初期化エラー: {e}")
         raise
@@ -65,20 +138,70 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 
 
-@app.get("/", response_model=QAResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def ask_question(q: str = None):
-    """質問応答エンドポイント"""
+@app.get(
+    "/", 
+    response_model=QAResponse, 
+    responses={
+        400: {"model": ErrorResponse}, 
+        429: {"model": ErrorResponse}, 
+        500: {"model": ErrorResponse}, 
+        503: {"model": ErrorResponse},
+        504: {"model": ErrorResponse},
+    },
+)
+async def ask_question(request: Request, q: str = None):
+    """質問応答エンドポイント（処理期限を超えた場合は縮退した回答を返す）"""
     if not q or not q.strip():
         return JSONResponse(
             ErrorResponse(error="クエリパラメータ 'q' が必要です").model_dump(), 
             status_code=400
         )
     
+    query = q.strip()
+    # 受付時点から処理期限を数える（実行枠の待ち時間も含む）
+    deadline = Deadline.from_config()
     try:
-        answer = await run_in_threadpool(app.state.qa_service.answer, q.strip())
+        # キャッシュ済みの回答は実行枠を確保せずに返す
+        cached = app.state.qa_service.cached_answer(query)
+        if cached is not None:
+            return QAResponse(question=query, answer=cached)
+        
+        # 同一の質問が処理中であれば、その結果を共有する
+        answer, degraded = await _unless_disconnected(
+            request,
+            app.state.qa_flight.run(
+                _coalesce_key(query), 
+                lambda: _answer_with_admission(query, deadline)
+            ),
+        )
         return QAResponse(
-            question=q.strip(),
-            answer=answer
+            question=query,
+            answer=answer,
+            degraded=degraded
+        )
+    except OverloadedError as e:
+        logger.warning(f"質問応答の受付を拒否しました: {e}")
+        if Config.get("search", "fallback_on_overload", default=False):
+            fallback = await _fallback_answer(query)
+            if fallback is not None:
+                return QAResponse(question=query, answer=fallback, degraded=True)
+        return JSONResponse(
+            ErrorResponse(error=str(e)).model_dump(), 
+            status_code=e.status_code,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except RequestCancelledError as e:
+        logger.info(f"質問応答を取り消しました: {e}")
+        # 切断済みのクライアントには届かない（nginx の 499 Client Closed Request に倣う）
+        return JSONResponse(
+            ErrorResponse(error=str(e)).model_dump(), 
+            status_code=499
+        )
+    except DeadlineExceededError as e:
+        logger.warning(f"質問応答の処理期限切れ: {e}")
+        return JSONResponse(
+            ErrorResponse(error=f"処理期限内に回答できませんでした: {str(e)}").model_dump(), 
+            status_code=504
         )
     except RAGException as e:
         logger.error(f"質問応答エラー: {e}")
@@ -94,6 +217,86 @@ async def ask_question(q: str = None):
         )
 
 
+@app.get(
+    "/search",
+    response_model=SearchResponse,
+    response_model_exclude_none=True,
+    responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 504: {"model": ErrorResponse}},
+)
+async def search(
+    q: str = None,
+    top_k: int | None = None,
+    offset: int = 0,
+    score_threshold: float | None = None,
+    fields: str | None = None,
+    hnsw_ef: int | None = None,
+    exact: bool | None = None,
+    rescore: bool | None = None,
+    oversampling: float | None = None,
+):
+    """検索エンドポイント（LLMを使わずに順位付きのチャンクとスコアを返す）
+
+    fields にカンマ区切りで source, chunk_id, text, point_id, metadata を指定すると、その項目だけを返す。
+    hnsw_ef・exact・rescore・oversampling を指定すると、設定ファイルの検索パラメータを上書きする。
+    """
+    if not q or not q.strip():
+        return JSONResponse(
+            ErrorResponse(error="クエリパラメータ 'q' が必要です").model_dump(), 
+            status_code=400
+        )
+    
+    projection = frozenset(field.strip() for field in fields.split(",") if field.strip()) if fields else None
+    try:
+        return await run_in_threadpool(
+            app.state.search_service.search, 
+            q.strip(), 
+            top_k, 
+            offset, 
+            score_threshold, 
+            projection,
+            {"hnsw_ef": hnsw_ef, "exact": exact, "rescore": rescore, "oversampling": oversampling}
+        )
+    except InvalidRequestError as e:
+        return JSONResponse(
+            ErrorResponse(error=str(e)).model_dump(), 
+            status_code=400
+        )
+    except DeadlineExceededError as e:
+        logger.warning(f"検索の処理期限切れ: {e}")
+        return JSONResponse(
+            ErrorResponse(error=f"処理期限内に検索できませんでした: {str(e)}").model_dump(), 
+            status_code=504
+        )
+    except RAGException as e:
+        logger.error(f"検索エラー: {e}")
+        return JSONResponse(
+            ErrorResponse(error=f"検索に失敗しました: {str(e)}").model_dump(), 
+            status_code=500
+        )
+    except Exception as e:
+        logger.error(f"予期しないエラー: {e}")
+        return JSONResponse(
+            ErrorResponse(error="内部サーバーエラーが発生しました").model_dump(), 
+            status_code=500
+        )
+
+
+@app.get(
+    "/embedding/concurrency",
+    response_model=EmbeddingConcurrencyResponse,
+    responses={404: {"model": ErrorResponse}},
+)
+async def embedding_concurrency():
+    """埋め込みサーバーの同時実行数の現在の上限と観測レイテンシを返す"""
+    limiter = find_adaptive_limiter(app.state.embedder)
+    if limiter is None:
+        return JSONResponse(
+            ErrorResponse(error="同時実行数の自動調整は無効になっています").model_dump(), 
+            status_code=404
+        )
+    return EmbeddingConcurrencyResponse(**limiter.stats())
+
+
 @app.post("/documents/", response_model=DocumentIngestResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
 async def ingest_documents(request: DirectoryRequest):
     """ディレクトリ内の文書を一括登録"""
@@ -108,6 +311,7 @@ async def ingest_documents(request: DirectoryRequest):
             app.state.document_ingest_service.ingest, 
             request.directory
         )
+        _after_reindex(prewarm=True)
         return DocumentIngestResponse(
             message="文書の登録が完了しました",
             directory=request.directory
@@ -127,56 +331,64 @@ async def ingest_documents(request: DirectoryRequest):
         )
 
 
-@app.post("/upload/", response_model=FileUploadResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def upload_files(files: list[UploadFile] = File(...)):
-    """複数ファイルをアップロードして登録"""
-    if not files:
+@app.post(
+    "/upload/", 
+    response_model=FileUploadResponse, 
+    responses={400: {"model": ErrorResponse}, 413: {"model": UploadLimitResponse}, 500: {"model": ErrorResponse}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                        "required": ["files"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_files(request: Request):
+    """複数ファイルを受信しながら登録（受信済みのファイルから順に埋め込みを開始）"""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
         return JSONResponse(
-            ErrorResponse(error="ファイルが選択されていません").model_dump(), 
+            ErrorResponse(error="multipart/form-data で送信してください").model_dump(), 
             status_code=400
         )
     
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            saved_files = []
-            skipped_files = []
-            
-            for file in files:
-                if not file.filename:
-                    continue
-                    
-                ext = Path(file.filename).suffix.lower()
-                if ext not in {".pdf", ".txt"}:
-                    skipped_files.append(file.filename)
-                    logger.warning(f"未対応ファイル形式: {file.filename}")
-                    continue
-                
-                dest_file = temp_path / file.filename
-                await run_in_threadpool(_save_upload_file, file, dest_file)
-                saved_files.append(str(dest_file))
-            
-            if not saved_files:
-                return JSONResponse(
-                    ErrorResponse(error="有効なPDFまたはTXTファイルがありません").model_dump(), 
-                    status_code=400
-                )
-            
-            await run_in_threadpool(
-                app.state.document_ingest_service.store_qdrant, 
-                saved_files
-            )
-            
-            message = f"{len(saved_files)}個のファイルを登録しました"
-            if skipped_files:
-                message += f" ({len(skipped_files)}個のファイルをスキップ)"
-            
-            return FileUploadResponse(
-                message=message,
-                processed_files=len(saved_files),
-                skipped_files=skipped_files
+        result = await app.state.upload_service.ingest(content_type, request.stream())
+        
+        if not result.processed:
+            error = "対応形式のファイルがありません" if not result.skipped else "ファイルを登録できませんでした"
+            return JSONResponse(
+                ErrorResponse(error=error).model_dump(), 
+                status_code=400
             )
-            
+        
+        _after_reindex(prewarm=True)
+        message = f"{len(result.processed)}個のファイルを登録しました"
+        if result.skipped:
+            message += f" ({len(result.skipped)}個のファイルをスキップ)"
+        
+        return FileUploadResponse(
+            message=message,
+            processed_files=len(result.processed),
+            skipped_files=result.skipped
+        )
+    
+    except UploadLimitError as e:
+        logger.warning(f"アップロードサイズ超過: {e}")
+        if e.committed:
+            # 中断前に登録を終えたファイルは残るため、キャッシュ済みの回答を捨てる
+            _after_reindex(prewarm=True)
+        return JSONResponse(
+            UploadLimitResponse(error=str(e), committed_files=e.committed).model_dump(), 
+            status_code=413
+        )
     except RAGException as e:
         logger.error(f"ファイルアップロードエラー: {e}")
         return JSONResponse(
@@ -200,6 +412,7 @@ async def register_text(request: RegisterTextRequest):
             request.text, 
             request.source
         )
+        _after_reindex(prewarm=False)
         
         return TextRegisterResponse(
             message=f"{n_chunks}個のチャンクを登録しました",
@@ -221,7 +434,126 @@ async def register_text(request: RegisterTextRequest):
         )
 
 
-def _save_upload_file(upload_file: UploadFile, destination: Path) -> None:
-    """アップロードファイルを保存"""
-    with destination.open("wb") as out_file:
-        shutil.copyfileobj(upload_file.file, out_file)
+@app.post(
+    "/text/bulk/",
+    responses={
+        200: {
+            "description": "レコードごとの結果と最終行の集計（NDJSON）",
+            "content": {
+                "application/x-ndjson": {
+                    "schema": {
+                        "oneOf": [BulkTextResult.model_json_schema(), BulkTextSummary.model_json_schema()]
+                    }
+                }
+            },
+        },
+        400: {"model": ErrorResponse},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": BulkTextRecord.model_json_schema()}},
+        }
+    },
+)
+async def register_text_bulk(request: Request):
+    """NDJSON の各行（text, source, metadata）を受信しながらまとめて登録し、結果を逐次返す"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        return JSONResponse(
+            ErrorResponse(error="application/x-ndjson で送信してください").model_dump(), 
+            status_code=400
+        )
+
+    async def stream_results():
+        registered = False
+        try:
+            async for item in app.state.bulk_text_service.register(request.stream()):
+                registered = registered or bool(getattr(item, "chunks", 0))
+                yield dumps(item.model_dump(exclude_none=True)) + "\n"
+        finally:
+            if registered:
+                _after_reindex(prewarm=False)
+
+    return _DuplexStreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+async def _drain_inflight(app: FastAPI, timeout: float) -> None:
+    """終了前に処理中の回答生成が終わるのを待つ"""
+    deadline = time.monotonic() + timeout
+    while app.state.qa_admission.active or app.state.qa_flight.inflight:
+        if time.monotonic() >= deadline:
+            logger.warning("処理中の回答生成が残ったまま終了します")
+            return
+        await asyncio.sleep(0.1)
+    logger.info("処理中の回答生成はありません")
+
+
+async def _answer_with_admission(query: str, deadline: Deadline | None) -> tuple[str, bool]:
+    """実行枠を確保してから質問応答を実行し、回答と縮退の有無を返す"""
+    async with app.state.qa_admission.admit():
+        future = asyncio.ensure_future(
+            run_in_threadpool(app.state.qa_service.answer_with_status, query, deadline)
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if deadline is not None:
+                # スレッドは外から止められないため、取り消しを通知して推論サーバーへの要求を打ち切らせる
+                deadline.cancel()
+            # スレッドが取り消しに気付いて終了するまで実行枠を保持する
+            await asyncio.gather(future, return_exceptions=True)
+            raise
+
+
+async def _unless_disconnected(request: Request, awaitable: Awaitable[T]) -> T:
+    """クライアントの切断を監視しながら待機し、切断されたら待機を取り消す"""
+    task = asyncio.ensure_future(awaitable)
+    interval = Config.get("deadline", "disconnect_poll_interval", default=0.5)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise RequestCancelledError("クライアントが切断したため回答生成を取り消しました")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _fallback_answer(query: str) -> str | None:
+    """回答生成の代わりに検索結果から抽出した回答を作成（失敗時は None）"""
+    try:
+        hits = await run_in_threadpool(app.state.search_service.hits, query, app.state.qa_service.top_k)
+    except RAGException as e:
+        logger.warning(f"検索による代替回答に失敗: {e}")
+        return None
+    return app.state.qa_service.fallback_answer(query, hits)
+
+
+def _coalesce_key(query: str) -> str:
+    """質問の集約キーを生成（空白の違いは同一視）"""
+    return normalize_query(query)
+
+
+def _after_reindex(prewarm: bool) -> None:
+    """文書の登録後に回答キャッシュを破棄し、必要なら事前計算をやり直す"""
+    app.state.qa_service.invalidate_answers()
+    if prewarm and Config.get("cache", "prewarm_after_reindex", default=True):
+        _schedule_prewarm()
+
+
+def _schedule_prewarm() -> None:
+    """キャッシュの事前計算をバックグラウンドで開始（実行中なら何もしない）"""
+    task = app.state.prewarm_task
+    if task is not None and not task.done():
+        return
+    app.state.prewarm_task = asyncio.create_task(run_in_threadpool(app.state.qa_service.prewarm))
+    app.state.prewarm_task.add_done_callback(_log_prewarm_error)
+
+
+def _log_prewarm_error(task: asyncio.Task) -> None:
+    """事前計算の失敗をログに残す"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"キャッシュの事前計算に失敗: {task.exception()}")
@@ -0,0 +1,393 @@
+"""
+CLI の非対話サブコマンド（cron などから無人で実行する）
+"""
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import batched, islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .core.exceptions import RAGException
+from .utils.config import Config
+from .utils.fastjson import dumps
+from .utils.logger import get_logger
+from .utils.metrics import format_summary, percentile, summarize_latencies
+from .utils.progress import ProgressBar
+
+if TYPE_CHECKING:
+    from .cli_main import ServiceContainer
+    from .core.vectors import VectorMatrix
+
+logger = get_logger(__name__)
+
+
+def read_questions(path: str) -> list[str]:
+    """質問ファイルを読み込む（1行1問、空行と # で始まる行は無視）"""
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except OSError as e:
+        raise RAGException(f"質問ファイルを読み込めません: {e}") from e
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_ingest(services: ServiceContainer, target_dir: str, workers: int) -> int:
+    """ディレクトリ内の文書を並列に登録"""
+    if not Path(target_dir).is_dir():
+        raise RAGException(f"ディレクトリが見つかりません: {target_dir}")
+
+    document_service = services.document_service
+    files = document_service.get_registerable_files(target_dir)
+    if not files:
+        print("登録可能なファイルが見つかりません")
+        return 0
+
+    progress = ProgressBar(len(files), label="登録")
+    chunks = document_service.store_qdrant(
+        files,
+        workers=workers,
+        on_file_done=lambda _, stored: progress.update(failed=stored is None),
+    )
+    progress.close()
+    services.invalidate_answers()
+
+    elapsed = max(progress.elapsed, 1e-9)
+    print(
+        f"{len(files) - progress.failed}/{len(files)}ファイル {chunks}チャンクを{elapsed:.1f}秒で登録 "
+        f"({len(files) / elapsed:.2f}ファイル/秒, {chunks / elapsed:.1f}チャンク/秒)"
+    )
+    print_embed_concurrency(services.embedder)
+    return progress.failed
+
+
+def print_embed_concurrency(embedder) -> None:
+    """埋め込みサーバーの同時実行数の自動調整結果を表示"""
+    from .adapters.adaptive import find_adaptive_limiter
+
+    limiter = find_adaptive_limiter(embedder)
+    if limiter is None:
+        return
+    stats = limiter.stats()
+    latency = f"{stats['latency_ms']:.1f}ms" if stats["latency_ms"] is not None else "-"
+    print(
+        f"埋め込み同時実行数: {stats['limit']} (範囲 {stats['min_limit']}-{stats['max_limit']}, "
+        f"引き下げ {stats['decreases']}回, 過負荷応答 {stats['overloads']}回, レイテンシ {latency})"
+    )
+
+
+def run_ask(services: ServiceContainer, question_file: str, concurrency: int, out: str | None) -> int:
+    """質問ファイルの質問を並列に回答し、結果を JSON Lines に書き出す"""
+    questions = read_questions(question_file)
+    if not questions:
+        print("質問がありません")
+        return 0
+
+    qa_service = services.qa_service
+    latencies: list[float] = []
+
+    def ask(index: int, question: str) -> dict[str, Any]:
+        start = time.perf_counter()
+        record: dict[str, Any] = {"line": index, "question": question}
+        try:
+            result = qa_service.get_qa_result(question)
+            record.update(answer=result.answer, sources=result.sources, cache_hit=result.cache_hit)
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+    progress = ProgressBar(len(questions), label="回答")
+    output = Path(out).open("w", encoding="utf-8") if out else None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ask") as executor:
+            futures = [executor.submit(ask, i, q) for i, q in enumerate(questions, start=1)]
+            # 完了した順に書き出す（line で元の順序に並べ替えられる）
+            for future in as_completed(futures):
+                record = future.result()
+                latencies.append(record["latency_ms"])
+                if output is not None:
+                    output.write(dumps(record) + "\n")
+                    output.flush()
+                else:
+                    print(dumps(record))
+                progress.update(failed="error" in record)
+    finally:
+        progress.close()
+        if output is not None:
+            output.close()
+
+    print(f"回答: {format_summary(summarize_latencies(latencies, progress.elapsed), unit='問')}")
+    if progress.failed:
+        print(f"失敗: {progress.failed}問")
+    return progress.failed
+
+
+def run_stats(services: ServiceContainer, window_hours: float) -> None:
+    """チャンクストア・ベクターストア・クエリログの統計を表示"""
+    document_service = services.document_service
+    chunk_store = document_service.chunk_store
+    print("【チャンクストア】")
+    if chunk_store is None:
+        print("  無効")
+    else:
+        print(f"  ソース数: {len(chunk_store.sources())}")
+        print(f"  チャンク数: {chunk_store.count()}")
+
+    print("【ベクターストア】")
+    print(f"  ポイント数: {services.vector_store.count()}")
+    text_store = services.vector_store.text_store
+    if text_store is not None:
+        print(f"  本文ストア: {text_store.count()}件")
+
+    print(f"【クエリログ（直近{window_hours:g}時間）】")
+    query_log = services.query_log
+    if query_log is None:
+        print("  無効")
+        return
+    stats = query_log.stats(window_hours)
+    print(f"  質問数: {stats['count']}  エラー: {stats['errors']}")
+    print(f"  キャッシュ利用率: {stats['cache_hit_rate']:.1%}")
+    print(f"  レイテンシ: p50 {stats['p50_ms']:.1f}ms  p95 {stats['p95_ms']:.1f}ms")
+    for route, route_stats in query_log.route_stats(window_hours).items():
+        print(
+            f"  経路 {route}: {route_stats['count']}件  "
+            f"p50 {route_stats['p50_ms']:.1f}ms  p95 {route_stats['p95_ms']:.1f}ms"
+        )
+
+
+def run_bench(
+    services: ServiceContainer,
+    question_file: str | None,
+    mode: str,
+    concurrency: int,
+    repeat: int,
+) -> None:
+    """埋め込み・検索・回答生成のスループットとレイテンシを計測"""
+    questions = _benchmark_questions(services, question_file)
+
+    embedder = services.embedder
+    vector_store = services.vector_store
+    operations: dict[str, Callable[[str], Any]] = {
+        "embed": embedder.embed,
+        "search": lambda q: vector_store.search(embedder.embed(q)),
+        "answer": lambda q: services.qa_service.answer(q),
+    }
+    operation = operations[mode]
+    workload = questions * repeat
+
+    # 1回目の接続確立などを計測から外す
+    operation(questions[0])
+
+    latencies: list[float] = []
+    errors = 0
+
+    def timed(question: str) -> float | None:
+        start = time.perf_counter()
+        try:
+            operation(question)
+        except Exception as e:
+            logger.warning(f"計測中のエラー: {e}")
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    progress = ProgressBar(len(workload), label=f"計測({mode})")
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+        for latency in executor.map(timed, workload):
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+            progress.update(failed=latency is None)
+    progress.close()
+
+    print(f"{mode} (同時実行数 {concurrency}): {format_summary(summarize_latencies(latencies, progress.elapsed), unit='回')}")
+    if errors:
+        print(f"エラー: {errors}回")
+
+
+def run_dim_bench(
+    services: ServiceContainer,
+    question_file: str | None,
+    dimensions: list[int],
+    sample: int,
+    top_k: int,
+) -> None:
+    """切り詰めた次元での検索結果を全次元の検索結果と比較し、再現率を表示
+
+    チャンクストアのチャンクを切り詰めなしで埋め込み、質問ごとの上位 top_k 件を
+    全次元と各次元の総当たり検索で求めて一致率（recall@k）を計算する。
+    """
+    import numpy as np
+
+    from .adapters.chunk_store import ChunkStore
+    from .adapters.factory import create_embedder
+    from .core.vectors import truncate_vectors
+
+    questions = _benchmark_questions(services, question_file)
+    if not Config.get("chunk_store", "enabled", default=True):
+        raise RAGException("チャンクストアが無効になっています")
+    texts = [chunk.text for chunk in islice(ChunkStore().iter_chunks(), sample)]
+    if not texts:
+        raise RAGException("チャンクストアにチャンクがありません")
+
+    embedder = create_embedder(truncate=False)
+    progress = ProgressBar(len(texts) + len(questions), label="埋め込み")
+    documents = _embed_all(embedder, texts, progress)
+    queries = _embed_all(embedder, questions, progress)
+    progress.close()
+
+    full = documents.shape[1]
+    k = min(top_k, len(texts))
+
+    def nearest(dimension: int) -> np.ndarray:
+        scores = truncate_vectors(queries, dimension) @ truncate_vectors(documents, dimension).T
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    truth = nearest(full)
+    print(f"チャンク{len(texts)}件・質問{len(questions)}問で比較（全{full}次元）")
+    for dimension in sorted({d for d in dimensions if 0 < d < full} | {full}):
+        found = nearest(dimension)
+        recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)])
+        print(
+            f"  {dimension:>5}次元: recall@{k} {recall:.3f}  "
+            f"1ベクトル {dimension * 4}バイト（{dimension / full:.0%}）"
+        )
+
+
+def run_tune_search(
+    services: ServiceContainer,
+    question_file: str | None,
+    ks: list[int],
+    efs: list[int],
+    oversampling: list[float],
+    target: float,
+) -> None:
+    """検索パラメータの組み合わせごとに総当たり検索に対する再現率とレイテンシを計測し、推奨値を表示
+
+    質問ファイルの各行は「質問」または「質問<TAB>正解のソース名」。正解のソース名があれば
+    上位 k 件に正解が含まれる割合も求め、top_k の推奨に使う。
+    """
+    from .core.models import SearchParams
+
+    labelled = _labelled_questions(services, question_file)
+    questions = [question for question, _ in labelled]
+    ks = sorted({k for k in ks if k > 0})
+    if not ks:
+        raise RAGException("計測する件数（--ks）を指定してください")
+
+    progress = ProgressBar(len(questions), label="埋め込み")
+    queries = _embed_all(services.embedder, questions, progress)
+    progress.close()
+
+    grid: list[SearchParams] = []
+    for ef in dict.fromkeys([0, *efs]):
+        if not oversampling:
+            grid.append(SearchParams(hnsw_ef=ef or None))
+            continue
+        grid.append(SearchParams(hnsw_ef=ef or None, rescore=False))
+        grid.extend(SearchParams(hnsw_ef=ef or None, rescore=True, oversampling=o) for o in oversampling)
+    exact = SearchParams(exact=True)
+    grid.append(exact)
+
+    def measure(params: SearchParams, k: int) -> tuple[list[list[str | None]], list[float]]:
+        found, latencies = [], []
+        for vector in queries:
+            start = time.perf_counter()
+            hits = services.vector_store.search(vector, k, False, params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append([(hit.point_id, hit.source) for hit in hits])
+        return found, latencies
+
+    # 1回目の接続確立などを計測から外す
+    measure(exact, ks[0])
+    progress = ProgressBar(len(grid) * len(ks), label="計測")
+    results: dict[tuple[SearchParams, int], tuple[list, list[float]]] = {}
+    for params in grid:
+        for k in ks:
+            results[params, k] = measure(params, k)
+            progress.update()
+    progress.close()
+
+    rows: dict[tuple[SearchParams, int], tuple[float, float]] = {}
+    print(f"質問{len(questions)}問で計測（recall@k は総当たり検索の上位 k 件との一致率）")
+    for params in grid:
+        cells = []
+        for k in ks:
+            found, latencies = results[params, k]
+            truth, _ = results[exact, k]
+            recalls = [
+                len({point for point, _ in f} & {point for point, _ in t}) / len(t)
+                for f, t in zip(found, truth) if t
+            ]
+            recall = sum(recalls) / len(recalls) if recalls else 0.0
+            p95 = percentile(latencies, 95)
+            rows[params, k] = (recall, p95)
+            cells.append(f"recall@{k} {recall:.3f} p95 {p95:.1f}ms")
+        print(f"  {params.label():<36} " + "  ".join(cells))
+
+    top_k = Config.get("qdrant", "search_top_k", default=3)
+    if any(label for _, label in labelled):
+        print("正解のソースを上位 k 件に含む割合（総当たり検索）:")
+        hit_rates = {}
+        for k in ks:
+            truth, _ = results[exact, k]
+            judged = [
+                any(source == label for _, source in hits)
+                for (_, label), hits in zip(labelled, truth) if label
+            ]
+            hit_rates[k] = sum(judged) / len(judged)
+            print(f"  top_k={k}: {hit_rates[k]:.3f}")
+        top_k = next((k for k in ks if hit_rates[k] >= target), ks[-1])
+    elif top_k not in ks:
+        top_k = min(ks, key=lambda k: abs(k - top_k))
+
+    # 目標の再現率を満たす組み合わせのうち、p95 レイテンシが最も小さいものを選ぶ
+    candidates = [params for params in grid if rows[params, top_k][0] >= target]
+    best = min(candidates, key=lambda params: rows[params, top_k][1])
+    recall, p95 = rows[best, top_k]
+    print(f"推奨設定（top_k={top_k} で目標 {target:.2f} 以上の組み合わせのうち p95 最小: recall {recall:.3f}, {p95:.1f}ms）:")
+    print("  [qdrant]")
+    print(f"  search_top_k = {top_k}")
+    print(f"  hnsw_ef = {best.hnsw_ef or 0}")
+    print(f"  exact = {'true' if best.exact else 'false'}")
+    if best.rescore is not None:
+        print(f"  quantization_rescore = {'true' if best.rescore else 'false'}")
+    if best.oversampling is not None:
+        print(f"  quantization_oversampling = {best.oversampling:g}")
+
+
+def _labelled_questions(services: ServiceContainer, question_file: str | None) -> list[tuple[str, str | None]]:
+    """質問と正解のソース名（タブ区切り、省略可）の組を取得（ファイル省略時はクエリログの頻出質問）"""
+    if not question_file:
+        return [(question, None) for question in _benchmark_questions(services, None)]
+    labelled = []
+    for line in read_questions(question_file):
+        question, _, label = line.partition("\t")
+        labelled.append((question.strip(), label.strip() or None))
+    if not labelled:
+        raise RAGException("計測に使う質問がありません（--file で指定してください）")
+    return labelled
+
+
+def _embed_all(embedder, texts: list[str], progress: ProgressBar, batch_size: int = 64) -> VectorMatrix:
+    """テキストをまとめて埋め込む"""
+    import numpy as np
+
+    matrices = []
+    for batch in batched(texts, batch_size):
+        matrices.append(embedder.embed_batch(list(batch)))
+        progress.update(len(batch))
+    return np.concatenate(matrices)
+
+
+def _benchmark_questions(services: ServiceContainer, question_file: str | None) -> list[str]:
+    """計測に使う質問を取得（省略時はクエリログの頻出質問）"""
+    if question_file:
+        questions = read_questions(question_file)
+    else:
+        questions = services.query_log.frequent_queries(50, 24 * 7) if services.query_log else []
+    if not questions:
+        raise RAGException("計測に使う質問がありません（--file で指定してください）")
+    return questions
@@ -4,42 +4,122 @@ RAGアプリケーション CLI版
 """
 from __future__ import annotations
 
+import argparse
 import sys
 from pathlib import Path
 
-from .adapters.factory import create_embedder, create_llm_client
-from .adapters.vectorstore import QdrantVectorStore
 from .core.exceptions import RAGException
-from .services.document_ingest_service import DocumentIngestService
-from .services.qa_service import QAService
-from .utils.io import multiline_input, save_log
+from .utils.io import multiline_input
 from .utils.logger import get_logger, setup_logging
 
 logger = get_logger(__name__)
 
 
-def initialize_services():
-    """サービスを初期化"""
-    try:
-        logger.info("サービスを初期化中...")
-        
-        embedder = create_embedder()
-        vector_store = QdrantVectorStore()
-        vector_store.init_collection()
-        
-        llm_client = create_llm_client()
-        qa_service = QAService(llm_client, embedder, vector_store)
-        document_service = DocumentIngestService(embedder, vector_store)
-        
-        logger.info("初期化完了")
-        return qa_service, document_service
-        
-    except Exception as e:
-        logger.error(f"初期化エラー: {e}")
-        raise RAGException(f"サービス初期化に失敗しました: {e}")
+class ServiceContainer:
+    """サービスを初回利用時に初期化するコンテナ
+
+    重いライブラリの読み込みと各バックエンドへの接続は、実際に必要になるまで行わない。
+    """
+
+    def __init__(self) -> None:
+        self._embedder = None
+        self._vector_store = None
+        self._llm_client = None
+        self._qa_service = None
+        self._document_service = None
+        self._query_log = None
+        self._query_log_loaded = False
+
+    @property
+    def embedder(self):
+        """埋め込みモデル"""
+        if self._embedder is None:
+            from .adapters.factory import create_embedder
+            self._embedder = self._initialize("埋め込みモデル", create_embedder)
+        return self._embedder
+
+    @property
+    def vector_store(self):
+        """ベクターストア（初回利用時にコレクションを初期化）"""
+        if self._vector_store is None:
+            from .adapters.dimension import embedding_dimension
+            from .adapters.factory import create_vector_store
+
+            def build():
+                vector_store = create_vector_store(embedding_dimension(self.embedder))
+                vector_store.init_collection()
+                return vector_store
+            self._vector_store = self._initialize("ベクターストア", build)
+        return self._vector_store
+
+    @property
+    def llm_client(self):
+        """LLMクライアント"""
+        if self._llm_client is None:
+            from .adapters.factory import create_llm_client
+            self._llm_client = self._initialize("LLMクライアント", create_llm_client)
+        return self._llm_client
+
+    @property
+    def qa_service(self):
+        """質問応答サービス"""
+        if self._qa_service is None:
+            from .services.qa_service import QAService
+            self._qa_service = QAService(
+                self.llm_client, self.embedder, self.vector_store, query_log=self.query_log, origin="cli"
+            )
+        return self._qa_service
+
+    @property
+    def query_log(self):
+        """クエリログ（無効なら None）"""
+        if not self._query_log_loaded:
+            from .adapters.query_log import QueryLog
+            self._query_log = QueryLog.from_config()
+            self._query_log_loaded = True
+        return self._query_log
+
+    def invalidate_answers(self) -> None:
+        """文書の登録後に回答キャッシュを破棄（起動中のAPIワーカーにも世代ファイルで知らせる）"""
+        if self._qa_service is not None:
+            self._qa_service.invalidate_answers()
+            return
+        from .utils.cache import GenerationFile
+        from .utils.config import Config
+
+        if Config.get("cache", "enabled", default=True):
+            try:
+                GenerationFile.from_config().bump()
+            except OSError as e:
+                logger.warning(f"キャッシュの世代ファイルを更新できませんでした: {e}")
 
+    def close(self) -> None:
+        """未書き込みのクエリログを書き出す"""
+        if self._query_log is not None:
+            self._query_log.close()
 
-def handle_document_ingest(document_service):
+    @property
+    def document_service(self):
+        """文書取り込みサービス"""
+        if self._document_service is None:
+            from .services.document_ingest_service import DocumentIngestService
+            self._document_service = DocumentIngestService(self.embedder, self.vector_store)
+        return self._document_service
+
+    @staticmethod
+    def _initialize(name: str, build):
+        """コンポーネントを初期化し、失敗時はRAGExceptionに変換"""
+        try:
+            logger.info(f"{name}を初期化中...")
+            return build()
+        except RAGException:
+            raise
+        except Exception as e:
+            logger.error(f"初期化エラー ({name}): {e}")
+            raise RAGException(f"サービス初期化に失敗しました: {e}") from e
+
+
+def handle_document_ingest(services: ServiceContainer):
     """文書登録処理"""
     while True:
         target_dir = input("文書ディレクトリのパス (戻る: q): ").strip()
@@ -56,7 +136,8 @@ def handle_document_ingest(document_service):
             continue
             
         try:
-            document_service.ingest(target_dir)
+            services.document_service.ingest(target_dir)
+            services.invalidate_answers()
             print("文書の登録が完了しました")
             break
         except RAGException as e:
@@ -66,7 +147,24 @@ def handle_document_ingest(document_service):
             print("予期しないエラーが発生しました")
 
 
-def handle_qa(qa_service):
+def handle_reembed(services: ServiceContainer):
+    """チャンクストアからの再埋め込み処理"""
+    answer = input("コレクションを作り直しますか？ (y/N, 戻る: q): ").strip().lower()
+    if answer == 'q':
+        return
+    
+    try:
+        count = services.document_service.reembed(recreate=answer == 'y')
+        services.invalidate_answers()
+        print(f"{count}個のチャンクを再登録しました")
+    except RAGException as e:
+        print(f"エラー: {e}")
+    except Exception as e:
+        logger.error(f"予期しないエラー: {e}")
+        print("予期しないエラーが発生しました")
+
+
+def handle_qa(services: ServiceContainer):
     """質問応答処理"""
     while True:
         print("\n" + "="*50)
@@ -81,16 +179,9 @@ def handle_qa(qa_service):
             
         try:
             print("\n回答を生成中...")
-            answer = qa_service.answer(query)
+            answer = services.qa_service.answer(query)
             
             print(f"\n【回答】\n{answer}")
-            
-            # ログ保存
-            try:
-                log_file = save_log(query, answer)
-                print(f"\nログを保存しました: {log_file}")
-            except Exception as e:
-                logger.warning(f"ログ保存に失敗: {e}")
                 
         except RAGException as e:
             print(f"エラー: {e}")
@@ -99,20 +190,166 @@ def handle_qa(qa_service):
             print("予期しないエラーが発生しました")
 
 
-def main():
+def run_startup_report() -> None:
+    """インポート時間と起動時間のレポートを表示"""
+    from .utils.startup import startup_report
+
+    services = ServiceContainer()
+    steps = [
+        ("埋め込みモデル作成", lambda: services.embedder),
+        ("LLMクライアント作成", lambda: services.llm_client),
+        ("Qdrant接続・コレクション初期化", lambda: services.vector_store),
+        ("サービス作成", lambda: (services.qa_service, services.document_service)),
+    ]
+    print(startup_report(steps))
+
+
+def run_export_snapshot(path: str) -> None:
+    """コレクションをスナップショットに書き出す"""
+    from .adapters.factory import create_vector_store
+
+    count = create_vector_store().export_snapshot(path)
+    print(f"{count}件のポイントを書き出しました: {path}")
+
+
+def run_import_snapshot(path: str, recreate: bool, workers: int | None) -> None:
+    """スナップショットをコレクションに読み込む"""
+    from .adapters.factory import create_vector_store
+
+    count = create_vector_store().import_snapshot(path, recreate=recreate, workers=workers)
+    print(f"{count}件のポイントを登録しました")
+
+
+def _int_list(value: str) -> list[int]:
+    """カンマ区切りの整数の並びを解析"""
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"カンマ区切りの整数で指定してください: {value}") from None
+
+
+def _float_list(value: str) -> list[float]:
+    """カンマ区切りの数値の並びを解析"""
+    try:
+        return [float(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"カンマ区切りの数値で指定してください: {value}") from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """コマンドライン引数のパーサーを作成"""
+    parser = argparse.ArgumentParser(description="RAGアプリケーション CLI版")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("startup-report", help="インポート時間と起動時間を計測して表示")
+
+    export_parser = subparsers.add_parser("export-snapshot", help="コレクションをスナップショットに書き出す")
+    export_parser.add_argument("path", help="書き出し先ディレクトリ")
+
+    import_parser = subparsers.add_parser("import-snapshot", help="スナップショットをコレクションに読み込む")
+    import_parser.add_argument("path", help="スナップショットのディレクトリ")
+    import_parser.add_argument("--recreate", action="store_true", help="既存のコレクションを削除してから読み込む")
+    import_parser.add_argument("--workers", type=int, default=None, help="並列登録数")
+
+    ingest_parser = subparsers.add_parser("ingest", help="ディレクトリ内の文書を登録")
+    ingest_parser.add_argument("directory", help="文書ディレクトリ")
+    ingest_parser.add_argument("--workers", type=int, default=1, help="並列に処理するファイル数")
+
+    ask_parser = subparsers.add_parser("ask", help="質問ファイルの質問に回答")
+    ask_parser.add_argument("--file", required=True, help="質問ファイル（1行1問）")
+    ask_parser.add_argument("--concurrency", type=int, default=1, help="同時に処理する質問数")
+    ask_parser.add_argument("--out", default=None, help="結果の出力先（JSON Lines、省略時は標準出力）")
+
+    stats_parser = subparsers.add_parser("stats", help="登録件数とクエリログの統計を表示")
+    stats_parser.add_argument("--hours", type=float, default=24, help="クエリログの集計期間（時間）")
+
+    bench_parser = subparsers.add_parser("bench", help="埋め込み・検索・回答生成の性能を計測")
+    bench_parser.add_argument("--file", default=None, help="質問ファイル（省略時はクエリログの頻出質問）")
+    bench_parser.add_argument("--mode", choices=["embed", "search", "answer"], default="search", help="計測対象")
+    bench_parser.add_argument("--concurrency", type=int, default=4, help="同時実行数")
+    bench_parser.add_argument("--repeat", type=int, default=1, help="質問の繰り返し回数")
+
+    dim_parser = subparsers.add_parser("dim-bench", help="切り詰めた次元での検索の再現率を全次元と比較")
+    dim_parser.add_argument("--file", default=None, help="質問ファイル（省略時はクエリログの頻出質問）")
+    dim_parser.add_argument("--dims", type=_int_list, default="64,128,256,512", help="比較する次元（カンマ区切り）")
+    dim_parser.add_argument("--sample", type=int, default=2000, help="比較に使うチャンク数")
+    dim_parser.add_argument("--top-k", type=int, default=10, help="再現率を計算する上位件数")
+
+    tune_parser = subparsers.add_parser("tune-search", help="検索パラメータごとの再現率とレイテンシを計測して推奨値を表示")
+    tune_parser.add_argument(
+        "--file", default=None, help="質問ファイル（1行1問、タブ区切りで正解のソース名。省略時はクエリログの頻出質問）"
+    )
+    tune_parser.add_argument("--ks", type=_int_list, default="3,5,10", help="比較する top_k（カンマ区切り）")
+    tune_parser.add_argument("--ef", type=_int_list, default="16,32,64,128,256", help="比較する hnsw_ef（カンマ区切り）")
+    tune_parser.add_argument(
+        "--oversampling", type=_float_list, default=[], help="量子化したコレクションで比較する oversampling（カンマ区切り）"
+    )
+    tune_parser.add_argument("--target", type=float, default=0.95, help="推奨値が満たすべき再現率")
+    return parser
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """非対話のサブコマンドを実行し、終了コードを返す"""
+    from . import cli_commands
+
+    if args.command == "export-snapshot":
+        run_export_snapshot(args.path)
+        return 0
+    if args.command == "import-snapshot":
+        run_import_snapshot(args.path, args.recreate, args.workers)
+        return 0
+
+    services = ServiceContainer()
+    try:
+        if args.command == "ingest":
+            failed = cli_commands.run_ingest(services, args.directory, max(1, args.workers))
+        elif args.command == "ask":
+            failed = cli_commands.run_ask(services, args.file, max(1, args.concurrency), args.out)
+        elif args.command == "stats":
+            cli_commands.run_stats(services, args.hours)
+            failed = 0
+        elif args.command == "dim-bench":
+            cli_commands.run_dim_bench(services, args.file, args.dims, max(1, args.sample), max(1, args.top_k))
+            failed = 0
+        elif args.command == "tune-search":
+            cli_commands.run_tune_search(services, args.file, args.ks, args.ef, args.oversampling, args.target)
+            failed = 0
+        else:
+            cli_commands.run_bench(services, args.file, args.mode, max(1, args.concurrency), max(1, args.repeat))
+            failed = 0
+    finally:
+        services.close()
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None):
     """メイン処理"""
     setup_logging()
+    args = build_parser().parse_args(argv)
+    
+    if args.command == "startup-report":
+        run_startup_report()
+        return
+    if args.command is not None:
+        try:
+            sys.exit(run_command(args))
+        except KeyboardInterrupt:
+            print("\n\n処理が中断されました")
+            sys.exit(130)
+        except RAGException as e:
+            logger.error(f"コマンド実行エラー: {e}")
+            print(f"エラー: {e}")
+            sys.exit(1)
     
+    services = ServiceContainer()
     try:
         print("RAGアプリケーション CLI版")
         print("="*50)
         
-        qa_service, document_service = initialize_services()
-        
         while True:
             print("\n【メニュー】")
             print("1: 質問・検索")
             print("2: 文書登録")
+            print("3: 再埋め込み (チャンクストアから)")
             print("q: 終了")
             
             choice = input("選択してください: ").strip()
@@ -121,11 +358,13 @@ def main():
                 print("アプリケーションを終了します")
                 break
             elif choice == "1":
-                handle_qa(qa_service)
+                handle_qa(services)
             elif choice == "2":
-                handle_document_ingest(document_service)
+                handle_document_ingest(services)
+            elif choice == "3":
+                handle_reembed(services)
             else:
-                print("1, 2, または q を入力してください")
+                print("1, 2, 3, または q を入力してください")
                 
     except KeyboardInterrupt:
         print("\n\nアプリケーションが中断されました")
@@ -138,6 +377,8 @@ def main():
         logger.error(f"予期しないエラー: {e}")
         print("予期しないエラーが発生しました")
         sys.exit(1)
+    finally:
+        services.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+"""
+トークン数ベースのストリーミングチャンク分割
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections.abc import Callable, Iterable, Iterator
+
+# 日本語の文末記号（閉じ括弧を含む）と改行を文の区切りとして扱う
+_SENTENCE_END_RE = re.compile(r"[。．！？!?]+[」』）)】]*\s*|\n+")
+_CJK_CLASS = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f"
+_CJK_RE = re.compile(f"[{_CJK_CLASS}]")
+_ASCII_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+_DIGIT_RE = re.compile(r"[0-9]")
+_SYMBOL_RE = re.compile(rf"[^\sA-Za-z0-9{_CJK_CLASS}]")
+
+
+def estimate_tokens(text: str) -> int:
+    """埋め込みモデルのトークン数を文字種から見積もる
+
+    日本語文字は1文字1トークン、英単語は4文字1トークン、数字を含む英数字列（ID・16進数・日時など）は
+    2文字1トークン、記号は1文字1トークンとして数える。実際のトークナイザーとは一致しないため、
+    上限に対して使う場合は scaled_token_counter で余裕を持たせる。
+    """
+    cjk = len(_CJK_RE.findall(text))
+    words = sum(
+        math.ceil(len(w) / (2 if _DIGIT_RE.search(w) else 4)) for w in _ASCII_WORD_RE.findall(text)
+    )
+    symbols = len(_SYMBOL_RE.findall(text))
+    return cjk + words + symbols
+
+
+def scaled_token_counter(margin: float, counter: Callable[[str], int] = estimate_tokens) -> Callable[[str], int]:
+    """見積もりに margin 倍の余裕を持たせたトークン数の関数を作成"""
+    if margin <= 1.0:
+        return counter
+    return lambda text: math.ceil(counter(text) * margin)
+
+
+def iter_sentences(pieces: Iterable[str], max_chars: int) -> Iterator[str]:
+    """任意の位置で区切られたテキスト片を文単位に組み直す
+
+    区切りが見つからないまま max_chars を超えた場合は、メモリを抑えるため強制的に切り出す。
+    """
+    pending = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        pending += piece
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(pending):
+            # 末尾の区切りは次の片で続く可能性があるため確定させない
+            if match.end() == len(pending):
+                break
+            yield pending[start:match.end()]
+            start = match.end()
+        pending = pending[start:]
+
+        while len(pending) > max_chars:
+            cut = pending.rfind(" ", 0, max_chars)
+            cut = cut + 1 if cut > max_chars // 2 else max_chars
+            yield pending[:cut]
+            pending = pending[cut:]
+
+    if pending:
+        yield pending
+
+
+class TextChunker:
+    """文境界とトークン数に基づいてチャンクを生成するクラス"""
+
+    def __init__(
+        self,
+        chunk_tokens: int,
+        overlap_tokens: int = 0,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ) -> None:
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens は正の値である必要があります")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, chunk_tokens // 2))
+        self.count_tokens = token_counter
+        # 1トークンは最大でも数文字程度なので、文の保留はこの長さで打ち切る
+        self.max_sentence_chars = chunk_tokens * 8
+
+    def split(self, text: str) -> list[str]:
+        """文字列全体をチャンクに分割"""
+        return list(self.iter_chunks([text]))
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """テキスト片のストリームから順次チャンクを生成"""
+        buffer: list[tuple[str, int]] = []
+        buffer_tokens = 0
+        has_new_text = False
+
+        for sentence in iter_sentences(pieces, self.max_sentence_chars):
+            if not sentence.strip():
+                continue
+            tokens = self.count_tokens(sentence)
+
+            if tokens > self.chunk_tokens:
+                if has_new_text and (chunk := self._join(buffer)):
+                    yield chunk
+                buffer, buffer_tokens, has_new_text = [], 0, False
+                yield from self._split_long_sentence(sentence)
+                continue
+
+            if buffer_tokens + tokens > self.chunk_tokens and buffer:
+                if has_new_text and (chunk := self._join(buffer)):
+                    yield chunk
+                buffer = self._overlap_tail(buffer, self.chunk_tokens - tokens)
+                buffer_tokens = sum(n for _, n in buffer)
+                has_new_text = False
+
+            buffer.append((sentence, tokens))
+            buffer_tokens += tokens
+            has_new_text = True
+
+        if has_new_text and (chunk := self._join(buffer)):
+            yield chunk
+
+    def _overlap_tail(
+        self, buffer: list[tuple[str, int]], room: int
+    ) -> list[tuple[str, int]]:
+        """次のチャンクに引き継ぐ末尾の文を取得"""
+        limit = min(self.overlap_tokens, room)
+        tail: list[tuple[str, int]] = []
+        total = 0
+        for sentence, tokens in reversed(buffer):
+            if total + tokens > limit:
+                break
+            tail.insert(0, (sentence, tokens))
+            total += tokens
+        return tail
+
+    def _split_long_sentence(self, sentence: str) -> Iterator[str]:
+        """上限を超える1文をトークン上限内に収まるよう分割"""
+        rest = sentence
+        while rest:
+            size = min(len(rest), self.chunk_tokens * 4)
+            while size > 1 and self.count_tokens(rest[:size]) > self.chunk_tokens:
+                size = max(1, size * 3 // 4)
+            if piece := rest[:size].strip():
+                yield piece
+            rest = rest[size:]
+
+    @staticmethod
+    def _join(buffer: list[tuple[str, int]]) -> str:
+        """文をチャンク文字列に結合"""
+        return "".join(sentence for sentence, _ in buffer).strip()
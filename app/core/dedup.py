@@ -0,0 +1,214 @@
+"""
+重複・定型文の検出（MinHash/LSH による近似重複判定と、ページ共通のヘッダー・フッター除去）
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import Counter
+from collections.abc import Hashable, Iterable, Iterator
+
+import numpy as np
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def normalize_text(text: str) -> str:
+    """比較用にテキストを正規化（全角半角・大小文字・空白・数字の違いを無視）"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _DIGITS.sub("0", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class MinHasher:
+    """文字 n-gram の MinHash 署名を計算するクラス
+
+    各 n-gram を64ビットにハッシュし、乱数の係数による乗算シフト法で num_perm 通りの
+    ハッシュ関数を作り、それぞれの最小値を署名とする。
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> None:
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # 乗算シフト法の係数（乗数は奇数）
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> set[str]:
+        """文字 n-gram の集合を作成（日本語のように単語区切りのない文にも対応）"""
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, normalized_text: str) -> np.ndarray:
+        """正規化済みテキストの MinHash 署名を計算"""
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                for s in self.shingles(normalized_text)
+            ),
+            dtype=np.uint64,
+        )
+        # 2^64 を法とする乗算の上位32ビットを各ハッシュ関数の値とする
+        with np.errstate(over="ignore"):
+            permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return (permuted & _MASK32).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """MinHash 署名の LSH 索引による近似重複チャンクの検出
+
+    署名を bands 個の帯に分けてバケットに登録し、いずれかの帯が一致した候補について
+    署名の一致率（Jaccard 係数の推定値）がしきい値以上なら重複とみなす。
+    署名は group（ソース名など）ごとにまとめて取り除ける。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        min_chars: int = 50,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm は bands で割り切れる必要があります")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_chars = min_chars
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self._lock = threading.Lock()
+        self._buckets: dict[tuple[int, bytes], list[int]] = {}
+        self._keys: list[Hashable] = []
+        self._signatures: list[np.ndarray] = []
+        self._groups: dict[Hashable, list[int]] = {}
+        self._removed: set[int] = set()
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """チャンクの署名を計算（短すぎて判定対象外なら None）"""
+        normalized = normalize_text(text)
+        if len(normalized) < self.min_chars:
+            # 短いチャンクは別文書で偶然一致しやすいため対象外にする
+            return None
+        return self.hasher.signature(normalized)
+
+    def find(self, signature: np.ndarray) -> Hashable | None:
+        """近似重複として登録済みのチャンクのキーを取得"""
+        with self._lock:
+            candidates = {
+                index for band_key in self._band_keys(signature) for index in self._buckets.get(band_key, ())
+            }
+            for index in sorted(candidates - self._removed):
+                similarity = float(np.mean(self._signatures[index] == signature))
+                if similarity >= self.threshold:
+                    return self._keys[index]
+        return None
+
+    def add(self, key: Hashable, signature: np.ndarray, group: Hashable | None = None) -> None:
+        """チャンクの署名を登録"""
+        with self._lock:
+            index = len(self._keys)
+            self._keys.append(key)
+            self._signatures.append(signature)
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, []).append(index)
+            if group is not None:
+                self._groups.setdefault(group, []).append(index)
+
+    def discard(self, group: Hashable) -> int:
+        """グループの署名をすべて判定対象から外し、外した件数を返す"""
+        with self._lock:
+            indices = self._groups.pop(group, [])
+            self._removed.update(indices)
+            return len(indices)
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        """署名を帯に分割してバケットのキーを作成"""
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def clear(self) -> None:
+        """登録済みの署名をすべて削除"""
+        with self._lock:
+            self._buckets.clear()
+            self._keys.clear()
+            self._signatures.clear()
+            self._groups.clear()
+            self._removed.clear()
+
+    def __len__(self) -> int:
+        return len(self._keys) - len(self._removed)
+
+
+class HeaderFooterStripper:
+    """多くのページに共通して現れる先頭・末尾の行（ヘッダー・フッター）を除去するクラス
+
+    先頭の sample_pages ページを先読みして行の出現頻度を数え、ページの端から edge_lines 行以内に
+    min_ratio 以上の割合で現れる行を定型文とみなす。ページ番号の違いは正規化で吸収する。
+    """
+
+    def __init__(self, edge_lines: int = 3, min_ratio: float = 0.5, sample_pages: int = 30) -> None:
+        self.edge_lines = edge_lines
+        self.min_ratio = min_ratio
+        self.sample_pages = sample_pages
+
+    def strip_pages(self, pages: Iterable[str]) -> Iterator[str]:
+        """ページ列から定型の行を除去して逐次返す"""
+        iterator = iter(pages)
+        sample: list[str] = []
+        for page in iterator:
+            sample.append(page)
+            if len(sample) >= self.sample_pages:
+                break
+
+        # ページ数が少なすぎると本文の行を誤って除去しやすいため何もしない
+        if len(sample) < 3:
+            yield from sample
+            yield from iterator
+            return
+
+        counts: Counter[str] = Counter()
+        for page in sample:
+            counts.update(set(self._edge_lines(page)))
+        boilerplate = {line for line, n in counts.items() if n / len(sample) >= self.min_ratio}
+
+        for page in sample:
+            yield self._strip(page, boilerplate)
+        for page in iterator:
+            yield self._strip(page, boilerplate)
+
+    def _edge_lines(self, page: str) -> list[str]:
+        """ページ先頭・末尾の正規化済みの行を取得"""
+        lines = [normalize_text(line) for line in page.splitlines() if line.strip()]
+        if len(lines) <= self.edge_lines * 2:
+            return lines
+        return lines[:self.edge_lines] + lines[-self.edge_lines:]
+
+    def _strip(self, page: str, boilerplate: set[str]) -> str:
+        """ページの端にある定型の行を除去（空行は数えない）"""
+        if not boilerplate:
+            return page
+        lines = page.splitlines()
+        head = self._skip_edge(lines, range(len(lines)), boilerplate, default=len(lines))
+        tail = self._skip_edge(lines, range(len(lines) - 1, head - 1, -1), boilerplate, default=head - 1)
+        return "\n".join(lines[head:tail + 1])
+
+    def _skip_edge(self, lines: list[str], order: range, boilerplate: set[str], default: int) -> int:
+        """端から定型の行を読み飛ばし、最初に残す行の位置を返す（すべて定型なら default）"""
+        checked = 0
+        for position in order:
+            if not lines[position].strip():
+                continue
+            if checked >= self.edge_lines or normalize_text(lines[position]) not in boilerplate:
+                return position
+            checked += 1
+        return default
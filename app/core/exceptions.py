@@ -23,6 +23,42 @@ class DocumentProcessingError(RAGException):
     pass
 
 
+class UploadLimitError(DocumentProcessingError):
+    """アップロードサイズ上限超過エラー"""
+
+    def __init__(self, message: str, committed: list[str] | None = None) -> None:
+        super().__init__(message)
+        # 中断する前に登録を終えたファイル（登録されたまま残る）
+        self.committed = committed or []
+
+
 class LLMError(RAGException):
     """LLMエラー"""
-    pass
\ No newline at end of file
+    pass
+
+
+class InvalidRequestError(RAGException):
+    """リクエストのパラメータが不正なエラー"""
+    pass
+
+class OverloadedError(RAGException):
+    """過負荷によりリクエストを受け付けられないエラー"""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 1) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(RAGException):
+    """リクエストの処理期限切れエラー"""
+
+    def __init__(self, message: str, partial: str = "") -> None:
+        super().__init__(message)
+        # 回答生成の途中で期限を迎えた場合の生成済みテキスト
+        self.partial = partial
+
+
+class RequestCancelledError(DeadlineExceededError):
+    """クライアントの切断による処理の取り消し"""
+    pass
@@ -0,0 +1,35 @@
+"""
+抽出型の回答（検索したチャンクから質問に関係する文をそのまま抜き出す）
+"""
+from __future__ import annotations
+
+from .chunker import iter_sentences
+from .dedup import normalize_text
+
+
+def _bigrams(text: str) -> set[str]:
+    """空白を除いた文字 bigram の集合（日本語のように単語区切りのない文にも対応）"""
+    compact = normalize_text(text).replace(" ", "")
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i:i + 2] for i in range(len(compact) - 1)}
+
+
+def extract_answer(query: str, text: str, max_chars: int = 400) -> str:
+    """質問と文字 bigram が最も重なる文から、上限の文字数まで後続の文を含めて抜き出す"""
+    sentences = [sentence for sentence in iter_sentences([text], max_chars) if sentence.strip()]
+    if not sentences:
+        return ""
+    query_grams = _bigrams(query)
+    overlaps = [len(query_grams & _bigrams(sentence)) for sentence in sentences]
+    best = max(range(len(sentences)), key=lambda i: overlaps[i])
+
+    # 条件や補足が後続の文に続くことが多いため、元の順序のまま続けて含める
+    selected: list[str] = []
+    length = 0
+    for sentence in sentences[best:]:
+        if selected and length + len(sentence) > max_chars:
+            break
+        selected.append(sentence)
+        length += len(sentence)
+    return "".join(selected).strip()
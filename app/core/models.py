@@ -3,6 +3,9 @@
 """
 from __future__ import annotations
 
+from dataclasses import dataclass
+from typing import Any
+
 from pydantic import BaseModel, Field
 
 
@@ -15,21 +18,74 @@ class Document(BaseModel):
     model_config = {"frozen": True}
 
 
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    """検索結果（内部処理用の軽量な型。API応答では SearchResult に変換する）"""
+    text: str
+    source: str
+    score: float
+    chunk_id: int | None = None
+    point_id: str | None = None
+    metadata: dict[str, Any] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class SearchParams:
+    """ベクトル検索の精度と速度の調整（None は Qdrant の既定値を使う）"""
+    hnsw_ef: int | None = None
+    exact: bool = False
+    rescore: bool | None = None
+    oversampling: float | None = None
+
+    def label(self) -> str:
+        """計測結果の表示用の短い表記"""
+        if self.exact:
+            return "exact"
+        parts = [f"ef={self.hnsw_ef or 'default'}"]
+        if self.rescore is not None:
+            parts.append(f"rescore={'on' if self.rescore else 'off'}")
+        if self.oversampling is not None:
+            parts.append(f"oversampling={self.oversampling:g}")
+        return " ".join(parts)
+
+
 class SearchResult(BaseModel):
-    """検索結果を表すモデル"""
-    text: str = Field(..., description="検索結果のテキスト")
-    source: str = Field(..., description="ソース名")
+    """検索結果を表すモデル（未指定の項目は応答から省く）"""
+    rank: int = Field(..., ge=1, description="全体での順位")
     score: float = Field(..., ge=0.0, le=1.0, description="類似度スコア")
+    source: str | None = Field(None, description="ソース名")
     chunk_id: int | None = Field(None, description="チャンクID")
+    text: str | None = Field(None, description="検索結果のテキスト")
+    point_id: str | None = Field(None, description="ベクターストアのポイントID")
+    metadata: dict[str, Any] | None = Field(None, description="登録時に指定したメタデータ")
     
     model_config = {"frozen": True}
 
+    @classmethod
+    def from_hit(cls, hit: SearchHit, rank: int = 1, fields: frozenset[str] | None = None) -> SearchResult:
+        """内部の検索結果をAPI応答用のモデルに変換（浮動小数点誤差によるスコアの範囲外を丸める）
+
+        fields を指定すると、そこに含まれない項目は省く（順位とスコアは常に含める）。
+        """
+        values = {
+            "source": hit.source,
+            "chunk_id": hit.chunk_id,
+            "text": hit.text,
+            "point_id": hit.point_id,
+            "metadata": hit.metadata,
+        }
+        if fields is not None:
+            values = {key: value for key, value in values.items() if key in fields}
+        return cls(rank=rank, score=min(max(hit.score, 0.0), 1.0), **values)
+
 
 class QAResult(BaseModel):
     """質問応答結果を表すモデル"""
     question: str = Field(..., description="質問内容")
     answer: str = Field(..., description="回答内容")
     sources: list[str] = Field(default_factory=list, description="参考資料のリスト")
+    cache_hit: bool = Field(default=False, description="キャッシュから回答したか")
+    degraded: bool = Field(default=False, description="処理期限に達したため縮退した回答か")
     
     model_config = {"frozen": True}
 
@@ -38,6 +94,17 @@ class QAResponse(BaseModel):
     """質問応答APIのレスポンス"""
     question: str = Field(..., description="質問内容")
     answer: str = Field(..., description="回答内容")
+    degraded: bool = Field(default=False, description="処理期限に達したため縮退した回答か")
+    status: str = Field(default="success", description="処理ステータス")
+
+
+class SearchResponse(BaseModel):
+    """検索APIのレスポンス"""
+    query: str = Field(..., description="検索クエリ")
+    results: list[SearchResult] = Field(default_factory=list, description="スコア順の検索結果")
+    offset: int = Field(..., ge=0, description="先頭の結果の位置")
+    next_offset: int | None = Field(None, description="次のページの offset（続きがなければ省略）")
+    took_ms: float = Field(..., ge=0.0, description="処理時間（ミリ秒）")
     status: str = Field(default="success", description="処理ステータス")
 
 
@@ -64,12 +131,49 @@ class TextRegisterResponse(BaseModel):
     status: str = Field(default="success", description="処理ステータス")
 
 
+class BulkTextResult(BaseModel):
+    """一括テキスト登録のレコードごとの結果（NDJSON の1行として返す）"""
+    line: int | None = Field(None, description="リクエストボディでの行番号")
+    source: str | None = Field(None, description="ソース名")
+    chunks: int = Field(default=0, ge=0, description="登録されたチャンク数")
+    status: str = Field(default="success", description="処理ステータス")
+    error: str | None = Field(None, description="エラーメッセージ")
+
+
+class BulkTextSummary(BaseModel):
+    """一括テキスト登録の集計（レスポンスの最終行）"""
+    records: int = Field(..., ge=0, description="受信したレコード数")
+    chunks: int = Field(..., ge=0, description="登録されたチャンク数の合計")
+    failed: int = Field(..., ge=0, description="登録に失敗したレコード数")
+    status: str = Field(default="done", description="処理ステータス")
+
+
+class EmbeddingConcurrencyResponse(BaseModel):
+    """埋め込みサーバーの同時実行数の自動調整状況（このワーカー分）"""
+    limit: int = Field(..., ge=1, description="現在の同時実行数の上限")
+    min_limit: int = Field(..., ge=1, description="同時実行数の下限")
+    max_limit: int = Field(..., ge=1, description="同時実行数の上限の最大値")
+    inflight: int = Field(..., ge=0, description="実行中のリクエスト数")
+    latency_ms: float | None = Field(None, ge=0.0, description="観測レイテンシの移動平均（ミリ秒）")
+    increases: int = Field(..., ge=0, description="上限を上げた回数")
+    decreases: int = Field(..., ge=0, description="上限を下げた回数")
+    overloads: int = Field(..., ge=0, description="タイムアウト・429/503 応答の回数")
+    status: str = Field(default="success", description="処理ステータス")
+
+
 class ErrorResponse(BaseModel):
     """エラーレスポンス"""
     error: str = Field(..., description="エラーメッセージ")
     status: str = Field(default="error", description="処理ステータス")
 
 
+class UploadLimitResponse(ErrorResponse):
+    """アップロードサイズ上限超過のエラーレスポンス"""
+    committed_files: list[str] = Field(
+        default_factory=list, description="中断する前に登録を終えたファイル（登録されたまま残る）"
+    )
+
+
 # APIリクエストモデル
 class DirectoryRequest(BaseModel):
     """ディレクトリ指定リクエスト"""
@@ -79,4 +183,11 @@ class DirectoryRequest(BaseModel):
 class RegisterTextRequest(BaseModel):
     """テキスト登録リクエスト"""
     text: str = Field(..., min_length=1, description="登録するテキスト")
-    source: str = Field(default="input_text", description="ソース名")
\ No newline at end of file
+    source: str = Field(default="input_text", description="ソース名")
+
+
+class BulkTextRecord(BaseModel):
+    """一括テキスト登録の1レコード（NDJSON の1行）"""
+    text: str = Field(..., min_length=1, description="登録するテキスト")
+    source: str = Field(default="input_text", description="ソース名")
+    metadata: dict[str, Any] | None = Field(None, description="ペイロードに保存する任意のメタデータ")
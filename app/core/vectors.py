@@ -0,0 +1,37 @@
+"""
+埋め込みベクトルの内部表現
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import TypeAlias
+
+import numpy as np
+import numpy.typing as npt
+
+# 1本のベクトル（1次元）または複数ベクトル（2次元）を float32 の配列で扱う
+Vector: TypeAlias = npt.NDArray[np.float32]
+VectorMatrix: TypeAlias = npt.NDArray[np.float32]
+
+
+def as_vector(values: Sequence[float] | npt.ArrayLike) -> Vector:
+    """値の並びを float32 の1次元ベクトルに変換（既に float32 ならコピーしない）"""
+    vector = np.asarray(values, dtype=np.float32)
+    if vector.ndim != 1 or vector.size == 0:
+        raise ValueError(f"1次元の空でないベクトルが必要です (shape={vector.shape})")
+    return vector
+
+
+def as_matrix(rows: Sequence[Sequence[float]] | Sequence[Vector] | npt.ArrayLike) -> VectorMatrix:
+    """ベクトルの並びを float32 の2次元配列に変換"""
+    matrix = np.asarray(rows, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[1] == 0:
+        raise ValueError(f"2次元のベクトル配列が必要です (shape={matrix.shape})")
+    return matrix
+
+
+def truncate_vectors(vectors: Vector | VectorMatrix, dimension: int) -> Vector | VectorMatrix:
+    """Matryoshka 表現のベクトルを先頭 dimension 次元に切り詰め、L2 正規化し直す"""
+    truncated = np.asarray(vectors, dtype=np.float32)[..., :dimension]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.maximum(norms, np.float32(1e-12))
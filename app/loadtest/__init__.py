@@ -0,0 +1,3 @@
+"""
+負荷試験ツール（推論サーバーの代替スタブと負荷生成器）
+"""
@@ -0,0 +1,137 @@
+"""
+負荷試験ツールのコマンドライン
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from ..core.exceptions import RAGException
+from ..utils.logger import setup_logging
+from .stub_server import StubProfile
+
+
+def _int_list(value: str) -> list[int]:
+    """カンマ区切りの整数の並びを解析"""
+    try:
+        return [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"カンマ区切りの整数で指定してください: {value}") from None
+
+
+def _mix(value: str) -> dict[str, float]:
+    """ask=8,text=1,upload=1 の形式の比率を解析"""
+    try:
+        pairs = (item.split("=", 1) for item in value.split(",") if item.strip())
+        return {name.strip(): float(weight) for name, weight in pairs}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"名前=比率 のカンマ区切りで指定してください: {value}") from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """コマンドライン引数のパーサーを作成"""
+    parser = argparse.ArgumentParser(description="RAG API の負荷試験ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    defaults = StubProfile()
+    stub = subparsers.add_parser("stub", help="Ollama・llama.cpp 互換の推論サーバースタブを起動")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=11434, help="待ち受けポート（Ollama 11434、Docker 12434）")
+    stub.add_argument("--dimension", type=int, default=defaults.dimension, help="埋め込みベクトルの次元")
+    stub.add_argument("--embed-ms", type=float, default=defaults.embed_latency_ms, help="埋め込み1リクエストの基本遅延（ミリ秒）")
+    stub.add_argument("--embed-item-ms", type=float, default=defaults.embed_per_item_ms, help="埋め込み1件あたりの追加遅延（ミリ秒）")
+    stub.add_argument("--embed-parallel", type=int, default=defaults.embed_parallel, help="埋め込みの同時処理数")
+    stub.add_argument("--prefill-ms", type=float, default=defaults.prefill_ms, help="回答生成の最初のトークンまでの遅延（ミリ秒）")
+    stub.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_second, help="回答生成のトークン生成速度")
+    stub.add_argument("--answer-tokens", type=int, default=defaults.answer_tokens, help="回答のトークン数")
+    stub.add_argument("--chat-parallel", type=int, default=defaults.chat_parallel, help="回答生成の同時処理数")
+    stub.add_argument("--jitter", type=float, default=defaults.jitter, help="遅延のばらつき（割合）")
+    stub.add_argument("--error-rate", type=float, default=defaults.error_rate, help="503 を返す割合")
+
+    run = subparsers.add_parser("run", help="APIに段階的な負荷をかけて計測")
+    run.add_argument("--target", default="http://127.0.0.1:8000", help="APIのURL")
+    run.add_argument("--ramp", type=_int_list, default=[1, 2, 4, 8, 16, 32], help="同時実行数の段階（カンマ区切り）")
+    run.add_argument("--step-seconds", type=float, default=20.0, help="各段階の計測時間（秒）")
+    run.add_argument("--mix", type=_mix, default={"ask": 1.0}, help="操作の比率（例: ask=8,text=1,upload=1）")
+    run.add_argument("--questions", default=None, help="質問コーパス（1行1問）")
+    run.add_argument("--texts", default=None, help="テキスト登録に使うコーパス（1行1件）")
+    run.add_argument("--files", default=None, help="アップロードに使うファイルのディレクトリ")
+    run.add_argument("--cache-bust", action="store_true", help="回答キャッシュに当たらないよう質問を毎回変える")
+    run.add_argument("--timeout", type=float, default=120.0, help="1リクエストのタイムアウト（秒）")
+    run.add_argument("--seed", type=int, default=0, help="操作と質問を選ぶ乱数のシード")
+    run.add_argument("--out", default=None, help="レポートの出力先（JSON、省略時は標準出力）")
+    return parser
+
+
+def run_load(args: argparse.Namespace) -> int:
+    """負荷試験を実行してレポートを書き出す"""
+    from .generator import LoadGenerator, LoadScenario, load_corpus, load_files
+
+    scenario = LoadScenario(
+        target=args.target,
+        ramp=args.ramp,
+        step_seconds=args.step_seconds,
+        mix=args.mix,
+        questions=load_corpus(args.questions),
+        texts=load_corpus(args.texts),
+        files=load_files(args.files),
+        cache_bust=args.cache_bust,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    report = asyncio.run(LoadGenerator(scenario).run())
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    for step in report["steps"]:
+        total = step["total"]
+        print(
+            f"同時実行数 {step['concurrency']:>4}: {total['throughput']:.2f}件/秒 "
+            f"p50 {total['p50_ms']:.1f}ms p95 {total['p95_ms']:.1f}ms p99 {total['p99_ms']:.1f}ms "
+            f"エラー率 {total['error_rate']:.1%}",
+            file=sys.stderr,
+        )
+    saturation = report["saturation"]
+    if saturation is not None:
+        print(f"飽和点: 同時実行数 {saturation['concurrency']}（{saturation['reason']}）", file=sys.stderr)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> None:
+    """メイン処理"""
+    setup_logging()
+    args = build_parser().parse_args(argv)
+
+    if args.command == "stub":
+        from .stub_server import run_stub_server
+
+        profile = StubProfile(
+            dimension=args.dimension,
+            embed_latency_ms=args.embed_ms,
+            embed_per_item_ms=args.embed_item_ms,
+            embed_parallel=args.embed_parallel,
+            prefill_ms=args.prefill_ms,
+            tokens_per_second=args.tokens_per_sec,
+            answer_tokens=args.answer_tokens,
+            chat_parallel=args.chat_parallel,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+        )
+        run_stub_server(profile, args.host, args.port)
+        return
+
+    try:
+        sys.exit(run_load(args))
+    except KeyboardInterrupt:
+        print("\n\n処理が中断されました", file=sys.stderr)
+        sys.exit(130)
+    except RAGException as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
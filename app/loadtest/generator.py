@@ -0,0 +1,202 @@
+"""
+FastAPI サービスへの負荷生成
+
+同時実行数を段階的に引き上げながら、各段階の一定時間、質問応答・テキスト登録・
+ファイルアップロードを指定の比率で送り続け、エンドポイントごとのスループット・
+レイテンシ・エラー率を集計する。
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ..core.exceptions import RAGException
+from ..utils.metrics import summarize_latencies
+
+OPERATIONS = ("ask", "text", "upload")
+
+
+@dataclass
+class LoadScenario:
+    """負荷試験のシナリオ"""
+    target: str
+    ramp: list[int]
+    step_seconds: float
+    mix: dict[str, float]
+    questions: list[str]
+    texts: list[str] = field(default_factory=list)
+    files: list[tuple[str, bytes]] = field(default_factory=list)
+    cache_bust: bool = False
+    timeout: float = 120.0
+    seed: int = 0
+
+    def validate(self) -> None:
+        """シナリオの整合性を確認"""
+        if not self.ramp or any(level <= 0 for level in self.ramp):
+            raise RAGException("同時実行数の段階は正の整数で指定してください")
+        unknown = set(self.mix) - set(OPERATIONS)
+        if unknown:
+            raise RAGException(f"未対応の操作です: {', '.join(sorted(unknown))}")
+        if not any(weight > 0 for weight in self.mix.values()):
+            raise RAGException("操作の比率がすべて0です")
+        corpora = {"ask": self.questions, "text": self.texts, "upload": self.files}
+        for operation, weight in self.mix.items():
+            if weight > 0 and not corpora[operation]:
+                raise RAGException(f"{operation} に使うデータがありません")
+
+
+@dataclass(frozen=True, slots=True)
+class _Sample:
+    """1リクエストの計測結果"""
+    operation: str
+    latency_ms: float
+    status: str
+
+    @property
+    def ok(self) -> bool:
+        return self.status.isdigit() and int(self.status) < 400
+
+
+def load_corpus(path: str | None) -> list[str]:
+    """1行1件のコーパスを読み込む（空行と # で始まる行は無視）"""
+    if not path:
+        return []
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except OSError as e:
+        raise RAGException(f"コーパスを読み込めません: {e}") from e
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def load_files(directory: str | None) -> list[tuple[str, bytes]]:
+    """アップロードに使うファイルを読み込む"""
+    if not directory:
+        return []
+    root = Path(directory)
+    if not root.is_dir():
+        raise RAGException(f"ディレクトリが見つかりません: {directory}")
+    return [(path.name, path.read_bytes()) for path in sorted(root.iterdir()) if path.is_file()]
+
+
+class LoadGenerator:
+    """段階的に同時実行数を上げながら負荷をかけるクライアント"""
+
+    def __init__(self, scenario: LoadScenario) -> None:
+        scenario.validate()
+        self.scenario = scenario
+        self._random = random.Random(scenario.seed)
+        self._sequence = itertools.count()
+        operations = [op for op in OPERATIONS if scenario.mix.get(op, 0) > 0]
+        self._operations = operations
+        self._weights = [scenario.mix[op] for op in operations]
+
+    async def run(self) -> dict[str, Any]:
+        """全段階を実行してレポートを返す"""
+        import httpx
+
+        steps = []
+        limits = httpx.Limits(max_connections=max(self.scenario.ramp), max_keepalive_connections=max(self.scenario.ramp))
+        async with httpx.AsyncClient(
+            base_url=self.scenario.target, timeout=self.scenario.timeout, limits=limits
+        ) as client:
+            for concurrency in self.scenario.ramp:
+                steps.append(await self._run_step(client, concurrency))
+        return {
+            "target": self.scenario.target,
+            "mix": self.scenario.mix,
+            "step_seconds": self.scenario.step_seconds,
+            "steps": steps,
+            "saturation": find_saturation(steps),
+        }
+
+    async def _run_step(self, client, concurrency: int) -> dict[str, Any]:
+        """指定の同時実行数で一定時間負荷をかける"""
+        samples: list[_Sample] = []
+        deadline = time.perf_counter() + self.scenario.step_seconds
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                samples.append(await self._request(client))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return summarize_step(concurrency, elapsed, samples)
+
+    async def _request(self, client) -> _Sample:
+        """操作を1つ選んで送信し、レイテンシと結果を記録"""
+        operation = self._random.choices(self._operations, self._weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await self._send(client, operation)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        return _Sample(operation, (time.perf_counter() - start) * 1000, status)
+
+    async def _send(self, client, operation: str):
+        """操作に応じたリクエストを送信"""
+        scenario = self.scenario
+        n = next(self._sequence)
+        if operation == "ask":
+            question = self._random.choice(scenario.questions)
+            if scenario.cache_bust:
+                # 回答キャッシュに当たらないよう質問ごとに文字列を変える
+                question = f"{question} #{n}"
+            return await client.get("/", params={"q": question})
+        if operation == "text":
+            return await client.post("/text/", json={"text": self._random.choice(scenario.texts), "source": f"loadtest-{n}"})
+        name, content = self._random.choice(scenario.files)
+        return await client.post("/upload/", files=[("files", (f"{n}-{name}", content))])
+
+
+def summarize_step(concurrency: int, elapsed: float, samples: list[_Sample]) -> dict[str, Any]:
+    """1段階の計測結果をエンドポイントごとに集計"""
+    by_operation: dict[str, list[_Sample]] = defaultdict(list)
+    for sample in samples:
+        by_operation[sample.operation].append(sample)
+
+    def summarize(group: list[_Sample]) -> dict[str, Any]:
+        succeeded = [sample.latency_ms for sample in group if sample.ok]
+        summary: dict[str, Any] = summarize_latencies(succeeded, elapsed)
+        errors = len(group) - len(succeeded)
+        summary.update(
+            requests=len(group),
+            errors=errors,
+            error_rate=errors / len(group) if group else 0.0,
+            status=dict(Counter(sample.status for sample in group)),
+        )
+        return summary
+
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "total": summarize(samples),
+        "endpoints": {operation: summarize(group) for operation, group in sorted(by_operation.items())},
+    }
+
+
+def find_saturation(steps: list[dict[str, Any]], min_gain: float = 0.1, max_error_rate: float = 0.01) -> dict[str, Any] | None:
+    """スループットが伸びなくなった、またはエラーが出始めた段階を検出"""
+    for previous, current in itertools.pairwise(steps):
+        before = previous["total"]["throughput"]
+        after = current["total"]["throughput"]
+        if current["total"]["error_rate"] > max_error_rate:
+            reason = f"エラー率が{current['total']['error_rate']:.1%}に上昇"
+        elif before > 0 and after < before * (1 + min_gain):
+            reason = f"スループットの伸びが{min_gain:.0%}未満（{before:.2f} → {after:.2f}件/秒）"
+        else:
+            continue
+        return {
+            "concurrency": previous["concurrency"],
+            "throughput": before,
+            "p95_ms": previous["total"]["p95_ms"],
+            "reason": f"同時実行数{current['concurrency']}で{reason}",
+        }
+    return None
@@ -0,0 +1,164 @@
+"""
+Ollama・llama.cpp 互換の推論サーバーの代替スタブ
+
+実際のモデルは動かさず、設定した遅延とトークン生成速度で応答する。
+同時に処理できるリクエスト数（GPUのスロット数）も再現し、飽和時の待ち行列を模擬する。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..utils.fastjson import dumps, loads
+
+
+@dataclass(frozen=True, slots=True)
+class StubProfile:
+    """スタブの応答特性"""
+    dimension: int = 768
+    embed_latency_ms: float = 15.0
+    embed_per_item_ms: float = 2.0
+    embed_parallel: int = 4
+    prefill_ms: float = 200.0
+    tokens_per_second: float = 40.0
+    answer_tokens: int = 128
+    chat_parallel: int = 2
+    jitter: float = 0.1
+    error_rate: float = 0.0
+
+
+def stub_embedding(text: str, dimension: int) -> list[float]:
+    """テキストから決定的な正規化済みベクトルを作成"""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_stub_app(profile: StubProfile) -> FastAPI:
+    """スタブの FastAPI アプリケーションを作成"""
+    app = FastAPI(title="推論サーバースタブ")
+    embed_slots = asyncio.Semaphore(profile.embed_parallel)
+    chat_slots = asyncio.Semaphore(profile.chat_parallel)
+
+    def jittered(seconds: float) -> float:
+        return max(0.0, seconds * random.uniform(1 - profile.jitter, 1 + profile.jitter))
+
+    async def occupy(slots: asyncio.Semaphore, seconds: float) -> bool:
+        """スロットを確保して処理時間だけ待機（障害を模擬する場合は False）"""
+        async with slots:
+            await asyncio.sleep(jittered(seconds))
+        return random.random() >= profile.error_rate
+
+    def embed_seconds(count: int) -> float:
+        return (profile.embed_latency_ms + profile.embed_per_item_ms * count) / 1000
+
+    def unavailable() -> JSONResponse:
+        return JSONResponse({"error": "stub failure"}, status_code=503)
+
+    async def embed_inputs(request: Request, key: str) -> list[str] | None:
+        """リクエストから埋め込み対象のテキストを取り出し、処理時間だけ待機"""
+        body = loads(await request.body())
+        inputs = body.get(key, [])
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        if not await occupy(embed_slots, embed_seconds(len(texts))):
+            return None
+        return texts
+
+    @app.post("/api/embeddings")
+    async def ollama_embedding(request: Request):
+        """Ollama の単一埋め込みAPI"""
+        texts = await embed_inputs(request, "prompt")
+        if texts is None:
+            return unavailable()
+        return {"embedding": stub_embedding(texts[0], profile.dimension)}
+
+    @app.post("/api/embed")
+    async def ollama_embed(request: Request):
+        """Ollama の一括埋め込みAPI"""
+        texts = await embed_inputs(request, "input")
+        if texts is None:
+            return unavailable()
+        return {"embeddings": [stub_embedding(text, profile.dimension) for text in texts]}
+
+    async def openai_embeddings(request: Request):
+        """OpenAI 互換の埋め込みAPI（llama.cpp）"""
+        texts = await embed_inputs(request, "input")
+        if texts is None:
+            return unavailable()
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": stub_embedding(text, profile.dimension)}
+                for i, text in enumerate(texts)
+            ],
+        }
+
+    def chat_chunk(model: str, delta: dict, finish_reason: str | None = None) -> str:
+        """ストリーミング応答の1イベントを作成"""
+        chunk = {
+            "id": "stub-stream",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {dumps(chunk)}\n\n"
+
+    async def stream_chat(model: str):
+        """生成速度に合わせて回答を少しずつ送信（切断されるとスロットを解放して生成を止める）"""
+        words = max(1, profile.answer_tokens // 4)
+        async with chat_slots:
+            await asyncio.sleep(jittered(profile.prefill_ms / 1000))
+            yield chat_chunk(model, {"role": "assistant", "content": ""})
+            for _ in range(words):
+                await asyncio.sleep(jittered(4 / max(profile.tokens_per_second, 1e-6)))
+                yield chat_chunk(model, {"content": "スタブ回答 "})
+        yield chat_chunk(model, {}, "stop")
+        yield "data: [DONE]\n\n"
+
+    async def chat_completions(request: Request):
+        """OpenAI 互換のチャットAPI（Ollama・llama.cpp 共通）"""
+        body = loads(await request.body())
+        if body.get("stream"):
+            if random.random() < profile.error_rate:
+                return unavailable()
+            return StreamingResponse(stream_chat(body.get("model", "stub")), media_type="text/event-stream")
+        seconds = profile.prefill_ms / 1000 + profile.answer_tokens / max(profile.tokens_per_second, 1e-6)
+        if not await occupy(chat_slots, seconds):
+            return unavailable()
+        content = " ".join(["スタブ回答"] * max(1, profile.answer_tokens // 4))
+        return {
+            "id": f"stub-{time.monotonic_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": profile.answer_tokens, "total_tokens": profile.answer_tokens},
+        }
+
+    async def models():
+        """モデル一覧（疎通確認用）"""
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    # Ollama の OpenAI 互換API（/v1）と Docker Model Runner 経由の llama.cpp（/engines/llama.cpp/v1）
+    for prefix in ("/v1", "/engines/llama.cpp/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+        app.add_api_route(f"{prefix}/embeddings", openai_embeddings, methods=["POST"])
+        app.add_api_route(f"{prefix}/models", models, methods=["GET"])
+    return app
+
+
+def run_stub_server(profile: StubProfile, host: str, port: int) -> None:
+    """スタブサーバーを起動"""
+    import uvicorn
+
+    uvicorn.run(create_stub_app(profile), host=host, port=port, log_level="warning", access_log=False)
@@ -0,0 +1,96 @@
+"""
+本番用APIサーバーの起動
+"""
+from __future__ import annotations
+
+import os
+
+from .utils.config import Config
+from .utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+APP_PATH = "app.api_main:app"
+
+
+def run_development(host: str, port: int) -> None:
+    """開発用サーバー（自動リロード・単一ワーカー）を起動"""
+    import uvicorn
+
+    uvicorn.run(APP_PATH, host=host, port=port, reload=True, log_level="info")
+
+
+def run_production(host: str, port: int, workers: int | None = None) -> None:
+    """本番用サーバーを複数ワーカーで起動
+
+    gunicorn が利用できる場合は設定とアプリケーションをマスタープロセスで読み込んでから fork し、
+    読み込み済みのモジュールをワーカー間で共有する。利用できない場合は uvicorn のマルチプロセスで起動する。
+    """
+    Config.load()
+    workers = workers or Config.get("server", "workers", default=os.cpu_count() or 1)
+    # ワーカーごとのプール・キャッシュの大きさを按分できるようワーカー数を伝える
+    os.environ["RAG_WORKERS"] = str(workers)
+
+    settings = {
+        "backlog": Config.get("server", "backlog", default=2048),
+        "keep_alive": Config.get("server", "keep_alive", default=5),
+        "graceful_timeout": Config.get("server", "graceful_timeout", default=60),
+        "limit_concurrency": Config.get("server", "limit_concurrency", default=None),
+    }
+    logger.info(f"本番モードで起動します: {host}:{port} (ワーカー数: {workers})")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        _run_uvicorn(host, port, workers, settings)
+    else:
+        _run_gunicorn(host, port, workers, settings)
+
+
+def _run_uvicorn(host: str, port: int, workers: int, settings: dict) -> None:
+    """uvicorn のマルチプロセスモードで起動"""
+    import uvicorn
+
+    uvicorn.run(
+        APP_PATH,
+        host=host,
+        port=port,
+        workers=workers,
+        backlog=settings["backlog"],
+        timeout_keep_alive=settings["keep_alive"],
+        timeout_graceful_shutdown=settings["graceful_timeout"],
+        limit_concurrency=settings["limit_concurrency"],
+        log_level="info",
+        access_log=False,
+    )
+
+
+def _run_gunicorn(host: str, port: int, workers: int, settings: dict) -> None:
+    """gunicorn でアプリケーションを事前読み込みしてから起動"""
+    from gunicorn.app.base import BaseApplication
+
+    try:
+        import uvicorn_worker  # noqa: F401
+        worker_class = "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        worker_class = "uvicorn.workers.UvicornWorker"
+
+    class _Application(BaseApplication):
+        def load_config(self) -> None:
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", worker_class)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("backlog", settings["backlog"])
+            self.cfg.set("keepalive", settings["keep_alive"])
+            self.cfg.set("graceful_timeout", settings["graceful_timeout"])
+            # 長い回答生成でワーカーが強制終了されないようにする
+            self.cfg.set("timeout", max(120, settings["graceful_timeout"] * 2))
+            if settings["limit_concurrency"]:
+                self.cfg.set("worker_connections", settings["limit_concurrency"])
+
+        def load(self):
+            from .api_main import app
+            return app
+
+    _Application().run()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+
+from anyio import to_thread
+from pydantic import ValidationError
+
+from ..core.models import BulkTextRecord, BulkTextResult, BulkTextSummary
+from ..utils.config import Config
+from ..utils.fastjson import loads
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+KB = 1024
+
+
+class BulkTextService:
+    """NDJSON のリクエストボディを受信しながらテキストをまとめて登録するサービス
+
+    受信したレコードを batch_records 件ずつにまとめ、埋め込みと登録を1回で行う。
+    あるまとまりを登録している間に次のまとまりを受信し、結果はまとまりごとに逐次返す。
+    """
+
+    def __init__(
+        self,
+        register_batch: Callable[[list[BulkTextRecord]], list[BulkTextResult]],
+        batch_records: int = 64,
+        max_record_bytes: int = 1024 * KB,
+    ) -> None:
+        self.register_batch = register_batch
+        self.batch_records = batch_records
+        self.max_record_bytes = max_record_bytes
+
+    @classmethod
+    def from_config(cls, register_batch: Callable[[list[BulkTextRecord]], list[BulkTextResult]]) -> BulkTextService:
+        """設定ファイルの [ingest] からサービスを作成"""
+        return cls(
+            register_batch,
+            batch_records=Config.get("ingest", "text_bulk_batch_records", default=64),
+            max_record_bytes=int(Config.get("ingest", "text_bulk_max_record_kb", default=1024) * KB),
+        )
+
+    async def register(self, body: AsyncIterator[bytes]) -> AsyncIterator[BulkTextResult | BulkTextSummary]:
+        """レコードごとの結果を逐次返し、最後に集計を返す"""
+        records = chunks = failed = 0
+        group: list[tuple[int, BulkTextRecord]] = []
+        # 前のまとまりを登録している間に次のまとまりを受信できるよう、最大2つまで並行させる
+        inflight: deque[asyncio.Task[list[BulkTextResult]]] = deque()
+        lines = _iter_lines(body, self.max_record_bytes)
+        try:
+            while True:
+                item = await anext(lines, None)
+                if item is not None:
+                    line_no, line = item
+                    records += 1
+                    parsed = self._parse(line_no, line)
+                    if isinstance(parsed, BulkTextResult):
+                        failed += 1
+                        yield parsed
+                        continue
+                    group.append((line_no, parsed))
+                    if len(group) < self.batch_records:
+                        continue
+                if group:
+                    inflight.append(asyncio.ensure_future(self._register(group)))
+                    group = []
+
+                # 受信中は先に投入したまとまりの結果を、受信を終えたら残りすべての結果を返す
+                while inflight and (item is None or len(inflight) > 1):
+                    for result in await inflight.popleft():
+                        chunks += result.chunks
+                        failed += result.error is not None
+                        yield result
+                if item is None:
+                    break
+        finally:
+            for task in inflight:
+                task.cancel()
+
+        logger.info(f"テキスト一括登録: {records}件を受信, {failed}件失敗, {chunks}チャンクを登録")
+        yield BulkTextSummary(records=records, chunks=chunks, failed=failed)
+
+    def _parse(self, line_no: int, line: bytes | None) -> BulkTextRecord | BulkTextResult:
+        """1行を解析してレコードを作成（不正な行はエラー結果を返す）"""
+        if line is None:
+            return _error(line_no, None, f"レコードのサイズが上限({self.max_record_bytes // KB}KB)を超えています")
+        try:
+            return BulkTextRecord.model_validate(loads(line))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            return _error(line_no, None, f"不正なレコードです: {message}")
+        except ValueError as e:
+            return _error(line_no, None, f"JSONとして解析できません: {e}")
+
+    async def _register(self, group: list[tuple[int, BulkTextRecord]]) -> list[BulkTextResult]:
+        """スレッドプールでまとまりを登録し、行番号を付けた結果を返す"""
+        try:
+            results = await to_thread.run_sync(self.register_batch, [record for _, record in group])
+        except Exception as e:
+            logger.error(f"テキスト一括登録エラー: {e}")
+            return [_error(line_no, record.source, str(e)) for line_no, record in group]
+        return [
+            result.model_copy(update={"line": line_no})
+            for (line_no, _), result in zip(group, results)
+        ]
+
+
+def _error(line_no: int, source: str | None, message: str) -> BulkTextResult:
+    """エラー結果を作成"""
+    return BulkTextResult(line=line_no, source=source, status="error", error=message)
+
+
+async def _iter_lines(body: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[tuple[int, bytes | None]]:
+    """受信データを行に分割して返す（空行は除く。上限を超える行は None として読み捨てる）"""
+    buffer = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in body:
+        buffer += chunk
+        while (end := buffer.find(b"\n")) >= 0:
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            line_no += 1
+            if oversized or len(line) > max_bytes:
+                oversized = False
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line
+        if len(buffer) > max_bytes:
+            # 改行が来るまで受信データを保持しない
+            oversized = True
+            buffer.clear()
+    if oversized:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, bytes(buffer)
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import contextvars
 import os
-import uuid
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, batched, pairwise
 from pathlib import Path
+from typing import Any, BinaryIO
 
-import pdfplumber
-from qdrant_client.models import PointStruct
+import numpy as np
 
+from ..adapters.adaptive import AdaptiveLimiter, find_adaptive_limiter
+from ..adapters.chunk_store import ChunkStore, StoredChunk, content_hash
+from ..adapters.parsers import get_parser, supported_extensions
+from ..adapters.scheduler import Priority, request_priority
+from ..adapters.tokenizer import create_token_counter
+from ..core.chunker import TextChunker
+from ..core.dedup import HeaderFooterStripper, NearDuplicateIndex
 from ..core.exceptions import DocumentProcessingError
+from ..core.models import BulkTextRecord, BulkTextResult
+from ..core.vectors import Vector, VectorMatrix, as_matrix
 from ..utils.config import Config
 from ..utils.logger import get_logger
 
@@ -17,10 +30,59 @@ logger = get_logger(__name__)
 class DocumentIngestService:
     """文書取り込みサービス"""
     
-    def __init__(self, embedder, vector_store) -> None:
+    def __init__(self, embedder, vector_store, chunk_store: ChunkStore | None = None) -> None:
         self.embedder = embedder
         self.vector_store = vector_store
-        self.debug_chunk_output = Config.get("debug", "chunk_output", default=False)
+        if chunk_store is None and Config.get("chunk_store", "enabled", default=True):
+            chunk_store = ChunkStore()
+        self.chunk_store = chunk_store
+        self.upsert_batch_size = Config.get("ingest", "upsert_batch_size", default=64)
+        self.embed_batch_size = max(1, Config.get("ingest", "embed_batch_size", default=1))
+        self.text_embed_batch_size = max(1, Config.get("ingest", "text_bulk_embed_batch", default=32))
+        # 埋め込みの並行数はリミッターが応答状況から決める
+        self._embed_limiter: AdaptiveLimiter | None = find_adaptive_limiter(embedder)
+        self._embed_executor: ThreadPoolExecutor | None = None
+        self._embed_executor_lock = threading.Lock()
+        
+        model_type = Config.get("model_type", default="ollama").lower()
+        embed_max_tokens = Config.get(model_type, "embed_max_tokens", default=2048)
+        self.count_tokens = create_token_counter()
+        self.page_chunker = TextChunker(embed_max_tokens, token_counter=self.count_tokens)
+        self.file_chunker = self._build_chunker("file", 512, 64)
+        self.text_chunker = self._build_chunker("text", 160, 32)
+        
+        # 近似重複チャンクの検出とページ共通のヘッダー・フッター除去
+        self.dedup_index: NearDuplicateIndex | None = None
+        self.dedup_mode = Config.get("dedup", "mode", default="skip")
+        if Config.get("dedup", "enabled", default=True):
+            self.dedup_index = NearDuplicateIndex(
+                threshold=Config.get("dedup", "threshold", default=0.85),
+                num_perm=Config.get("dedup", "num_perm", default=128),
+                bands=Config.get("dedup", "bands", default=16),
+                shingle_size=Config.get("dedup", "shingle_size", default=5),
+                min_chars=Config.get("dedup", "min_chars", default=50),
+            )
+        self.header_stripper: HeaderFooterStripper | None = None
+        if Config.get("dedup", "strip_headers", default=True):
+            self.header_stripper = HeaderFooterStripper(
+                edge_lines=Config.get("dedup", "header_edge_lines", default=3),
+                min_ratio=Config.get("dedup", "header_min_ratio", default=0.5),
+                sample_pages=Config.get("dedup", "header_sample_pages", default=30),
+            )
+
+    def _build_chunker(self, section: str, chunk_tokens: int, overlap_tokens: int) -> TextChunker:
+        """埋め込みモデルの最大トークン数を考慮してチャンカーを作成"""
+        embed_max_tokens = self.page_chunker.chunk_tokens
+        size = Config.get("chunking", f"{section}_chunk_tokens", default=chunk_tokens)
+        overlap = Config.get("chunking", f"{section}_overlap_tokens", default=overlap_tokens)
+        
+        # 埋め込みサーバー側で切り捨てられないよう、モデル上限を超えないようにする
+        if size > embed_max_tokens:
+            logger.warning(
+                f"チャンクサイズ({size})が埋め込みモデルの上限({embed_max_tokens})を超えるため調整します"
+            )
+            size = embed_max_tokens
+        return TextChunker(size, overlap, token_counter=self.count_tokens)
 
     def get_registerable_files(self, directory: str) -> list[str]:
         """登録可能なファイル一覧を取得"""
@@ -32,163 +94,308 @@ class DocumentIngestService:
     
     def _scan_supported_files(self, directory_path: Path) -> list[str]:
         """サポートされているファイルをスキャン"""
-        supported_extensions = {".pdf", ".txt"}
+        extensions = supported_extensions()
         files = []
         
         try:
             for root, _, file_list in os.walk(directory_path):
                 for file in file_list:
                     file_path = Path(file)
-                    if file_path.suffix.lower() in supported_extensions:
+                    if file_path.suffix.lower() in extensions:
                         files.append(os.path.join(root, file))
             return files
         except Exception as e:
             raise DocumentProcessingError(f"ファイル検索エラー: {e}") from e
 
-    def load_pdf_document(self, path: str) -> list[str]:
+    def load_document(self, source: str | BinaryIO, filename: str | None = None) -> Iterator[str]:
+        """登録済みパーサーでファイルを読み込み、チャンクを逐次生成"""
+        name = filename or str(source)
+        ext = os.path.splitext(name)[1].lower()
+        parser = get_parser(ext)
+        if parser is None:
+            raise DocumentProcessingError(f"未対応ファイル形式: {name}")
+        
+        segments = parser.extract(source)
+        if parser.per_segment:
+            if self.header_stripper is not None:
+                segments = self.header_stripper.strip_pages(segments)
+            # ページ単位を維持しつつ、モデル上限を超えるページのみ分割
+            return (chunk for segment in segments for chunk in self.page_chunker.split(segment))
+        return self.file_chunker.iter_chunks(segments)
+
+    def load_pdf_document(self, path: str) -> Iterator[str]:
         """PDFファイルを読み込んでチャンクに分割"""
-        try:
-            chunks = []
-            with pdfplumber.open(path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text and page_text.strip():
-                        chunks.append(page_text.strip())
-            return chunks
-        except Exception as e:
-            raise DocumentProcessingError(f"PDF読み込みエラー ({path}): {e}") from e
+        return self.load_document(path)
 
-    def load_txt_document(self, path: str) -> list[str]:
-        """テキストファイルを読み込んでチャンクに分割"""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-            
-            if not content:
-                return []
-            return self._split_text_into_chunks(content)
-                    
-        except Exception as e:
-            raise DocumentProcessingError(f"テキストファイル読み込みエラー ({path}): {e}") from e
-    
-    def _split_text_into_chunks(
+    def load_txt_document(self, path: str) -> Iterator[str]:
+        """テキストファイルを逐次読み込みながらチャンクに分割"""
+        return self.load_document(path)
+
+    def store_qdrant(
         self, 
-        text: str, 
-        chunk_size: int = 1000, 
-        overlap: int = 100
-    ) -> list[str]:
-        """テキストをチャンクに分割"""
-        if len(text) <= chunk_size:
-            return [text]
-        return self._perform_chunking(text, chunk_size, overlap)
-    
-    def _perform_chunking(self, text: str, chunk_size: int, overlap: int) -> list[str]:
-        """実際のチャンク分割を実行"""
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            
-            # 文の途中で切れないように調整
-            if end < len(text) and not text[end].isspace():
-                last_period = chunk.rfind('。')
-                last_newline = chunk.rfind('\n')
-                cut_point = max(last_period, last_newline)
-                
-                if cut_point > start + chunk_size // 2:
-                    chunk = text[start:cut_point + 1]
-                    end = cut_point + 1
-            
-            if stripped_chunk := chunk.strip():
-                chunks.append(stripped_chunk)
-                
-            start = end - overlap
-            
-        return chunks
+        files: list[str], 
+        workers: int = 1, 
+        on_file_done: Callable[[str, int | None], None] | None = None
+    ) -> int:
+        """ファイルをQdrantに保存（workers > 1 ならファイル単位で並列処理）
 
-    def store_qdrant(self, files: list[str]) -> None:
-        """ファイルをQdrantに保存"""
-        debug_dir = Path("./debug_chunks")
-        
-        for file_path in files:
+        on_file_done にはファイルごとに登録チャンク数（失敗時は None）が渡される。
+        ソース名はファイル名のため、別のディレクトリにある同名のファイルはまとめて順に処理し、
+        登録済みのソースを置き換えるのは最初のファイルだけにする。
+        """
+        def process_one(file_path: str, replace: bool) -> int:
             try:
-                self._process_single_file(file_path, debug_dir)
+                stored = self.ingest_file(file_path, replace=replace)
             except Exception as e:
                 logger.error(f"ファイル処理エラー ({file_path}): {e}")
-                continue
+                if on_file_done is not None:
+                    on_file_done(file_path, None)
+                return 0
+            if on_file_done is not None:
+                on_file_done(file_path, stored)
+            return stored
+
+        def process(group: list[str]) -> int:
+            return sum(process_one(file_path, replace=i == 0) for i, file_path in enumerate(group))
+
+        by_source: dict[str, list[str]] = {}
+        for file_path in files:
+            by_source.setdefault(os.path.basename(file_path), []).append(file_path)
+        groups = list(by_source.values())
+
+        if workers <= 1:
+            total = sum(process(group) for group in groups)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+                total = sum(executor.map(process, groups))
         
         logger.info("インデックス作成完了")
-        if self.debug_chunk_output:
-            logger.info("チャンク内容を ./debug_chunks に出力しました")
+        return total
+
+    def ingest_file(self, file_path: str, replace: bool = True) -> int:
+        """単一ファイルを一括取り込みの優先度で登録（replace が真なら同じソースの登録済みチャンクを置き換える）"""
+        with request_priority(Priority.BULK):
+            return self._process_single_file(file_path, replace)
     
-    def _process_single_file(self, file_path: str, debug_dir: Path) -> None:
+    def _process_single_file(self, file_path: str, replace: bool = True) -> int:
         """単一ファイルを処理"""
         ext = os.path.splitext(file_path)[1].lower()
         base_name = os.path.basename(file_path)
         logger.info(f"{file_path} をQdrantに保存中")
         
-        # ファイル形式に応じて読み込み
-        if ext == ".pdf":
-            chunks = self.load_pdf_document(file_path)
-        elif ext == ".txt":
-            chunks = self.load_txt_document(file_path)
-        else:
+        # ファイル形式に応じたパーサーで読み込み
+        if get_parser(ext) is None:
             logger.warning(f"未対応ファイル形式: {file_path}")
-            return
-
-        if not chunks:
-            logger.warning(f"チャンクが生成されませんでした: {file_path}")
-            return
+            return 0
         
-        self._create_and_store_points(chunks, base_name, ext, debug_dir)
+        chunks = self.load_document(file_path)
+        stored = self._store_source(chunks, base_name, replace)
+        
+        if not stored:
+            logger.warning(f"有効なポイントが生成されませんでした: {base_name}")
+        else:
+            logger.info(f"{base_name}: {stored}チャンクを登録")
+        return stored
     
-    def _create_and_store_points(
-        self, 
-        chunks: list[str], 
-        base_name: str, 
-        ext: str, 
-        debug_dir: Path
-    ) -> None:
-        """チャンクからポイントを作成してストア"""
-        # デバッグ出力準備
-        debug_subdir = None
-        if self.debug_chunk_output:
-            debug_subdir = debug_dir / base_name.replace(ext, "")
-            debug_subdir.mkdir(parents=True, exist_ok=True)
-
-        # ポイント作成
-        points = []
-        for idx, chunk in enumerate(chunks):
-            if debug_subdir:
-                debug_file = debug_subdir / f"chunk_{idx:03}.txt"
-                debug_file.write_text(chunk, encoding="utf-8")
-            
+    def ingest_stream(self, stream: BinaryIO, filename: str) -> int:
+        """ファイルオブジェクトから直接読み込んでベクターストアに登録"""
+        base_name = os.path.basename(filename)
+        logger.info(f"{base_name} をQdrantに保存中")
+        
+        with request_priority(Priority.BULK):
+            chunks = self.load_document(stream, filename=base_name)
+            stored = self._store_source(chunks, base_name)
+        
+        if not stored:
+            logger.warning(f"有効なポイントが生成されませんでした: {base_name}")
+        else:
+            logger.info(f"{base_name}: {stored}チャンクを登録")
+        return stored
+
+    def _store_source(self, chunks: Iterable[str], source: str, replace: bool = True) -> int:
+        """ファイルのチャンクを登録（replace なら登録済みの版を置き換える）
+
+        チャンクは解析しながら順に登録するため、解析・埋め込み・受信の失敗時は途中まで登録した
+        チャンクを取り除き、一部だけが検索対象に残らないようにする。
+        """
+        if replace:
+            self._replace_source(source)
+        try:
+            return self._create_and_store_points(chunks, source)
+        except BaseException:
             try:
-                embed = self.embedder.embed(chunk)
-                points.append(
-                    PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=embed,
-                        payload={
-                            "text": chunk,
-                            "source": base_name,
-                            "chunk_id": idx,
-                        },
-                    )
-                )
+                self._replace_source(source)
             except Exception as e:
-                logger.warning(f"チャンク埋め込み生成失敗 ({base_name}, chunk {idx}): {e}")
-                continue
+                logger.error(f"途中まで登録したチャンクの削除に失敗 ({source}): {e}")
+            raise
 
-        if not points:
-            logger.warning(f"有効なポイントが生成されませんでした: {base_name}")
+    def _replace_source(self, source: str) -> None:
+        """再取り込みするファイルの登録済みチャンク・ポイント・署名を削除
+
+        編集で消えたチャンクが検索や再埋め込みで復活しないよう、ファイル単位で置き換える。
+        チャンクストアより前に登録したポイントや、チャンクストアを失った場合も消せるよう、
+        ベクターストアは常にソースで絞り込んで削除する。
+        """
+        if self.chunk_store is not None:
+            self.chunk_store.remove_source(source)
+        self.vector_store.delete_source(source)
+        if self.dedup_index is not None:
+            self.dedup_index.discard(source)
+
+    def _create_and_store_points(self, chunks: Iterable[str], source: str, deduplicate: bool = True) -> int:
+        """チャンクをチャンクストアへ保存し、埋め込んでベクターストアに登録"""
+        records = (
+            StoredChunk(source=source, chunk_id=idx, text=chunk, content_hash=content_hash(chunk))
+            for idx, chunk in enumerate(chunks)
+        )
+        return self._embed_and_store(records, persist=True, deduplicate=deduplicate)
+
+    def _embed_and_store(self, chunks: Iterable[StoredChunk], persist: bool, deduplicate: bool = True) -> int:
+        """チャンクをバッチ単位で埋め込み、ベクターストアに登録"""
+        stored = 0
+        for batch in batched(chunks, self.upsert_batch_size):
+            if persist and self.chunk_store is not None:
+                self.chunk_store.append(batch)
+            
+            ids, vectors, payloads = self._build_points(batch, deduplicate and self.dedup_index is not None)
+            if ids:
+                self.vector_store.upsert_vectors(ids, as_matrix(vectors), payloads)
+                stored += len(ids)
+        return stored
+
+    def _build_points(
+        self, chunks: Iterable[StoredChunk], deduplicate: bool = False
+    ) -> tuple[list[str], list[Vector], list[dict[str, Any]]]:
+        """チャンクを埋め込みベクトルに変換し、ID・ベクトル・ペイロードを作成
+
+        近似重複の判定が有効な場合、登録済みのチャンクとほぼ同じ内容のものは埋め込まず、
+        dedup_mode が "skip" なら登録しない。"link" なら登録済みのベクトルを共有して登録する。
+        ポイントIDはチャンクから決まるため、同じチャンクを登録し直すと既存のポイントを上書きする。
+        """
+        ids: list[str] = []
+        vectors: list[Vector | None] = []
+        payloads: list[dict[str, Any]] = []
+        pending: list[int] = []
+        skipped = 0
+        for chunk in chunks:
+            point_id = chunk.point_id
+            payload: dict[str, Any] = {
+                "text": chunk.text,
+                "source": chunk.source,
+                "chunk_id": chunk.chunk_id,
+            }
+            signature = self.dedup_index.signature(chunk.text) if deduplicate else None
+            duplicate_of = self.dedup_index.find(signature) if signature is not None else None
+            # 同じチャンクを登録し直す場合は自身の署名に一致するため、重複とはみなさない
+            registered = duplicate_of == point_id
+            if duplicate_of is not None and not registered:
+                if self.dedup_mode == "skip":
+                    skipped += 1
+                    continue
+                # 共有するベクトルは後でまとめて取得する
+                payload["duplicate_of"] = duplicate_of
+            else:
+                pending.append(len(ids))
+                # 埋め込みに失敗した共有元は、後で共有するときに埋め込み直す
+                if signature is not None and not registered:
+                    self.dedup_index.add(point_id, signature, group=chunk.source)
+            ids.append(point_id)
+            vectors.append(None)
+            payloads.append(payload)
+
+        embedded = self._embed_chunks([payloads[i]["text"] for i in pending])
+        failed: list[int] = []
+        for i, vector in zip(pending, embedded):
+            if isinstance(vector, Exception):
+                logger.warning(f"チャンク埋め込み生成失敗 ({payloads[i]['source']}, chunk {payloads[i]['chunk_id']}): {vector}")
+                failed.append(i)
+            else:
+                vectors[i] = vector
+        for i in reversed(failed):
+            del ids[i], vectors[i], payloads[i]
+
+        if skipped:
+            logger.info(f"重複チャンクを{skipped}件スキップしました")
+        if any(vector is None for vector in vectors):
+            self._resolve_shared_vectors(ids, vectors, payloads)
+        return ids, vectors, payloads
+
+    def _embed_chunks(self, texts: list[str]) -> list[Vector | Exception]:
+        """チャンクを embed_batch_size 件ずつ並行して埋め込み（失敗したチャンクは例外を返す）
+
+        並行数は埋め込みモデルに組み込まれたリミッターの上限に従う。リミッターがなければ順に埋め込む。
+        """
+        groups = [list(group) for group in batched(texts, self.embed_batch_size)]
+        executor = self._get_embed_executor()
+        if executor is None or len(groups) <= 1:
+            results = [self._embed_group(group) for group in groups]
         else:
-            self.vector_store.upsert_points(points)
-            logger.info(f"{base_name}: {len(points)}チャンクを登録")
+            # 優先度などのコンテキストを引き継いで並行に埋め込む
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._embed_group, group)
+                for group in groups
+            ]
+            results = [future.result() for future in futures]
+        return [vector for group in results for vector in group]
+
+    def _embed_group(self, texts: list[str]) -> list[Vector | Exception]:
+        """チャンクのまとまりを埋め込み（一括で失敗したら1件ずつやり直す）"""
+        if len(texts) > 1:
+            try:
+                return list(self.embedder.embed_batch(texts))
+            except Exception as e:
+                logger.warning(f"一括埋め込みに失敗したためチャンク単位で再試行します: {e}")
+
+        results: list[Vector | Exception] = []
+        for text in texts:
+            try:
+                results.append(self.embedder.embed(text))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _get_embed_executor(self) -> ThreadPoolExecutor | None:
+        """埋め込みを並行させるスレッドプールを取得（初回のみ作成）"""
+        if self._embed_limiter is None:
+            return None
+        with self._embed_executor_lock:
+            if self._embed_executor is None:
+                self._embed_executor = ThreadPoolExecutor(
+                    max_workers=self._embed_limiter.max_limit, thread_name_prefix="ingest-embed"
+                )
+            return self._embed_executor
+
+    def _resolve_shared_vectors(
+        self, ids: list[str], vectors: list[Vector | None], payloads: list[dict[str, Any]]
+    ) -> None:
+        """重複チャンクに共有元のベクトルを割り当てる（取得できなければ埋め込み直す）"""
+        in_batch = {point_id: vector for point_id, vector in zip(ids, vectors) if vector is not None}
+        missing = {
+            payload["duplicate_of"] for vector, payload in zip(vectors, payloads)
+            if vector is None and payload["duplicate_of"] not in in_batch
+        }
+        shared = {**self.vector_store.retrieve_vectors(sorted(missing)), **in_batch} if missing else in_batch
 
-    def ingest(self, target_dir: str) -> None:
+        linked = 0
+        for i in range(len(ids) - 1, -1, -1):
+            if vectors[i] is not None:
+                continue
+            vector = shared.get(payloads[i]["duplicate_of"])
+            if vector is None:
+                del payloads[i]["duplicate_of"]
+                try:
+                    vector = self.embedder.embed(payloads[i]["text"])
+                except Exception as e:
+                    logger.warning(f"チャンク埋め込み生成失敗 ({payloads[i]['source']}, chunk {payloads[i]['chunk_id']}): {e}")
+                    del ids[i], vectors[i], payloads[i]
+                    continue
+            else:
+                linked += 1
+            vectors[i] = vector
+        if linked:
+            logger.info(f"重複チャンク{linked}件に登録済みのベクトルを共有しました")
+
+    def ingest(self, target_dir: str, workers: int = 1) -> int:
         """ディレクトリ内の文書を一括取り込み"""
         try:
             self.vector_store.init_collection()
@@ -196,10 +403,10 @@ class DocumentIngestService:
             
             if not files:
                 logger.warning("登録可能なファイルが見つかりません")
-                return
+                return 0
             
             logger.info(f"{len(files)}個のファイルを処理します")
-            self.store_qdrant(files)
+            return self.store_qdrant(files, workers=workers)
             
         except Exception as e:
             logger.error(f"文書取り込みエラー: {e}")
@@ -210,40 +417,179 @@ class DocumentIngestService:
         clean_text = text.strip()
         if not clean_text:
             raise DocumentProcessingError("空のテキストは登録できません")
-        return self._process_text_registration(clean_text, source)
+        with request_priority(Priority.TEXT):
+            return self._process_text_registration(clean_text, source)
     
     def _process_text_registration(self, text: str, source: str) -> int:
         """テキスト登録処理を実行"""
         try:
-            chunks = self._split_text_into_chunks(text, chunk_size=300, overlap=50)
-            
-            points = []
-            for idx, chunk in enumerate(chunks):
-                try:
-                    embed = self.embedder.embed(chunk)
-                    points.append(
-                        PointStruct(
-                            id=str(uuid.uuid4()),
-                            vector=embed,
-                            payload={
-                                "text": chunk,
-                                "source": source,
-                                "chunk_id": idx,
-                            },
-                        )
-                    )
-                except Exception as e:
-                    logger.warning(f"テキストチャンク埋め込み生成失敗 (chunk {idx}): {e}")
-                    continue
+            chunks = self.text_chunker.split(text)
+            stored = self._create_and_store_points(chunks, source, deduplicate=False)
             
-            if not points:
+            if not stored:
                 logger.warning("有効なポイントが生成されませんでした")
                 return 0
             
-            self.vector_store.upsert_points(points)
-            logger.info(f"テキスト登録完了: {len(points)}チャンク")
-            return len(points)
+            logger.info(f"テキスト登録完了: {stored}チャンク")
+            return stored
             
         except Exception as e:
             logger.error(f"テキスト登録エラー: {e}")
             raise DocumentProcessingError(f"テキスト登録に失敗しました: {e}") from e
+
+    def register_text_batch(self, records: list[BulkTextRecord]) -> list[BulkTextResult]:
+        """複数のテキストをまとめて埋め込み、1回の登録でベクターストアに保存
+
+        結果はレコードと同じ順序で返す。埋め込みに失敗したレコードは登録せず、
+        他のレコードの登録は続ける。
+        """
+        with request_priority(Priority.TEXT):
+            return self._process_text_batch(records)
+
+    def _process_text_batch(self, records: list[BulkTextRecord]) -> list[BulkTextResult]:
+        """テキストの一括登録処理を実行"""
+        results = [BulkTextResult(source=record.source) for record in records]
+        pending: list[tuple[int, list[StoredChunk]]] = []
+        for index, record in enumerate(records):
+            text = record.text.strip()
+            if not text:
+                results[index] = BulkTextResult(source=record.source, status="error", error="空のテキストは登録できません")
+                continue
+            chunks = [
+                StoredChunk(source=record.source, chunk_id=idx, text=chunk, content_hash=content_hash(chunk))
+                for idx, chunk in enumerate(self.text_chunker.split(text))
+            ]
+            pending.append((index, chunks))
+
+        embedded = self._embed_text_records([chunks for _, chunks in pending])
+        ids: list[str] = []
+        vectors: list[VectorMatrix] = []
+        payloads: list[dict[str, Any]] = []
+        stored: list[StoredChunk] = []
+        for (index, chunks), matrix in zip(pending, embedded):
+            if isinstance(matrix, Exception):
+                logger.warning(f"テキスト埋め込み生成失敗 ({records[index].source}): {matrix}")
+                results[index] = BulkTextResult(source=records[index].source, status="error", error=str(matrix))
+                continue
+            metadata = records[index].metadata
+            for chunk in chunks:
+                payload: dict[str, Any] = {"text": chunk.text, "source": chunk.source, "chunk_id": chunk.chunk_id}
+                if metadata:
+                    payload["metadata"] = metadata
+                ids.append(chunk.point_id)
+                payloads.append(payload)
+            vectors.append(matrix)
+            stored.extend(chunks)
+            results[index] = BulkTextResult(source=records[index].source, chunks=len(chunks))
+
+        if ids:
+            try:
+                if self.chunk_store is not None:
+                    self.chunk_store.append(stored)
+                matrix = np.concatenate(vectors)
+                for start in range(0, len(ids), self.upsert_batch_size):
+                    end = start + self.upsert_batch_size
+                    self.vector_store.upsert_vectors(ids[start:end], matrix[start:end], payloads[start:end])
+            except Exception as e:
+                logger.error(f"テキスト一括登録エラー: {e}")
+                raise DocumentProcessingError(f"テキストの一括登録に失敗しました: {e}") from e
+        logger.info(f"テキスト一括登録完了: {len(records)}件中{len(vectors)}件, {len(ids)}チャンク")
+        return results
+
+    def _embed_text_records(self, records: list[list[StoredChunk]]) -> list[VectorMatrix | Exception]:
+        """レコードごとのチャンクを text_bulk_embed_batch 件以下のまとまりに分け、並行して埋め込み
+
+        1レコードで上限を超える場合はそのレコードだけを上限件数ずつ埋め込んで連結する。
+        """
+        groups: list[list[list[StoredChunk]]] = []
+        size = 0
+        for chunks in records:
+            if not groups or size + len(chunks) > self.text_embed_batch_size:
+                groups.append([])
+                size = 0
+            groups[-1].append(chunks)
+            size += len(chunks)
+
+        executor = self._get_embed_executor()
+        if executor is None or len(groups) <= 1:
+            results = [self._embed_record_group(group) for group in groups]
+        else:
+            # 優先度などのコンテキストを引き継いで並行に埋め込む
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._embed_record_group, group)
+                for group in groups
+            ]
+            results = [future.result() for future in futures]
+        return [matrix for group in results for matrix in group]
+
+    def _embed_record_group(self, records: list[list[StoredChunk]]) -> list[VectorMatrix | Exception]:
+        """レコードのまとまりを一括で埋め込み（失敗時はレコード単位でやり直す）"""
+        if len(records) > 1:
+            texts = [chunk.text for chunks in records for chunk in chunks]
+            try:
+                matrix = self.embedder.embed_batch(texts)
+            except Exception as e:
+                logger.warning(f"一括埋め込みに失敗したためレコード単位で再試行します: {e}")
+            else:
+                offsets = list(accumulate((len(chunks) for chunks in records), initial=0))
+                return [matrix[start:end] for start, end in pairwise(offsets)]
+
+        results: list[VectorMatrix | Exception] = []
+        for chunks in records:
+            try:
+                results.append(self._embed_record(chunks))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _embed_record(self, chunks: list[StoredChunk]) -> VectorMatrix:
+        """1レコードのチャンクを text_bulk_embed_batch 件ずつ埋め込んで連結"""
+        texts = [chunk.text for chunk in chunks]
+        if len(texts) <= self.text_embed_batch_size:
+            return self.embedder.embed_batch(texts)
+        return np.concatenate([
+            as_matrix(self.embedder.embed_batch(list(group)))
+            for group in batched(texts, self.text_embed_batch_size)
+        ])
+
+    def reembed(self, source: str | None = None, recreate: bool = False) -> int:
+        """チャンクストアから再解析せずに再埋め込みして登録
+
+        近似重複の判定は取り込み時と同じ結果になるよう、チャンクストアの順に索引を作り直しながら行う。
+        """
+        if self.chunk_store is None:
+            raise DocumentProcessingError("チャンクストアが無効になっています")
+        
+        try:
+            if recreate:
+                self.vector_store.recreate_collection()
+            else:
+                self.vector_store.init_collection()
+            if self.dedup_index is not None:
+                self._rebuild_dedup_index(exclude=source)
+            
+            with request_priority(Priority.BULK):
+                stored = self._embed_and_store(self.chunk_store.iter_chunks(source), persist=False)
+            logger.info(f"再埋め込み完了: {stored}チャンク")
+            return stored
+            
+        except Exception as e:
+            logger.error(f"再埋め込みエラー: {e}")
+            raise DocumentProcessingError(f"再埋め込みに失敗しました: {e}") from e
+
+    def _rebuild_dedup_index(self, exclude: str | None = None) -> None:
+        """近似重複の索引を空にし、exclude 以外のソースのチャンクをチャンクストアの順に登録し直す
+
+        exclude が None なら全ソースを再埋め込みしながら登録するため、空にするだけにする。
+        """
+        self.dedup_index.clear()
+        if exclude is None:
+            return
+        for chunk in self.chunk_store.iter_chunks():
+            if chunk.source == exclude:
+                continue
+            signature = self.dedup_index.signature(chunk.text)
+            # 取り込み時に重複として省いたチャンクは索引に登録しない
+            if signature is not None and self.dedup_index.find(signature) is None:
+                self.dedup_index.add(chunk.point_id, signature, group=chunk.source)
+        logger.info(f"近似重複の索引を作り直しました（{len(self.dedup_index)}件）")
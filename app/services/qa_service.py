@@ -1,83 +1,287 @@
 from __future__ import annotations
 
-from ..core.exceptions import RAGException
-from ..core.models import QAResult
+import dataclasses
+import time
+from dataclasses import dataclass
+
+from ..adapters.query_log import QueryLog, QueryLogEntry
+from ..adapters.scheduler import Priority, request_priority
+from ..core.exceptions import DeadlineExceededError, RAGException, RequestCancelledError
+from ..core.extractive import extract_answer
+from ..core.models import QAResult, SearchHit
+from ..core.vectors import Vector
+from ..utils.cache import GenerationFile, LRUCache
+from ..utils.config import Config
+from ..utils.deadline import Deadline, current_deadline, deadline_stage, request_deadline
 from ..utils.logger import get_logger
+from .query_router import QueryRouter, Route, RouteDecision
 
 logger = get_logger(__name__)
 
+NO_RESULTS_ANSWER = "関連する資料がありませんでした"
+DEADLINE_ANSWER = "時間内に回答を生成できませんでした。参考資料をご確認ください"
+TRUNCATED_NOTE = "（処理期限に達したため、回答を途中で打ち切りました）"
+
+
+@dataclass(frozen=True, slots=True)
+class _Outcome:
+    """質問応答の内部結果"""
+    answer: str
+    hits: list[SearchHit]
+    cache_hit: bool = False
+    degraded: bool = False
+    route: str | None = None
+
+
+def normalize_query(query: str) -> str:
+    """質問の正規化（空白の違いは同一視）"""
+    return " ".join(query.split())
+
 
 class QAService:
     """質問応答サービス"""
-    
-    def __init__(self, llm_client, embedder, vector_store) -> None:
+
+    def __init__(
+        self,
+        llm_client,
+        embedder,
+        vector_store,
+        query_log: QueryLog | None = None,
+        origin: str = "cli"
+    ) -> None:
         self.llm_client = llm_client
         self.embedder = embedder
         self.vector_store = vector_store
+        self.query_log = query_log
+        self.origin = origin
+        # 処理期限のうち埋め込みと検索に割り当てる割合（回答生成には残りすべてを使う）
+        self.embed_share = Config.get("deadline", "embed_share", default=0.2)
+        self.search_share = Config.get("deadline", "search_share", default=0.25)
+        self.partial_answer = Config.get("deadline", "partial_answer", default=True)
+        self.router = QueryRouter.from_config()
+        # 回答生成の文脈に使う検索結果の件数
+        self.top_k = Config.get("qdrant", "search_top_k", default=3)
 
-    def answer(self, query: str) -> str:
+        if Config.get("cache", "enabled", default=True):
+            self.answer_cache: LRUCache[str, _Outcome] | None = LRUCache.from_config("answer", 256, ttl=600)
+            self.embedding_cache: LRUCache[str, Vector] | None = LRUCache.from_config("embedding", 1024)
+            # 他のワーカー・CLIでの再インデックスを検知して回答キャッシュを破棄する
+            self.generation: GenerationFile | None = GenerationFile.from_config()
+        else:
+            self.answer_cache = None
+            self.embedding_cache = None
+            self.generation = None
+
+    def answer(self, query: str, deadline: Deadline | None = None) -> str:
         """質問に対する回答を生成"""
+        answer, _ = self.answer_with_status(query, deadline)
+        return answer
+
+    def answer_with_status(self, query: str, deadline: Deadline | None = None) -> tuple[str, bool]:
+        """処理期限内で回答を生成し、期限切れで縮退した回答かどうかも返す"""
+        with request_priority(Priority.INTERACTIVE), request_deadline(deadline):
+            outcome = self._answer(query)
+        return self._format_answer(outcome), outcome.degraded
+
+    def cached_answer(self, query: str) -> str | None:
+        """キャッシュ済みの回答があれば返す（推論サーバーには問い合わせない）"""
+        if self.answer_cache is None:
+            return None
+        start = time.perf_counter()
+        self._sync_answers()
+        cached = self.answer_cache.get(normalize_query(query))
+        if cached is None:
+            return None
+        outcome = dataclasses.replace(cached, cache_hit=True)
+        self._record(query, outcome, start)
+        return self._format_answer(outcome)
+
+    def _answer(self, query: str) -> _Outcome:
+        """対話優先度で回答を生成し、クエリログに記録"""
+        start = time.perf_counter()
         try:
-            # 質問を埋め込みベクトルに変換
-            query_embed = self.embedder.embed(query)
-            
-            # 関連文書を検索
-            search_results = self.vector_store.search(query_embed)
-            
-            if not search_results:
-                logger.info("関連する文書が見つかりませんでした")
-                return "関連する資料がありませんでした"
-            else:
-                return self._generate_answer_with_sources(query, search_results)
-                    
+            outcome = self._resolve(query)
+        except DeadlineExceededError as e:
+            logger.warning(f"質問応答を中断しました: {e}")
+            self._record(query, _Outcome("", []), start, error=str(e))
+            raise
         except Exception as e:
             logger.error(f"質問応答処理エラー: {e}")
+            self._record(query, _Outcome("", []), start, error=str(e))
             raise RAGException(f"回答生成に失敗しました: {e}") from e
-    
-    def _generate_answer_with_sources(self, query: str, search_results) -> str:
-        """検索結果を使って回答を生成"""
-        # 検索結果から文脈とソースを抽出
-        context_texts = [result.text for result in search_results if result.text]
-        sources = {result.source for result in search_results if result.source}
+        self._record(query, outcome, start)
+        return outcome
+
+    def _resolve(self, query: str) -> _Outcome:
+        """キャッシュを確認し、なければ検索と回答生成を実行"""
+        key = normalize_query(query)
+        if self.answer_cache is not None:
+            self._sync_answers()
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                return dataclasses.replace(cached, cache_hit=True)
+
+        # 質問を埋め込みベクトルに変換
+        with deadline_stage("質問の埋め込み", self.embed_share):
+            query_embed = self.embed_query(key)
+
+        # 関連文書を検索
+        with deadline_stage("ベクトル検索", self.search_share):
+            search_results = self.vector_store.search(query_embed, self.top_k)
+
+        if not search_results:
+            logger.info("関連する文書が見つかりませんでした")
+            outcome = _Outcome(NO_RESULTS_ANSWER, [])
+        else:
+            outcome = self._generate_outcome(query, search_results)
 
+        # 縮退した回答は次の質問で改めて生成し直す
+        if self.answer_cache is not None and not outcome.degraded:
+            self.answer_cache.put(key, outcome)
+        return outcome
+
+    def embed_query(self, query: str) -> Vector:
+        """質問を埋め込みベクトルに変換（キャッシュを利用）"""
+        if self.embedding_cache is None:
+            return self.embedder.embed(query)
+        vector = self.embedding_cache.get(query)
+        if vector is None:
+            vector = self.embedder.embed(query)
+            self.embedding_cache.put(query, vector)
+        return vector
+
+    def _route(self, query: str, search_results: list[SearchHit]) -> RouteDecision | None:
+        """回答の生成経路を判定（ルーターが無効なら None）"""
+        if self.router is None:
+            return None
+        deadline = current_deadline()
+        decision = self.router.route(query, search_results, deadline.remaining() if deadline else None)
+        logger.debug(f"回答経路: {decision.route} ({decision.reason})")
+        return decision
+
+    def _generate_outcome(self, query: str, search_results: list[SearchHit]) -> _Outcome:
+        """回答を生成（期限切れの場合は生成済みの部分または定型文に参考資料を添えて返す）"""
+        decision = self._route(query, search_results)
+        route = decision.route.value if decision else None
+        if decision is not None and decision.route is Route.EXTRACTIVE:
+            # 質問とほぼ一致するチャンクがあれば、LLMを使わずにその文を回答とする
+            top = search_results[0]
+            answer = extract_answer(query, top.text, self.router.extractive_max_chars)
+            return _Outcome(answer, [top], route=route)
+
+        try:
+            start = time.perf_counter()
+            with deadline_stage("回答生成"):
+                answer = self._generate_answer(query, search_results, decision.model if decision else None)
+            if decision is not None:
+                self.router.observe(decision.route, time.perf_counter() - start)
+            return _Outcome(answer, search_results, route=route)
+        except RequestCancelledError:
+            raise
+        except DeadlineExceededError as e:
+            logger.warning(f"処理期限に達したため縮退した回答を返します: {e}")
+            partial = e.partial.strip()
+            if self.partial_answer and partial:
+                answer = f"{partial}\n\n{TRUNCATED_NOTE}"
+            else:
+                answer = DEADLINE_ANSWER
+            return _Outcome(answer, search_results, degraded=True, route=route)
+
+    def _generate_answer(self, query: str, search_results: list[SearchHit], model: str | None = None) -> str:
+        """検索結果を文脈としてLLMで回答を生成（model が None なら設定のモデルを使う）"""
+        context_texts = [result.text for result in search_results if result.text]
         context_text = "\n".join(context_texts)
-        
-        # LLMで回答を生成
-        answer = self.llm_client.chat(query, context_text)
+        if model is None:
+            return self.llm_client.chat(query, context_text)
+        return self.llm_client.chat(query, context_text, model)
+
+    def fallback_answer(self, query: str, hits: list[SearchHit]) -> str:
+        """推論サーバーが混み合っている場合に、検索結果だけから抽出した回答を作成（LLMは使わない）"""
+        top = next((hit for hit in hits if hit.text), None)
+        if top is None:
+            return NO_RESULTS_ANSWER
+        max_chars = self.router.extractive_max_chars if self.router is not None else 400
+        return self._format_answer(_Outcome(extract_answer(query, top.text, max_chars), hits))
 
-        # ソース情報を追加
-        source_list = sorted(sources)
+    @staticmethod
+    def _format_answer(outcome: _Outcome) -> str:
+        """回答にソース情報を追加"""
+        source_list = sorted({hit.source for hit in outcome.hits if hit.source})
         if not source_list:
-            return answer
+            return outcome.answer
         else:
             source_text = "\n".join(f"- {src}" for src in source_list)
-            return f"{answer}\n\n---\n参考資料:\n{source_text}"
-    
+            return f"{outcome.answer}\n\n---\n参考資料:\n{source_text}"
+
     def get_qa_result(self, query: str) -> QAResult:
         """構造化された質問応答結果を取得"""
+        with request_priority(Priority.INTERACTIVE):
+            return self._get_qa_result(query)
+
+    def _get_qa_result(self, query: str) -> QAResult:
+        """対話優先度で構造化された質問応答結果を取得"""
         try:
-            query_embed = self.embedder.embed(query)
-            search_results = self.vector_store.search(query_embed)
-            
-            if not search_results:
-                return QAResult(
-                    question=query,
-                    answer="関連する資料がありませんでした",
-                    sources=[]
-                )
-            else:
-                context_texts = [r.text for r in search_results if r.text]
-                sources = list({r.source for r in search_results if r.source})
-                
-                context_text = "\n".join(context_texts)
-                answer = self.llm_client.chat(query, context_text)
-                
-                return QAResult(
-                    question=query,
-                    answer=answer,
-                    sources=sources
-                )
-            
+            outcome = self._answer(query)
+            return QAResult(
+                question=query,
+                answer=outcome.answer,
+                sources=list({hit.source for hit in outcome.hits if hit.source}),
+                cache_hit=outcome.cache_hit,
+                degraded=outcome.degraded
+            )
+
         except Exception as e:
             logger.error(f"QA結果取得エラー: {e}")
             raise RAGException(f"QA結果の取得に失敗しました: {e}") from e
+
+    def _record(self, query: str, outcome: _Outcome, start: float, error: str | None = None) -> None:
+        """クエリログに記録"""
+        if self.query_log is None:
+            return
+        self.query_log.record(QueryLogEntry(
+            query=normalize_query(query),
+            answer=outcome.answer,
+            latency_ms=(time.perf_counter() - start) * 1000,
+            cache_hit=outcome.cache_hit,
+            chunks=[(hit.source, hit.chunk_id, round(hit.score, 4)) for hit in outcome.hits],
+            origin=self.origin,
+            error=error,
+            route=outcome.route,
+        ))
+
+    def invalidate_answers(self) -> None:
+        """文書の登録・再インデックス後に回答キャッシュを破棄（世代を進めて他のワーカーにも破棄させる）"""
+        if self.answer_cache is None:
+            return
+        self.answer_cache.clear()
+        if self.generation is not None:
+            try:
+                self.generation.bump()
+            except OSError as e:
+                logger.warning(f"キャッシュの世代ファイルを更新できませんでした: {e}")
+
+    def _sync_answers(self) -> None:
+        """他のワーカー・CLIが世代を進めていれば回答キャッシュを破棄"""
+        if self.generation is not None and self.generation.changed():
+            logger.info("他のプロセスで文書が更新されたため回答キャッシュを破棄しました")
+            self.answer_cache.clear()
+
+    def prewarm(self, limit: int | None = None, window_hours: float | None = None) -> int:
+        """クエリログで頻度の高い直近の質問を再実行し、回答・埋め込みキャッシュを温める"""
+        if self.query_log is None or self.answer_cache is None:
+            return 0
+        limit = limit or Config.get("cache", "prewarm_queries", default=20)
+        window_hours = window_hours or Config.get("cache", "prewarm_window_hours", default=24)
+        queries = self.query_log.frequent_queries(limit, window_hours)
+
+        warmed = 0
+        # 事前計算は対話リクエストより後回しにする
+        with request_priority(Priority.BULK):
+            for query in queries:
+                try:
+                    self._resolve(query)
+                    warmed += 1
+                except Exception as e:
+                    logger.warning(f"キャッシュの事前計算に失敗 ({query}): {e}")
+        logger.info(f"{warmed}件の質問でキャッシュを事前計算しました")
+        return warmed
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import re
+import threading
+from dataclasses import dataclass
+from enum import StrEnum
+
+from ..core.models import SearchHit
+from ..utils.config import Config
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 複数の問いを含む質問は大きいモデルに任せる
+_QUESTION_MARK_RE = re.compile(r"[?？]")
+
+
+class Route(StrEnum):
+    """回答の生成経路"""
+    EXTRACTIVE = "extractive"
+    FAST = "fast"
+    FULL = "full"
+
+
+@dataclass(frozen=True, slots=True)
+class RouteDecision:
+    """経路の判定結果"""
+    route: Route
+    model: str | None = None
+    reason: str = ""
+
+
+class QueryRouter:
+    """質問の難しさと検索結果から回答の生成経路を選ぶルーター
+
+    上位チャンクの類似度が閾値を超えればチャンクから回答を抜き出し、短く単純な質問は
+    小さく速いモデルに、それ以外は設定のモデルに送る。大きいモデルの生成時間の移動平均が
+    処理期限の残り時間を超える見込みの場合も小さいモデルに切り替える。
+    """
+
+    def __init__(
+        self,
+        fast_model: str | None = None,
+        extractive_score: float = 0.9,
+        extractive_max_chars: int = 400,
+        simple_max_chars: int = 40,
+        complex_keywords: tuple[str, ...] = (),
+        latency_alpha: float = 0.2,
+    ) -> None:
+        self.fast_model = fast_model or None
+        self.extractive_score = extractive_score
+        self.extractive_max_chars = extractive_max_chars
+        self.simple_max_chars = simple_max_chars
+        self.complex_keywords = complex_keywords
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+        self._latency: dict[Route, float] = {}
+
+    @classmethod
+    def from_config(cls) -> QueryRouter | None:
+        """設定ファイルの [routing] からルーターを作成（無効なら None）"""
+        if not Config.get("routing", "enabled", default=True):
+            return None
+        model_type = Config.get("model_type", default="ollama").lower()
+        return cls(
+            fast_model=Config.get(model_type, "fast_model", default=""),
+            extractive_score=Config.get("routing", "extractive_score", default=0.9),
+            extractive_max_chars=Config.get("routing", "extractive_max_chars", default=400),
+            simple_max_chars=Config.get("routing", "simple_max_chars", default=40),
+            complex_keywords=tuple(Config.get("routing", "complex_keywords", default=[])),
+            latency_alpha=Config.get("routing", "latency_alpha", default=0.2),
+        )
+
+    def route(self, query: str, hits: list[SearchHit], remaining: float | None = None) -> RouteDecision:
+        """経路を判定（remaining には処理期限の残り秒数を渡す）"""
+        top = hits[0] if hits else None
+        if top is not None and top.text and top.score >= self.extractive_score:
+            return RouteDecision(Route.EXTRACTIVE, reason=f"上位チャンクの類似度 {top.score:.3f}")
+        if self.fast_model is None:
+            return RouteDecision(Route.FULL, reason="小さいモデルが未設定")
+        if self.is_simple(query):
+            return RouteDecision(Route.FAST, self.fast_model, reason="短く単純な質問")
+
+        expected = self.expected_latency(Route.FULL)
+        if remaining is not None and expected is not None and expected > remaining:
+            return RouteDecision(
+                Route.FAST,
+                self.fast_model,
+                reason=f"生成時間の見込み {expected:.1f}秒が残り {remaining:.1f}秒を超える",
+            )
+        return RouteDecision(Route.FULL, reason="複雑な質問")
+
+    def is_simple(self, query: str) -> bool:
+        """短く、複数の問いや複雑さを示す語を含まない質問か"""
+        return (
+            len(query) <= self.simple_max_chars
+            and len(_QUESTION_MARK_RE.findall(query)) <= 1
+            and not any(keyword in query for keyword in self.complex_keywords)
+        )
+
+    def observe(self, route: Route, seconds: float) -> None:
+        """経路ごとの生成時間を指数移動平均で記録"""
+        with self._lock:
+            previous = self._latency.get(route)
+            self._latency[route] = (
+                seconds if previous is None else previous + self.latency_alpha * (seconds - previous)
+            )
+
+    def expected_latency(self, route: Route) -> float | None:
+        """経路の生成時間の見込み（未計測なら None）"""
+        with self._lock:
+            return self._latency.get(route)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+from collections.abc import Callable
+from typing import Any
+
+from ..adapters.scheduler import Priority, request_priority
+from ..core.exceptions import InvalidRequestError
+from ..core.models import SearchHit, SearchParams, SearchResponse, SearchResult
+from ..core.vectors import Vector
+from ..utils.config import Config
+from ..utils.deadline import Deadline, request_deadline
+from ..utils.logger import get_logger
+from .qa_service import normalize_query
+
+logger = get_logger(__name__)
+
+SEARCH_FIELDS = frozenset({"source", "chunk_id", "text", "point_id", "metadata"})
+
+
+class SearchService:
+    """検索のみを行うサービス（LLMを使わず、順位付きのチャンクとスコアを返す）"""
+
+    def __init__(
+        self,
+        embed_query: Callable[[str], Vector],
+        vector_store,
+        default_top_k: int = 10,
+        max_top_k: int = 100,
+        max_offset: int = 1000,
+        timeout: float = 5.0,
+    ) -> None:
+        # 質問応答と埋め込みキャッシュを共有できるよう、埋め込み関数を受け取る
+        self.embed_query = embed_query
+        self.vector_store = vector_store
+        self.default_top_k = default_top_k
+        self.max_top_k = max_top_k
+        self.max_offset = max_offset
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, embed_query: Callable[[str], Vector], vector_store) -> SearchService:
+        """設定ファイルの [search] からサービスを作成"""
+        return cls(
+            embed_query,
+            vector_store,
+            default_top_k=Config.get("search", "default_top_k", default=10),
+            max_top_k=Config.get("search", "max_top_k", default=100),
+            max_offset=Config.get("search", "max_offset", default=1000),
+            timeout=Config.get("search", "timeout", default=5.0),
+        )
+
+    def search(
+        self,
+        query: str,
+        top_k: int | None = None,
+        offset: int = 0,
+        score_threshold: float | None = None,
+        fields: frozenset[str] | None = None,
+        overrides: dict[str, Any] | None = None,
+    ) -> SearchResponse:
+        """検索して順位付きの結果を返す
+
+        fields で応答に含める項目を選び、overrides（hnsw_ef, exact, rescore, oversampling）で
+        設定ファイルの検索パラメータを上書きする（None の項目は上書きしない）。
+        """
+        start = time.perf_counter()
+        top_k = self.default_top_k if top_k is None else top_k
+        self._validate(top_k, offset, score_threshold, fields)
+        params = self._search_params(overrides or {})
+        with_text = fields is None or "text" in fields
+        hits = self.hits(query, top_k, offset, score_threshold, with_text, params)
+        has_more = len(hits) == top_k and offset + top_k <= self.max_offset
+        return SearchResponse(
+            query=query,
+            results=[SearchResult.from_hit(hit, offset + i, fields) for i, hit in enumerate(hits, 1)],
+            offset=offset,
+            next_offset=offset + top_k if has_more else None,
+            took_ms=(time.perf_counter() - start) * 1000,
+        )
+
+    def hits(
+        self,
+        query: str,
+        top_k: int,
+        offset: int = 0,
+        score_threshold: float | None = None,
+        with_text: bool = True,
+        params: SearchParams | None = None,
+    ) -> list[SearchHit]:
+        """対話優先度・処理期限付きで埋め込みと検索を行う"""
+        deadline = Deadline(self.timeout) if self.timeout > 0 else None
+        with request_priority(Priority.INTERACTIVE), request_deadline(deadline):
+            query_embed = self.embed_query(normalize_query(query))
+            return self.vector_store.search(
+                query_embed, top_k, with_text, offset=offset, score_threshold=score_threshold, params=params
+            )
+
+    def _search_params(self, overrides: dict[str, Any]) -> SearchParams | None:
+        """設定ファイルの検索パラメータに、リクエストで指定された値を上書き（指定がなければ None）"""
+        overrides = {key: value for key, value in overrides.items() if value is not None}
+        if not overrides:
+            return None
+        if overrides.get("hnsw_ef", 1) <= 0:
+            raise InvalidRequestError("hnsw_ef は1以上で指定してください")
+        if overrides.get("oversampling", 1.0) < 1.0:
+            raise InvalidRequestError("oversampling は1以上で指定してください")
+        return dataclasses.replace(self.vector_store.search_params, **overrides)
+
+    def _validate(
+        self, top_k: int, offset: int, score_threshold: float | None, fields: frozenset[str] | None
+    ) -> None:
+        """検索パラメータを検証"""
+        if not 1 <= top_k <= self.max_top_k:
+            raise InvalidRequestError(f"top_k は1以上{self.max_top_k}以下で指定してください")
+        if not 0 <= offset <= self.max_offset:
+            raise InvalidRequestError(f"offset は0以上{self.max_offset}以下で指定してください")
+        if score_threshold is not None and not -1.0 <= score_threshold <= 1.0:
+            raise InvalidRequestError("score_threshold は-1以上1以下で指定してください")
+        if fields is not None and not fields <= SEARCH_FIELDS:
+            unknown = ", ".join(sorted(fields - SEARCH_FIELDS))
+            raise InvalidRequestError(f"未対応の項目です: {unknown}（{', '.join(sorted(SEARCH_FIELDS))} から選択）")
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import tempfile
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from anyio import to_thread
+
+from ..adapters.parsers import get_parser
+from ..core.exceptions import DocumentProcessingError, UploadLimitError
+from ..utils.config import Config
+from ..utils.io import PipeReader
+from ..utils.logger import get_logger
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # 旧パッケージ名
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class UploadResult:
+    """アップロード処理の結果"""
+    processed: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+
+
+@dataclass
+class _Part:
+    """受信中のファイルパート"""
+    filename: str
+    size: int = 0
+    reader: PipeReader | None = None
+    spool: BinaryIO | None = None
+    task: asyncio.Task | None = None
+    # パーサーがデータを読み出した・登録処理が終了したときに立つ（書き込み側が空きを待つのに使う）
+    writable: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class StreamingUploadService:
+    """multipart のリクエストボディを受信しながら文書を登録するサービス
+
+    テキスト系の形式は受信したデータをそのままパーサーへ流し込み、PDF・DOCX など
+    シークが必要な形式はスプールファイルに受信し終えた時点で登録を開始する。
+    後続のファイルを受信している間も、受信済みのファイルの埋め込みを並行して進める。
+    """
+
+    def __init__(
+        self,
+        ingest_stream: Callable[[BinaryIO, str], int],
+        max_file_bytes: int,
+        max_total_bytes: int,
+        spool_bytes: int = 8 * MB,
+        pipe_chunks: int = 16,
+    ) -> None:
+        self.ingest_stream = ingest_stream
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.spool_bytes = spool_bytes
+        self.pipe_chunks = pipe_chunks
+
+    @classmethod
+    def from_config(cls, ingest_stream: Callable[[BinaryIO, str], int]) -> StreamingUploadService:
+        """設定ファイルの [upload] からサービスを作成"""
+        return cls(
+            ingest_stream,
+            max_file_bytes=int(Config.get("upload", "max_file_mb", default=100) * MB),
+            max_total_bytes=int(Config.get("upload", "max_total_mb", default=500) * MB),
+            spool_bytes=int(Config.get("upload", "spool_mb", default=8) * MB),
+            pipe_chunks=Config.get("upload", "pipe_chunks", default=16),
+        )
+
+    async def ingest(self, content_type: str, body: AsyncIterator[bytes]) -> UploadResult:
+        """リクエストボディを受信しながらファイルを登録"""
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise DocumentProcessingError("multipart/form-data の境界が指定されていません")
+
+        session = _UploadSession(self)
+        parser = MultipartParser(boundary, session.callbacks())
+        try:
+            async for chunk in body:
+                parser.write(chunk)
+                await session.process_events()
+            parser.finalize()
+            await session.process_events()
+        except BaseException as e:
+            committed = await session.abort(e)
+            if isinstance(e, UploadLimitError):
+                # 先に受信し終えたファイルは登録済みのまま残るため、呼び出し元に伝える
+                e.committed = committed
+            raise
+        return await session.wait()
+
+
+class _UploadSession:
+    """1リクエスト分のパート受信状態"""
+
+    def __init__(self, service: StreamingUploadService) -> None:
+        self.service = service
+        self.parts: list[_Part] = []
+        self.result = UploadResult()
+        self.total_size = 0
+        self._events: list[tuple[str, object]] = []
+        self._current: _Part | None = None
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        """MultipartParser に渡すコールバック（イベントを記録するだけ）"""
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        self._events.append(("begin", filename.decode("utf-8", "replace") if filename else None))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self._events.append(("end", None))
+
+    async def process_events(self) -> None:
+        """コールバックで記録したイベントを非同期に処理"""
+        events, self._events = self._events, []
+        for kind, payload in events:
+            if kind == "begin":
+                self._begin_part(payload)
+            elif kind == "data":
+                await self._write_part(payload)
+            elif kind == "end":
+                await self._end_part()
+
+    def _begin_part(self, filename: str | None) -> None:
+        """ファイルパートの受信を開始"""
+        self._current = None
+        if not filename:
+            return
+
+        name = os.path.basename(filename)
+        parser = get_parser(os.path.splitext(name)[1].lower())
+        if parser is None:
+            self.result.skipped.append(name)
+            logger.warning(f"未対応ファイル形式: {name}")
+            return
+        if any(part.filename == name for part in self.parts):
+            # 同じソースを並行して置き換えると互いのチャンクを消し合うため、2つ目以降は登録しない
+            self.result.skipped.append(name)
+            logger.warning(f"同じファイル名のファイルが重複しているためスキップします: {name}")
+            return
+
+        part = _Part(filename=name)
+        if parser.needs_seek:
+            part.spool = tempfile.SpooledTemporaryFile(max_size=self.service.spool_bytes)
+        else:
+            # テキスト系の形式は受信と並行してパーサーへ流し込む
+            loop = asyncio.get_running_loop()
+            part.reader = PipeReader(
+                self.service.pipe_chunks, name=name, on_read=lambda: loop.call_soon_threadsafe(part.writable.set)
+            )
+            part.task = asyncio.ensure_future(self._ingest(part, io.BufferedReader(part.reader)))
+            part.task.add_done_callback(lambda _: part.writable.set())
+        self.parts.append(part)
+        self._current = part
+
+    async def _write_part(self, data: bytes) -> None:
+        """受信データをパーサーまたはスプールへ書き込む"""
+        part = self._current
+        if part is None:
+            return
+
+        part.size += len(data)
+        self.total_size += len(data)
+        if part.size > self.service.max_file_bytes:
+            raise UploadLimitError(
+                f"ファイルサイズが上限({self.service.max_file_bytes // MB}MB)を超えています: {part.filename}"
+            )
+        if self.total_size > self.service.max_total_bytes:
+            raise UploadLimitError(f"アップロード合計サイズが上限({self.service.max_total_bytes // MB}MB)を超えています")
+
+        if part.reader is not None:
+            await self._deliver(part, lambda: part.reader.feed(data, block=False))
+        else:
+            part.spool.write(data)
+
+    async def _deliver(self, part: _Part, put: Callable[[], bool]) -> None:
+        """パーサーの読み出しで空きができるのを待ってから書き込む"""
+        while True:
+            # 書き込みを試す前に下ろし、失敗した後の読み出しの通知を取りこぼさないようにする
+            part.writable.clear()
+            if put():
+                return
+            # 登録処理が先に終了した場合（解析エラーなど）は残りを読み捨てる
+            if part.task.done():
+                return
+            await part.writable.wait()
+
+    async def _end_part(self) -> None:
+        """ファイルパートの受信を完了し、必要なら登録を開始"""
+        part = self._current
+        self._current = None
+        if part is None:
+            return
+
+        if part.reader is not None:
+            await self._deliver(part, lambda: part.reader.close_writer(block=False))
+        else:
+            part.spool.seek(0)
+            part.task = asyncio.ensure_future(self._ingest(part, part.spool))
+
+    async def _ingest(self, part: _Part, stream: BinaryIO) -> int:
+        """スレッドプールでファイルを登録"""
+        try:
+            return await to_thread.run_sync(self.service.ingest_stream, stream, part.filename)
+        finally:
+            stream.close()
+
+    async def abort(self, error: BaseException) -> list[str]:
+        """受信中のパートを中断し、実行中の登録処理の終了を待って登録を終えたファイル名を返す
+
+        中断したファイルの途中まで登録したチャンクは ingest_stream が取り除く。
+        """
+        for part in self.parts:
+            if part.reader is not None:
+                part.reader.abort(UploadLimitError(f"アップロードが中断されました: {error}"))
+            elif part.task is None and part.spool is not None:
+                part.spool.close()
+        started = [part for part in self.parts if part.task is not None]
+        results = await asyncio.gather(*(part.task for part in started), return_exceptions=True)
+        return [part.filename for part, result in zip(started, results) if not isinstance(result, BaseException)]
+
+    async def wait(self) -> UploadResult:
+        """すべてのファイルの登録完了を待って結果を返す"""
+        for part in self.parts:
+            if part.task is None:
+                continue
+            try:
+                await part.task
+                self.result.processed.append(part.filename)
+            except Exception as e:
+                logger.error(f"ファイル処理エラー ({part.filename}): {e}")
+                self.result.skipped.append(part.filename)
+        return self.result
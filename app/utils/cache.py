@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from pathlib import Path
+from typing import Generic, TypeVar
+
+from .config import Config
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """件数上限と有効期限付きのスレッドセーフなLRUキャッシュ"""
+
+    def __init__(self, max_entries: int, ttl: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, name: str, max_entries: int, ttl: float | None = None) -> LRUCache:
+        """設定ファイルの [cache] からキャッシュを作成（件数はワーカー数で按分）"""
+        return cls(
+            max_entries=Config.per_worker(Config.get("cache", f"{name}_max_entries", default=max_entries)),
+            ttl=Config.get("cache", f"{name}_ttl", default=ttl) or None,
+        )
+
+    def get(self, key: K) -> V | None:
+        """値を取得（期限切れ・未登録なら None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[0] > self.ttl):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: K, value: V) -> None:
+        """値を登録し、上限を超えた古いものから削除"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """すべての値を削除"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GenerationFile:
+    """複数のプロセスで共有する世代（ファイルの置き換えで進める）
+
+    いずれかのプロセスが bump するとファイルが置き換わり、他のプロセスは changed() で検知する。
+    APIの各ワーカーが持つキャッシュを、再インデックスしたワーカー以外でも破棄するために使う。
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._seen = self._stat()
+
+    @classmethod
+    def from_config(cls) -> GenerationFile:
+        """設定ファイルの [cache] から世代ファイルを作成"""
+        return cls(Config.get("cache", "generation_path", default="log/index_generation"))
+
+    def _stat(self) -> tuple[int, int] | None:
+        """ファイルの識別子と更新時刻（なければ None）"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self) -> None:
+        """世代を進める（一時ファイルを書いて置き換え、他のプロセスから途中の状態が見えないようにする）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(str(time.time_ns()), encoding="utf-8")
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._seen = self._stat()
+
+    def changed(self) -> bool:
+        """前回確認してから他のプロセスが世代を進めたか"""
+        current = self._stat()
+        with self._lock:
+            if current == self._seen:
+                return False
+            self._seen = current
+            return True
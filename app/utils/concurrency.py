@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from typing import Any, TypeVar
+
+from ..core.exceptions import OverloadedError
+from .config import Config
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """同一キーで実行中の処理を1回の計算に集約するクラス"""
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, asyncio.Task[Any]] = {}
+        self._waiters: dict[asyncio.Task[Any], int] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """実行中の同一処理があればその結果を共有し、なければ新たに実行"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            logger.debug(f"実行中の処理に合流します: {key}")
+        # 一部の呼び出し元が離脱しても共有中の計算は続け、全員が離脱した場合だけ取り消す
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    logger.debug(f"待機者がいなくなったため処理を取り消します: {key}")
+                    task.cancel()
+
+    def _on_done(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        """完了した処理を登録から外す"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 待機者が全員離脱した場合に例外が未回収扱いにならないようにする
+            task.exception()
+
+    @property
+    def inflight(self) -> int:
+        """実行中の処理数"""
+        return len(self._inflight)
+
+
+class AdmissionController:
+    """同時実行数と待機キューを制限する受付制御"""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int = 1,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._active = 0
+
+    @classmethod
+    def from_config(cls, section: str = "api") -> AdmissionController:
+        """設定ファイルから受付制御を作成（上限はワーカー数で按分）"""
+        return cls(
+            max_concurrency=Config.per_worker(Config.get(section, "max_concurrency", default=4)),
+            max_queue=Config.per_worker(Config.get(section, "max_queue", default=32)),
+            queue_timeout=Config.get(section, "queue_timeout", default=10.0),
+            retry_after=Config.get(section, "retry_after", default=2),
+        )
+
+    @asynccontextmanager
+    async def admit(self):
+        """実行枠を確保し、確保できなければ即座に拒否する"""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise OverloadedError(
+                "リクエストが混み合っています。しばらくしてから再試行してください",
+                status_code=429,
+                retry_after=self.retry_after,
+            )
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except TimeoutError:
+            raise OverloadedError(
+                "待機時間内に処理を開始できませんでした",
+                status_code=503,
+                retry_after=self.retry_after,
+            ) from None
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    @property
+    def waiting(self) -> int:
+        """待機中のリクエスト数"""
+        return self._waiting
+
+    @property
+    def active(self) -> int:
+        """実行中のリクエスト数"""
+        return self._active
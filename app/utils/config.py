@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Any
 
@@ -46,6 +47,19 @@ class Config:
                     
         return config
     
+    @classmethod
+    def worker_count(cls) -> int:
+        """APIサーバーのワーカープロセス数を取得"""
+        try:
+            return max(1, int(os.environ.get("RAG_WORKERS", "1")))
+        except ValueError:
+            return 1
+
+    @classmethod
+    def per_worker(cls, value: int) -> int:
+        """サーバー全体の上限値をワーカー1つあたりの値に換算"""
+        return max(1, int(value) // cls.worker_count())
+
     @classmethod
     def reload(cls) -> None:
         """設定を再読み込み"""
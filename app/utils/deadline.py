@@ -0,0 +1,180 @@
+"""
+リクエスト単位の処理期限と取り消し
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+
+from ..core.exceptions import DeadlineExceededError, RequestCancelledError
+from .config import Config
+
+
+class _Cancellation:
+    """親子の期限で共有する取り消しの状態と、取り消し時に呼ぶ処理"""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks: dict[int, Callable[[], None]] = {}
+        self.next_id = 0
+
+
+class Deadline:
+    """リクエストの処理期限
+
+    埋め込み・検索・回答生成の各段階には残り時間の一部を割り当てた子の期限を作り、
+    下位の処理はその残り時間をタイムアウトとして使う。取り消しの状態は親子で共有する。
+    """
+
+    def __init__(self, seconds: float, _cancellation: _Cancellation | None = None) -> None:
+        self.expires_at = time.monotonic() + seconds
+        self._cancellation = _cancellation or _Cancellation()
+
+    @classmethod
+    def from_config(cls) -> Deadline | None:
+        """設定ファイルの [deadline] から期限を作成（0 以下なら期限なし）"""
+        seconds = Config.get("deadline", "request_seconds", default=30.0)
+        return cls(seconds) if seconds > 0 else None
+
+    def remaining(self) -> float:
+        """残り時間（秒）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """期限を過ぎたか"""
+        return time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        """取り消されたか"""
+        return self._cancellation.event.is_set()
+
+    def cancel(self) -> None:
+        """処理を取り消し、登録された処理を呼ぶ（クライアントの切断時など）"""
+        state = self._cancellation
+        with state.lock:
+            state.event.set()
+            callbacks = list(state.callbacks.values())
+            state.callbacks.clear()
+        for callback in callbacks:
+            # 取り消しを通知する側（イベントループなど）には失敗を伝えない
+            with suppress(Exception):
+                callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """取り消し時に呼ぶ処理を登録し、登録を解除する関数を返す（取り消し済みならすぐに呼ぶ）
+
+        受信待ちで止まっているスレッドは取り消しに気付けないため、接続を切って待ちを解くのに使う。
+        """
+        state = self._cancellation
+        with state.lock:
+            if not state.event.is_set():
+                key = state.next_id
+                state.next_id += 1
+                state.callbacks[key] = callback
+                return lambda: self._remove_callback(key)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, key: int) -> None:
+        """登録した処理を解除"""
+        with self._cancellation.lock:
+            self._cancellation.callbacks.pop(key, None)
+
+    def child(self, share: float) -> Deadline:
+        """残り時間の share の割合を期限とする子の期限を作成"""
+        child = Deadline(0.0, self._cancellation)
+        child.expires_at = min(self.expires_at, time.monotonic() + self.remaining() * share)
+        return child
+
+    def error(self, stage: str, partial: str = "") -> DeadlineExceededError | None:
+        """取り消し済み・期限切れなら対応する例外を返す（期限内なら None）"""
+        if self.cancelled:
+            return RequestCancelledError(f"クライアントが切断したため{stage}を中止しました", partial)
+        if self.expired:
+            return DeadlineExceededError(f"{stage}が処理期限までに完了しませんでした", partial)
+        return None
+
+    def check(self, stage: str, partial: str = "") -> None:
+        """取り消し済み・期限切れなら例外を送出"""
+        error = self.error(stage, partial)
+        if error is not None:
+            raise error
+
+
+_MIN_TIMEOUT = 0.001
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Deadline | None:
+    """現在のコンテキストの処理期限を取得"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def request_deadline(deadline: Deadline | None) -> Iterator[Deadline | None]:
+    """このブロック内の処理に期限を設定"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def deadline_stage(stage: str, share: float = 1.0) -> Iterator[Deadline | None]:
+    """現在の期限の残り時間の一部をこの段階に割り当てる（期限がなければ何もしない）"""
+    parent = _current_deadline.get()
+    if parent is None:
+        yield None
+        return
+    parent.check(stage)
+    with request_deadline(parent.child(share)) as deadline:
+        yield deadline
+
+
+@contextmanager
+def on_cancel(callback: Callable[[], None]) -> Iterator[None]:
+    """このブロックの間、現在の期限が取り消されたら callback を呼ぶ（期限がなければ何もしない）"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        yield
+        return
+    remove = deadline.on_cancel(callback)
+    try:
+        yield
+    finally:
+        remove()
+
+
+def timeout_for(default: float | None) -> float | None:
+    """現在の期限の残り時間と既定のタイムアウトの短い方を返す"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    # 0 以下のタイムアウトは受け付けない通信ライブラリがあるため、期限切れでもごく短い値を返す
+    remaining = max(deadline.remaining(), _MIN_TIMEOUT)
+    return remaining if default is None else min(default, remaining)
+
+
+def check_deadline(stage: str, partial: str = "") -> None:
+    """現在の期限が切れていれば例外を送出（期限がなければ何もしない）"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage, partial)
+
+
+def deadline_error(stage: str, partial: str = "") -> DeadlineExceededError | None:
+    """下位の処理の失敗が期限切れ・取り消しによるものなら対応する例外を返す
+
+    残り時間をタイムアウトにした通信の失敗をサーバー障害と区別するために使う
+    （原因を付けずに送出すれば、プールはバックエンドの障害として数えない）。
+    """
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.error(stage, partial)
@@ -0,0 +1,26 @@
+"""
+高速なJSONの読み書き（orjson が無い環境では標準の json を使用）
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson は任意
+    orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+    """JSONをデコード（応答本文の bytes をそのまま渡せる）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """JSONを文字列にエンコード（日本語はエスケープしない）"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-import re
-from datetime import datetime
+import io
+import queue
+import socket
+from collections.abc import Callable
 from pathlib import Path
 
 from .logger import get_logger
@@ -9,47 +11,6 @@ from .logger import get_logger
 logger = get_logger(__name__)
 
 
-def sanitize_filename(name: str) -> str:
-    """ファイル名として安全な文字列に変換"""
-    sanitized = re.sub(r'[\\/:*?"<>|]', "_", name)
-    return sanitized[:255].strip()
-
-
-def save_log(query: str, answer: str, log_dir: str = "log") -> Path:
-    """質問と回答をログファイルに保存"""
-    try:
-        log_path = Path(log_dir)
-        log_path.mkdir(parents=True, exist_ok=True)
-        
-        # ファイル名を生成
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        sanitized_query = re.sub(r"[\r\n\t]+", " ", query)
-        
-        safe_query = sanitize_filename(sanitized_query)
-        if not safe_query:
-            safe_query = "query"
-            
-        log_file = log_path / f"{timestamp}_{safe_query}.txt"
-        
-        # ログ内容を作成
-        log_content = f"""質問: {query}
-
-回答:
-{answer}
-
----
-保存日時: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-"""
-        
-        log_file.write_text(log_content, encoding="utf-8")
-        logger.info(f"ログを保存しました: {log_file}")
-        return log_file
-        
-    except Exception as e:
-        logger.error(f"ログ保存エラー: {e}")
-        raise
-
-
 def multiline_input(prompt: str = "質問を入力してください (空行で終了): ") -> str:
     """複数行入力を受け取る"""
     print(prompt)
@@ -90,3 +51,86 @@ def write_file_safe(file_path: str, content: str, encoding: str = "utf-8") -> bo
     except Exception as e:
         logger.error(f"ファイル書き込みエラー ({file_path}): {e}")
         return False
+
+
+def shutdown_socket(sock: socket.socket | None) -> bool:
+    """別スレッドで受信待ちのソケットを切断する（切断できたら真）
+
+    close() だけでは他のスレッドの受信待ちが解けず、相手にも切断が伝わらないため shutdown する。
+    """
+    if sock is None:
+        return False
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        return False
+    return True
+
+
+class PipeReader(io.RawIOBase):
+    """別スレッドから書き込まれたバイト列を順に読み出すストリーム
+
+    書き込み側は feed() でデータを渡し、close_writer() で終端を、abort() で異常終了を通知する。
+    キューに上限があるため、読み出しが追いつかない場合は書き込み側が待たされる。
+    on_read はキューから取り出すたびに読み出し側のスレッドで呼ばれ、block=False で書き込む側が
+    空きを待つのに使う。
+    """
+
+    _EOF = object()
+
+    def __init__(self, max_chunks: int = 16, name: str = "<pipe>", on_read: Callable[[], None] | None = None) -> None:
+        super().__init__()
+        self.name = name
+        self.on_read = on_read
+        self._queue: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._buffer = b""
+        self._finished = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        """キューからデータを取り出してバッファに書き込む"""
+        while not self._buffer and not self._finished:
+            item = self._queue.get()
+            if self.on_read is not None:
+                self.on_read()
+            if item is self._EOF:
+                self._finished = True
+            elif isinstance(item, BaseException):
+                self._finished = True
+                raise item
+            else:
+                self._buffer = item
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def feed(self, data: bytes, block: bool = True) -> bool:
+        """データを書き込む（block=False でキューが満杯なら False を返す）"""
+        if not data:
+            return True
+        try:
+            self._queue.put(data, block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def close_writer(self, block: bool = True) -> bool:
+        """書き込みの終了を通知（block=False でキューが満杯なら False を返す）"""
+        try:
+            self._queue.put(self._EOF, block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def abort(self, error: BaseException) -> None:
+        """読み出し側に例外を通知（未読データは破棄）"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(error)
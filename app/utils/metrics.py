@@ -0,0 +1,39 @@
+"""
+レイテンシの集計
+"""
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """パーセンタイル値を計算（最近傍順位法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies_ms: Sequence[float], elapsed: float) -> dict[str, float]:
+    """レイテンシとスループットを要約"""
+    count = len(latencies_ms)
+    return {
+        "count": count,
+        "throughput": count / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": sum(latencies_ms) / count if count else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": max(latencies_ms, default=0.0),
+    }
+
+
+def format_summary(summary: dict[str, float], unit: str = "件") -> str:
+    """要約を1行の文字列に整形"""
+    return (
+        f"{summary['count']}{unit} {summary['throughput']:.2f}{unit}/秒 "
+        f"平均 {summary['mean_ms']:.1f}ms p50 {summary['p50_ms']:.1f}ms "
+        f"p95 {summary['p95_ms']:.1f}ms p99 {summary['p99_ms']:.1f}ms 最大 {summary['max_ms']:.1f}ms"
+    )
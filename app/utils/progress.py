@@ -0,0 +1,63 @@
+"""
+バッチ処理の進捗表示
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import TextIO
+
+
+class ProgressBar:
+    """件数ベースの進捗バー（複数スレッドから更新可能）"""
+
+    def __init__(self, total: int, label: str = "", width: int = 30, stream: TextIO | None = None) -> None:
+        self.total = total
+        self.label = label
+        self.width = width
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._last_render = 0.0
+        # 端末でなければ（リダイレクト時など）最後に1行だけ出力する
+        self._interactive = self.stream.isatty()
+
+    def update(self, count: int = 1, failed: bool = False) -> None:
+        """完了件数を進める"""
+        with self._lock:
+            self.done += count
+            if failed:
+                self.failed += count
+            now = time.perf_counter()
+            if self._interactive and (now - self._last_render >= 0.1 or self.done >= self.total):
+                self._last_render = now
+                self._render(end="")
+
+    def close(self) -> None:
+        """進捗表示を終了"""
+        with self._lock:
+            self._render(end="\n")
+
+    @property
+    def elapsed(self) -> float:
+        """開始からの経過秒数"""
+        return time.perf_counter() - self.started
+
+    def _render(self, end: str) -> None:
+        """進捗バーを描画（ロック保持中に呼ぶ）"""
+        ratio = self.done / self.total if self.total else 1.0
+        filled = int(self.width * ratio)
+        bar = "#" * filled + "." * (self.width - filled)
+        rate = self.done / self.elapsed if self.elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else 0.0
+        failed = f" 失敗{self.failed}" if self.failed else ""
+        line = (
+            f"{self.label} [{bar}] {self.done}/{self.total} {ratio:4.0%} "
+            f"{rate:6.1f}件/秒 残り{remaining:5.0f}秒{failed}"
+        )
+        prefix = "\r" if self._interactive else ""
+        self.stream.write(f"{prefix}{line}{end}")
+        self.stream.flush()
@@ -0,0 +1,79 @@
+"""
+起動時間の計測
+"""
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+REPORT_MODULES = [
+    "app.cli_main",
+    "app.api_main",
+    "app.adapters.factory",
+    "app.adapters.vectorstore",
+    "app.services.qa_service",
+    "app.services.document_ingest_service",
+    "requests",
+    "openai",
+    "qdrant_client",
+    "pdfplumber",
+    "pydantic",
+    "fastapi",
+]
+
+
+def measure_import_time(module: str) -> float | None:
+    """新しいプロセスでモジュールを読み込み、累積インポート時間（秒）を計測"""
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+    except Exception as e:
+        logger.warning(f"インポート時間の計測に失敗 ({module}): {e}")
+        return None
+
+    if result.returncode != 0:
+        return None
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1].strip()) / 1_000_000
+    return None
+
+
+def measure_step(name: str, func: Callable[[], Any]) -> tuple[str, float, str | None]:
+    """起動処理の1ステップを実行して所要時間を計測"""
+    start = time.perf_counter()
+    try:
+        func()
+        error = None
+    except Exception as e:
+        error = str(e)
+    return name, time.perf_counter() - start, error
+
+
+def startup_report(steps: list[tuple[str, Callable[[], Any]]]) -> str:
+    """インポート時間と起動ステップの所要時間をレポートにまとめる"""
+    lines = ["【インポート時間】"]
+    for module in REPORT_MODULES:
+        seconds = measure_import_time(module)
+        value = f"{seconds * 1000:8.1f} ms" if seconds is not None else "    (失敗)"
+        lines.append(f"  {value}  {module}")
+
+    lines.append("")
+    lines.append("【起動ステップ】")
+    for name, func in steps:
+        name, seconds, error = measure_step(name, func)
+        suffix = f"  エラー: {error}" if error else ""
+        lines.append(f"  {seconds * 1000:8.1f} ms  {name}{suffix}")
+    return "\n".join(lines)
@@ -2,14 +2,19 @@
 """
 FastAPI サーバー起動スクリプト
 """
-import uvicorn
-from app.api_main import app
+import argparse
+
+from app.server import run_development, run_production
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.api_main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="RAG APIサーバー")
+    parser.add_argument("--prod", action="store_true", help="本番モード（複数ワーカー）で起動")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数（本番モードのみ）")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.prod:
+        run_production(args.host, args.port, args.workers)
+    else:
+        run_development(args.host, args.port)
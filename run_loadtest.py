@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""
+負荷試験ツール起動スクリプト
+"""
+from app.loadtest.cli import main
+
+if __name__ == "__main__":
+    main()